@@ -0,0 +1,230 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+EMBEDDING_MODEL = 'models/text-embedding-004'
+DEFAULT_EMBEDDING_CACHE_DIR = ".cache/rag_embeddings"
+
+
+def content_hash(text: str, model: str) -> str:
+    """Chave de um embedding: hash do texto combinado com o nome do modelo que o gerou."""
+    return hashlib.sha256(f"{model}\x00{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """
+    Armazena em disco os embeddings da base de conhecimento, um vetor por texto distinto.
+
+    Os vetores ficam em um arquivo `.npy` (aberto com memory-map) e as chaves em um `.json`
+    ao lado. Em cada sincronização apenas os textos novos ou alterados são enviados à API;
+    os demais são lidos do disco.
+    """
+    def __init__(self, directory: str, model: str = EMBEDDING_MODEL):
+        self.directory = Path(directory)
+        self.model = model
+        slug = model.replace("/", "_")
+        self.vectors_path = self.directory / f"{slug}.npy"
+        self.meta_path = self.directory / f"{slug}.json"
+        self._keys = []
+        self._index = {}
+        self._vectors = None
+        self._load()
+
+    def _load(self) -> None:
+        if not (self.vectors_path.exists() and self.meta_path.exists()):
+            return
+        try:
+            with open(self.meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            vectors = np.load(self.vectors_path, mmap_mode="r")
+        except (OSError, ValueError):
+            # Arquivos corrompidos ou incompletos: o store é reconstruído na próxima sincronização.
+            return
+        keys = meta.get("keys", [])
+        if meta.get("model") != self.model or vectors.ndim != 2 or len(keys) != vectors.shape[0]:
+            return
+        self._keys = keys
+        self._index = {key: i for i, key in enumerate(keys)}
+        self._vectors = vectors
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def missing_texts(self, texts: list) -> list:
+        """Retorna os textos distintos que ainda não possuem embedding armazenado."""
+        missing = {}
+        for text in texts:
+            key = content_hash(text, self.model)
+            if key not in self._index and key not in missing:
+                missing[key] = text
+        return list(missing.values())
+
+    def sync(self, texts: list, embed_fn) -> np.ndarray:
+        """
+        Garante um embedding para cada texto e retorna a matriz na mesma ordem de `texts`.
+
+        `embed_fn` pode devolver None para textos que não conseguiu indexar (ex: um lote que
+        falhou). Esses textos recebem um vetor nulo na matriz e não são gravados, de modo que
+        serão reenviados na próxima sincronização; os demais são persistidos normalmente.
+
+        Args:
+            texts (list): Textos a indexar (uma linha da base de conhecimento cada).
+            embed_fn (callable): Recebe uma lista de textos e retorna seus embeddings.
+        """
+        keys = [content_hash(text, self.model) for text in texts]
+        pending = self.missing_texts(texts)
+
+        if not pending and keys == self._keys:
+            # Caso mais comum após um restart: nenhuma chamada à API e nenhuma cópia.
+            return self._vectors
+
+        new_vectors = {}
+        if pending:
+            embedded = embed_fn(pending)
+            if len(embedded) != len(pending):
+                raise ValueError(f"A API retornou {len(embedded)} embeddings para {len(pending)} textos.")
+            new_vectors = {
+                content_hash(text, self.model): np.asarray(vector, dtype=np.float32)
+                for text, vector in zip(pending, embedded) if vector is not None
+            }
+
+        unique_keys = [key for key in dict.fromkeys(keys) if key in new_vectors or key in self._index]
+        if not unique_keys:
+            raise ValueError("Nenhum embedding da base de conhecimento pôde ser gerado.")
+        rows = [new_vectors[key] if key in new_vectors else self._vectors[self._index[key]] for key in unique_keys]
+        matrix = np.ascontiguousarray(np.vstack(rows), dtype=np.float32)
+        self._save(unique_keys, matrix)
+
+        if unique_keys == keys:
+            return matrix
+        position = {key: i for i, key in enumerate(unique_keys)}
+        rows_index = np.array([position.get(key, -1) for key in keys])
+        result = matrix[np.maximum(rows_index, 0)]
+        result[rows_index < 0] = 0.0
+        return result
+
+    def _save(self, keys: list, matrix: np.ndarray) -> None:
+        """Grava o store de forma atômica, descartando vetores de textos que saíram da base."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Libera o memory-map antigo antes de substituir o arquivo.
+        self._vectors = None
+        tmp_vectors = self.vectors_path.with_suffix(".npy.tmp")
+        tmp_meta = self.meta_path.with_suffix(".json.tmp")
+        with open(tmp_vectors, "wb") as f:
+            np.save(f, matrix)
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump({"model": self.model, "keys": keys}, f)
+        os.replace(tmp_vectors, self.vectors_path)
+        os.replace(tmp_meta, self.meta_path)
+        self._keys = keys
+        self._index = {key: i for i, key in enumerate(keys)}
+        self._vectors = matrix
+
+
+class QueryEmbeddingCache:
+    """
+    Cache LRU (em memória, com persistência opcional em disco) para embeddings de consultas.
+
+    É compartilhado entre as sessões do Streamlit, por isso o acesso é protegido por um lock.
+    Os contadores de acertos e falhas ficam disponíveis em `stats()`.
+    """
+    def __init__(self, model: str = EMBEDDING_MODEL, maxsize: int = 512, directory: str | None = None):
+        self.model = model
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._path = None
+        if directory:
+            slug = model.replace("/", "_")
+            self._path = Path(directory) / f"queries_{slug}"
+            self._load()
+
+    def _load(self) -> None:
+        vectors_path = self._path.with_suffix(".npy")
+        meta_path = self._path.with_suffix(".json")
+        if not (vectors_path.exists() and meta_path.exists()):
+            return
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            vectors = np.load(vectors_path)
+        except (OSError, ValueError):
+            return
+        keys = meta.get("keys", [])
+        if meta.get("model") != self.model or len(keys) != len(vectors):
+            return
+        for key, vector in list(zip(keys, vectors))[-self.maxsize:]:
+            self._entries[key] = vector
+
+    def _save(self) -> None:
+        if self._path is None:
+            return
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        keys = list(self._entries.keys())
+        vectors = np.vstack(list(self._entries.values())) if keys else np.empty((0, 0), dtype=np.float32)
+        tmp_vectors = self._path.with_suffix(".npy.tmp")
+        tmp_meta = self._path.with_suffix(".json.tmp")
+        with open(tmp_vectors, "wb") as f:
+            np.save(f, vectors)
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump({"model": self.model, "keys": keys}, f)
+        os.replace(tmp_vectors, self._path.with_suffix(".npy"))
+        os.replace(tmp_meta, self._path.with_suffix(".json"))
+
+    def get_many(self, texts: list, embed_fn, count_stats: bool = True) -> np.ndarray:
+        """
+        Retorna os embeddings de `texts` (uma linha por texto). As consultas ausentes
+        do cache são embutidas em uma única chamada a `embed_fn`.
+        """
+        keys = [content_hash(text, self.model) for text in texts]
+        found = {}
+        missing = {}
+        with self._lock:
+            for key, text in zip(keys, texts):
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[key] = self._entries[key]
+                elif key not in missing:
+                    missing[key] = text
+            if count_stats:
+                self.hits += len(keys) - len(missing)
+                self.misses += len(missing)
+
+        if missing:
+            embedded = np.asarray(embed_fn(list(missing.values())), dtype=np.float32)
+            found.update(zip(missing.keys(), embedded))
+            with self._lock:
+                for key in missing:
+                    self._entries[key] = found[key]
+                    self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                self._save()
+
+        return np.vstack([found[key] for key in keys])
+
+    def get(self, text: str, embed_fn) -> np.ndarray:
+        """Retorna o embedding (1 x dimensão) de uma única consulta."""
+        return self.get_many([text], embed_fn)
+
+    def warm(self, texts: list, embed_fn) -> None:
+        """Pré-carrega consultas conhecidas sem afetar os contadores de acertos e falhas."""
+        self.get_many(texts, embed_fn, count_stats=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self._entries),
+                "maxsize": self.maxsize
+            }
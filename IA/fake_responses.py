@@ -0,0 +1,145 @@
+import ast
+import hashlib
+import json
+import re
+
+from utils.calculator import calculate_shift_breakdown
+from utils.nbr_rules import load_rule_engine
+
+# Trechos que identificam cada prompt de IA/prompts.py
+CALCULATION_MARKER = "Cenário de Entrada para Análise"
+REPORT_MARKER = "Relatório de Dimensionamento de Brigada de Incêndio"
+NAMES_MARKER = '"nomes"'
+
+_FIRST_NAMES = ["ANA", "BRUNO", "CARLA", "DIEGO", "ELAINE", "FABIO", "GISELE", "HUGO", "IARA", "JOAO"]
+_LAST_NAMES = ["ALMEIDA", "BARBOSA", "COSTA", "DIAS", "FERREIRA", "GOMES", "LIMA", "MOURA", "SOUZA", "TEIXEIRA"]
+
+# Linha com aparência de nome próprio: palavras com inicial maiúscula e conectivos (da, de, dos...)
+_NAME_LINE = re.compile(r"^[A-ZÀ-Ý][A-Za-zÀ-ÿ']+(?: (?:d[aeo]s?|e|[A-ZÀ-Ý][A-Za-zÀ-ÿ']+))+$")
+
+# Palavras de títulos e cabeçalhos de atestados, que não fazem parte de nomes
+_HEADER_WORDS = {"ATESTADO", "CERTIFICADO", "TREINAMENTO", "BRIGADA", "INCÊNDIO", "PARTICIPANTES", "INSTRUTOR"}
+
+
+def _scenario_value(prompt: str, label: str) -> str:
+    match = re.search(rf"^\s*- {label}: (.*)$", prompt, re.MULTILINE)
+    return match.group(1).strip() if match else ""
+
+
+def _calculation_response(prompt: str) -> str:
+    """JSON do cálculo no formato pedido pelo prompt, calculado pelo motor de regras local."""
+    divisao = _scenario_value(prompt, "Divisão da Planta")
+    risco = _scenario_value(prompt, "Nível de Risco")
+    try:
+        populations = [int(pop) for pop in ast.literal_eval(_scenario_value(prompt, "População por Turno") or "[]")]
+    except (ValueError, SyntaxError):
+        populations = []
+
+    norma = load_rule_engine().norma
+    calculo_por_turno = []
+    for i, pop in enumerate(populations, start=1):
+        try:
+            shift = calculate_shift_breakdown(divisao, risco, pop)
+        except ValueError:
+            shift = {"calculo_base": 0, "calculo_acrescimo": 0, "total_turno": 0}
+        calculo_por_turno.append({
+            "turno": i,
+            "populacao": pop,
+            "regra_base_aplicada": f"{norma}, Tabela A.1: Divisão {divisao}, Risco {risco}.",
+            "calculo_base": shift["calculo_base"],
+            "regra_acrescimo_aplicada": (f"{norma}, Tabela A.1, Nota 5." if shift["calculo_acrescimo"] > 0
+                                         else "Não aplicável"),
+            "calculo_acrescimo": shift["calculo_acrescimo"],
+            "total_turno": shift["total_turno"]
+        })
+
+    totais = [t["total_turno"] for t in calculo_por_turno]
+    return json.dumps({
+        "dados_da_instalacao": {
+            "razao_social": _scenario_value(prompt, "Razão Social"),
+            "imovel": _scenario_value(prompt, "Imóvel")
+        },
+        "calculo_por_turno": calculo_por_turno,
+        "resumo_final": {
+            "total_geral_brigadistas": sum(totais),
+            "maior_turno_necessidade": max(totais) if totais else 0
+        }
+    }, ensure_ascii=False)
+
+
+def _report_response(prompt: str) -> str:
+    """Relatório em Markdown com as seções pedidas, a partir do JSON embutido no prompt."""
+    match = re.search(r"```json\s*(\{.*?\})\s*```", prompt, re.DOTALL)
+    calculation = json.loads(match.group(1)) if match else {}
+    instalacao = calculation.get("dados_da_instalacao", {})
+    turnos = calculation.get("calculo_por_turno", [])
+    resumo = calculation.get("resumo_final", {})
+
+    table = ["| Turno | População | Base | Acréscimo | Total Turno |", "|---|---|---|---|---|"]
+    table += [f"| {t.get('turno')} | {t.get('populacao')} | {t.get('calculo_base')} | "
+              f"{t.get('calculo_acrescimo')} | **{t.get('total_turno')}** |" for t in turnos]
+    regras = sorted({t.get(key) for t in turnos for key in ("regra_base_aplicada", "regra_acrescimo_aplicada")
+                     if t.get(key) and t.get(key) != "Não aplicável"})
+
+    return "\n".join([
+        "### Relatório de Dimensionamento de Brigada de Incêndio",
+        "",
+        "**1. Introdução**",
+        "",
+        f"Este relatório dimensiona a brigada de incêndio da instalação {instalacao.get('imovel', 'N/A')}, "
+        f"de {instalacao.get('razao_social', 'N/A')}.",
+        "",
+        "**2. Metodologia Aplicada**",
+        "",
+        "O cálculo segue a ABNT NBR 14276, turno a turno, considerando a população fixa, "
+        "a divisão da edificação e o nível de risco.",
+        "",
+        "**3. Detalhamento do Cálculo**",
+        "",
+        *table,
+        "",
+        "**4. Conclusão**",
+        "",
+        f"São necessários **{resumo.get('total_geral_brigadistas', 0)}** brigadistas no total, com efetivo "
+        f"mínimo de **{resumo.get('maior_turno_necessidade', 0)}** por turno.",
+        "",
+        "**5. Referências Normativas**",
+        "",
+        *(f"- {regra}" for regra in regras),
+        "",
+    ])
+
+
+def _names_from_text(prompt: str) -> list:
+    """Linhas do texto do documento (entre os separadores '---') que parecem nomes próprios."""
+    parts = prompt.split("---")
+    document = parts[1] if len(parts) >= 3 else ""
+    return [line.strip() for line in document.splitlines()
+            if _NAME_LINE.match(line.strip()) and not _HEADER_WORDS & set(line.upper().split())]
+
+
+def _names_from_pdf(pdf_bytes: bytes) -> list:
+    """De 1 a 5 nomes derivados do hash do PDF, sempre os mesmos para o mesmo arquivo."""
+    digest = hashlib.sha256(pdf_bytes).digest()
+    return [f"{_FIRST_NAMES[digest[2 * i] % 10]} {_LAST_NAMES[digest[2 * i + 1] % 10]}"
+            for i in range(1 + digest[-1] % 5)]
+
+
+def respond_to_prompt(contents) -> str:
+    """
+    Resposta padrão do FakeGeminiBackend, de acordo com o prompt recebido: JSON do cálculo
+    da brigada, lista de nomes de um atestado (texto ou PDF) ou relatório em Markdown.
+    Prompts não reconhecidos recebem um JSON vazio.
+    """
+    parts = contents if isinstance(contents, list) else [contents]
+    prompt = "\n".join(part for part in parts if isinstance(part, str))
+    pdf_bytes = b"".join(part["data"] for part in parts if isinstance(part, dict) and "data" in part)
+
+    if CALCULATION_MARKER in prompt:
+        return _calculation_response(prompt)
+    if REPORT_MARKER in prompt:
+        return _report_response(prompt)
+    if NAMES_MARKER in prompt:
+        return json.dumps({"nomes": _names_from_pdf(pdf_bytes) if pdf_bytes else _names_from_text(prompt)},
+                          ensure_ascii=False)
+    return json.dumps({})
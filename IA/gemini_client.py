@@ -0,0 +1,425 @@
+import asyncio
+import hashlib
+import queue
+import random
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from utils.simulation import LatencyModel
+
+from .fake_responses import respond_to_prompt
+
+try:
+    from google.api_core import exceptions as google_exceptions
+    RETRYABLE_EXCEPTIONS = (
+        google_exceptions.ResourceExhausted,
+        google_exceptions.TooManyRequests,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.InternalServerError,
+        google_exceptions.DeadlineExceeded,
+    )
+except ImportError:  # google-api-core ausente: apenas erros de rede/timeout são repetidos
+    RETRYABLE_EXCEPTIONS = ()
+
+RETRYABLE_EXCEPTIONS = RETRYABLE_EXCEPTIONS + (TimeoutError, asyncio.TimeoutError, ConnectionError)
+
+
+class ClientMetrics:
+    """Contadores de chamadas, erros, novas tentativas e latências por operação."""
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._window = window
+        self._ops = {}
+
+    def _op(self, name: str) -> dict:
+        if name not in self._ops:
+            self._ops[name] = {"calls": 0, "errors": 0, "retries": 0, "timeouts": 0,
+                               "latencies": deque(maxlen=self._window)}
+        return self._ops[name]
+
+    def record(self, name: str, latency: float, ok: bool) -> None:
+        with self._lock:
+            op = self._op(name)
+            op["calls"] += 1
+            op["latencies"].append(latency)
+            if not ok:
+                op["errors"] += 1
+
+    def record_retry(self, name: str, timeout: bool = False) -> None:
+        with self._lock:
+            op = self._op(name)
+            op["retries"] += 1
+            if timeout:
+                op["timeouts"] += 1
+
+    def record_value(self, name: str, value: float) -> None:
+        """Registra uma medida avulsa (ex: tempo até o primeiro trecho de um streaming)."""
+        with self._lock:
+            self._op(name)["latencies"].append(value)
+
+    def snapshot(self) -> dict:
+        """Resumo por operação, com latências p50/p95 em milissegundos."""
+        with self._lock:
+            summary = {}
+            for name, op in self._ops.items():
+                latencies = np.array(op["latencies"], dtype=float) * 1000
+                summary[name] = {
+                    "calls": op["calls"], "errors": op["errors"],
+                    "retries": op["retries"], "timeouts": op["timeouts"],
+                    "p50_ms": float(np.percentile(latencies, 50)) if latencies.size else 0.0,
+                    "p95_ms": float(np.percentile(latencies, 95)) if latencies.size else 0.0,
+                }
+            return summary
+
+
+class GenAIBackend:
+    """Backend real, baseado na biblioteca google-generativeai."""
+    def __init__(self, api_key: str):
+        import google.generativeai as genai
+        self._genai = genai
+        genai.configure(api_key=api_key)
+
+    def embed_content(self, model: str, texts: list, task_type: str, timeout: float | None = None) -> list:
+        result = self._genai.embed_content(
+            model=model, content=texts, task_type=task_type,
+            request_options={"timeout": timeout} if timeout else None
+        )
+        return result['embedding']
+
+    def generate_content(self, model: str, contents, generation_config=None, safety_settings=None,
+                         timeout: float | None = None, stream: bool = False):
+        generative_model = self._genai.GenerativeModel(model, safety_settings=safety_settings)
+        return generative_model.generate_content(
+            contents, generation_config=generation_config, stream=stream,
+            request_options={"timeout": timeout} if timeout else None
+        )
+
+
+class FakeResponse:
+    """Resposta mínima com a mesma interface usada de um GenerateContentResponse."""
+    def __init__(self, text: str):
+        self.text = text
+        self.parts = [text] if text else []
+        self.prompt_feedback = None
+
+
+class FakeGeminiBackend:
+    """
+    Modelo local e determinístico para testes e benchmarks: embeddings derivados do hash do
+    texto e respostas geradas por uma função `responder(contents) -> str`. A padrão reconhece
+    os prompts do app e responde a cada um no formato esperado (ver IA/fake_responses.py).
+
+    `latency` e `latency_jitter` (segundos) simulam o tempo de resposta da API e `error_rate`
+    a fração de chamadas que falham com FakeServiceError. A sequência de atrasos e falhas é
+    derivada de `seed`, portanto é reprodutível entre execuções (ver utils.simulation).
+    """
+    def __init__(self, dimension: int = 768, responder=None, latency: float = 0.0,
+                 latency_jitter: float = 0.0, error_rate: float = 0.0, seed: int = 0):
+        self.dimension = dimension
+        self.responder = responder or respond_to_prompt
+        self.latency_model = LatencyModel(latency, latency_jitter, error_rate, seed)
+
+    @property
+    def calls(self) -> dict:
+        return {"embed": 0, "generate": 0, **self.latency_model.calls}
+
+    def _vector(self, text: str) -> list:
+        seed = int.from_bytes(hashlib.sha256(str(text).encode("utf-8")).digest()[:8], "little")
+        return np.random.default_rng(seed).standard_normal(self.dimension).astype(np.float32).tolist()
+
+    def embed_content(self, model: str, texts: list, task_type: str, timeout: float | None = None) -> list:
+        self.latency_model.simulate("embed")
+        return [self._vector(text) for text in texts]
+
+    def generate_content(self, model: str, contents, generation_config=None, safety_settings=None,
+                         timeout: float | None = None, stream: bool = False):
+        self.latency_model.simulate("generate")
+        text = self.responder(contents)
+        if stream:
+            # Entrega o texto em trechos, como o streaming do modelo real.
+            return [FakeResponse(text[i:i + 64]) for i in range(0, len(text), 64)]
+        return FakeResponse(text)
+
+
+class AsyncRateLimiter:
+    """
+    Limita o ritmo de início das chamadas a `requests_per_minute`, espaçando-as uniformemente.
+    Sem limite configurado (None ou 0), não há espera.
+    """
+    def __init__(self, requests_per_minute: float | None = None):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self._next_start = 0.0
+        self._lock = None
+
+    async def acquire(self) -> None:
+        if not self.interval:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_start - now
+            self._next_start = max(now, self._next_start) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+def split_into_batches(texts: list, max_items: int, max_chars: int | None = None) -> list:
+    """
+    Divide `texts` em lotes consecutivos com no máximo `max_items` textos e, se informado,
+    `max_chars` caracteres (um texto maior que o limite forma um lote sozinho).
+
+    Returns:
+        list: Pares (início, fim) de cada lote, em ordem.
+    """
+    batches = []
+    start = 0
+    chars = 0
+    for i, text in enumerate(texts):
+        size = len(text)
+        if i > start and (i - start >= max_items or (max_chars and chars + size > max_chars)):
+            batches.append((start, i))
+            start, chars = i, 0
+        chars += size
+    if start < len(texts):
+        batches.append((start, len(texts)))
+    return batches
+
+
+class _LoopThread:
+    """Event loop asyncio dedicado, executado em uma thread daemon e compartilhado pelo processo."""
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="gemini-client-loop", daemon=True)
+        self._thread.start()
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+
+class GeminiClient:
+    """
+    Camada única de acesso ao Gemini, com interface assíncrona e wrappers síncronos.
+
+    - Prazo máximo (timeout) por chamada;
+    - Novas tentativas com backoff exponencial e jitter para erros transitórios (429, 5xx, timeouts);
+    - Semáforo que limita o número de chamadas simultâneas em todo o processo;
+    - Métricas de latência e erros por operação (`metrics.snapshot()`).
+
+    Todas as corrotinas rodam no mesmo event loop em segundo plano, o que permite chamar os
+    wrappers síncronos a partir das threads de script do Streamlit.
+    """
+    def __init__(self, backend, timeout: float = 60.0, max_retries: int = 3, base_delay: float = 0.5,
+                 max_delay: float = 8.0, max_concurrency: int = 4):
+        self.backend = backend
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_concurrency = max_concurrency
+        self.metrics = ClientMetrics()
+        self._runner = _LoopThread()
+        self._semaphore = None
+
+    def _backoff(self, attempt: int) -> float:
+        """Backoff exponencial com jitter completo."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def _run_in_slot(self, fn, *args, timeout: float, **kwargs):
+        """
+        Executa `fn` em uma thread ocupando uma vaga do semáforo. O prazo é repassado à API
+        (`timeout`) e também limita a espera aqui; se ele vencer antes, a vaga só é liberada
+        quando a thread terminar, de modo que o limite de chamadas simultâneas continua valendo.
+        """
+        await self._semaphore.acquire()
+        task = asyncio.ensure_future(asyncio.to_thread(fn, *args, timeout=timeout, **kwargs))
+
+        def release(finished) -> None:
+            self._semaphore.release()
+            if not finished.cancelled():
+                finished.exception()  # Evita o aviso de exceção não lida de chamadas abandonadas
+
+        task.add_done_callback(release)
+        return await asyncio.wait_for(asyncio.shield(task), timeout)
+
+    async def _call(self, op_name: str, fn, *args, timeout: float | None = None,
+                    limiter: AsyncRateLimiter | None = None, **kwargs):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        deadline = timeout or self.timeout
+        attempt = 0
+        while True:
+            if limiter is not None:
+                await limiter.acquire()
+            start = time.perf_counter()
+            try:
+                result = await self._run_in_slot(fn, *args, timeout=deadline, **kwargs)
+                self.metrics.record(op_name, time.perf_counter() - start, ok=True)
+                return result
+            except RETRYABLE_EXCEPTIONS as e:
+                self.metrics.record(op_name, time.perf_counter() - start, ok=False)
+                if attempt >= self.max_retries:
+                    raise
+                is_timeout = isinstance(e, (TimeoutError, asyncio.TimeoutError))
+                self.metrics.record_retry(op_name, timeout=is_timeout)
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+            except Exception:
+                self.metrics.record(op_name, time.perf_counter() - start, ok=False)
+                raise
+
+    async def _in_loop(self, coro):
+        """Executa a corrotina no loop do cliente, mesmo se chamada a partir de outro loop."""
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._runner.loop:
+            return await coro
+        return await asyncio.wrap_future(self._runner.submit(coro))
+
+    # --- Interface assíncrona ---
+
+    async def aembed(self, texts: list, task_type: str, model: str, timeout: float | None = None) -> list:
+        return await self._in_loop(self._call("embed", self.backend.embed_content, model, texts, task_type, timeout=timeout))
+
+    async def agenerate(self, contents, model: str, generation_config=None, safety_settings=None,
+                        timeout: float | None = None):
+        return await self._in_loop(self._call(
+            "generate", self.backend.generate_content, model, contents,
+            generation_config=generation_config, safety_settings=safety_settings, timeout=timeout
+        ))
+
+    async def aembed_batches(self, texts: list, task_type: str, model: str, progress=None, **options) -> list:
+        """Versão assíncrona de `embed_batches`, executada no loop do cliente (ver `_embed_batches`)."""
+        return await self._in_loop(self._embed_batches(texts, task_type, model, progress=progress, **options))
+
+    async def _embed_batches(self, texts: list, task_type: str, model: str, batch_size: int = 100,
+                             max_batch_chars: int | None = None, requests_per_minute: float | None = None,
+                             retry_rounds: int = 1, timeout: float | None = None, progress=None) -> list:
+        """
+        Gera embeddings de uma lista grande de textos em lotes enviados em paralelo (limitados
+        pelo semáforo do cliente e, opcionalmente, a `requests_per_minute`).
+
+        Cada lote tem suas próprias novas tentativas; os lotes que ainda assim falharem são
+        reenviados por até `retry_rounds` rodadas extras. Os textos de lotes que falharem em
+        todas as rodadas ficam com None no resultado, sem descartar os demais.
+
+        Args:
+            progress (callable, opcional): Chamado com (textos_concluídos, total) a cada lote.
+
+        Returns:
+            list: Um embedding (ou None) para cada texto, na mesma ordem de `texts`.
+        """
+        batches = split_into_batches(texts, batch_size, max_batch_chars)
+        limiter = AsyncRateLimiter(requests_per_minute)
+        results = [None] * len(texts)
+        completed = 0
+
+        async def run_batch(start: int, end: int) -> None:
+            nonlocal completed
+            vectors = await self._call(
+                "embed_batch", self.backend.embed_content, model, texts[start:end], task_type,
+                timeout=timeout, limiter=limiter
+            )
+            if len(vectors) != end - start:
+                raise ValueError(f"A API retornou {len(vectors)} embeddings para {end - start} textos.")
+            results[start:end] = vectors
+            completed += end - start
+            if progress:
+                progress(completed, len(texts))
+
+        pending = batches
+        for _ in range(retry_rounds + 1):
+            outcomes = await asyncio.gather(*(run_batch(start, end) for start, end in pending), return_exceptions=True)
+            pending = [batch for batch, outcome in zip(pending, outcomes) if isinstance(outcome, Exception)]
+            if not pending:
+                break
+        return results
+
+    # --- Streaming ---
+
+    def stream_generate(self, contents, model: str, generation_config=None, safety_settings=None,
+                        timeout: float | None = None):
+        """
+        Gera texto em streaming, produzindo cada trecho assim que o modelo o envia.
+        Ocupa uma vaga do semáforo durante todo o streaming. Erros antes do primeiro trecho
+        são repetidos com backoff; depois disso são propagados. O tempo até o primeiro
+        trecho é registrado na métrica 'generate_stream_ttfb'.
+        """
+        deadline = timeout or self.timeout
+        self.run(self._acquire_slot())
+        try:
+            attempt = 0
+            while True:
+                start = time.perf_counter()
+                first_chunk = True
+                try:
+                    response = self.backend.generate_content(
+                        model, contents, generation_config=generation_config,
+                        safety_settings=safety_settings, timeout=deadline, stream=True
+                    )
+                    for chunk in response:
+                        text = getattr(chunk, "text", "")
+                        if first_chunk:
+                            self.metrics.record_value("generate_stream_ttfb", time.perf_counter() - start)
+                            first_chunk = False
+                        if text:
+                            yield text
+                    self.metrics.record("generate_stream", time.perf_counter() - start, ok=True)
+                    return
+                except RETRYABLE_EXCEPTIONS as e:
+                    self.metrics.record("generate_stream", time.perf_counter() - start, ok=False)
+                    if not first_chunk or attempt >= self.max_retries:
+                        raise
+                    self.metrics.record_retry("generate_stream", timeout=isinstance(e, (TimeoutError, asyncio.TimeoutError)))
+                    time.sleep(self._backoff(attempt))
+                    attempt += 1
+                except Exception:
+                    self.metrics.record("generate_stream", time.perf_counter() - start, ok=False)
+                    raise
+        finally:
+            self._runner.loop.call_soon_threadsafe(self._semaphore.release)
+
+    async def _acquire_slot(self) -> None:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        await self._semaphore.acquire()
+
+    # --- Wrappers síncronos ---
+
+    def run(self, coro):
+        """Executa uma corrotina no loop do cliente e aguarda o resultado."""
+        return self._runner.submit(coro).result()
+
+    def embed(self, texts: list, task_type: str, model: str, timeout: float | None = None) -> list:
+        return self.run(self._call("embed", self.backend.embed_content, model, texts, task_type, timeout=timeout))
+
+    def embed_batches(self, texts: list, task_type: str, model: str, progress=None, **options) -> list:
+        """
+        Versão síncrona de `aembed_batches`. O callback de progresso é executado na thread que
+        chamou o método (e não no loop do cliente), o que permite atualizar elementos do Streamlit.
+        """
+        updates = queue.Queue()
+        future = self._runner.submit(self._embed_batches(
+            texts, task_type, model, progress=lambda done, total: updates.put((done, total)), **options
+        ))
+        while True:
+            try:
+                done, total = updates.get(timeout=0.1)
+            except queue.Empty:
+                if future.done():
+                    break
+                continue
+            if progress:
+                progress(done, total)
+        return future.result()
+
+    def generate(self, contents, model: str, generation_config=None, safety_settings=None, timeout: float | None = None):
+        return self.run(self._call(
+            "generate", self.backend.generate_content, model, contents,
+            generation_config=generation_config, safety_settings=safety_settings, timeout=timeout
+        ))
@@ -0,0 +1,39 @@
+import hashlib
+import io
+import re
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # sem pypdf, todos os PDFs são enviados como bytes ao modelo
+    PdfReader = None
+
+# Quantidade mínima de letras para considerar que o PDF tem uma camada de texto utilizável
+MIN_TEXT_LETTERS = 200
+
+
+def pdf_content_hash(pdf_bytes: bytes) -> str:
+    """Hash do conteúdo do PDF, usado para reconhecer arquivos já processados."""
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+
+def extract_text_layer(pdf_bytes: bytes) -> str:
+    """
+    Extrai localmente a camada de texto do PDF, com espaços compactados.
+    Retorna uma string vazia para PDFs digitalizados (sem texto) ou ilegíveis.
+    """
+    if PdfReader is None:
+        return ""
+    try:
+        reader = PdfReader(io.BytesIO(pdf_bytes))
+        pages = [page.extract_text() or "" for page in reader.pages]
+    except Exception:
+        return ""
+    text = "\n".join(pages)
+    # Compacta espaços repetidos, preservando as quebras de linha (uma por nome em listas).
+    text = re.sub(r"[ \t\f\v]+", " ", text)
+    return re.sub(r"\s*\n\s*", "\n", text).strip()
+
+
+def has_usable_text(text: str, min_letters: int = MIN_TEXT_LETTERS) -> bool:
+    """Indica se o texto extraído é suficiente para dispensar o envio do PDF original."""
+    return sum(c.isalpha() for c in text) >= min_letters
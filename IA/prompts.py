@@ -1,5 +1,10 @@
 import pandas as pd
 import json 
+import hashlib
+import inspect
+import math
+from string import Template
+from functools import lru_cache
 
 def get_report_generation_prompt(calculation_json: dict) -> str:
     """
@@ -81,52 +86,64 @@ def get_pdf_extraction_prompt() -> str:
     """
 
 
-
-def get_brigade_calculation_prompt(ia_context: dict, knowledge_context: str) -> str:
+def get_pdf_text_extraction_prompt(pdf_text: str) -> str:
     """
-    Cria um prompt avançado e robusto para que a IA execute o cálculo da brigada.
-    Este prompt inclui:
-    - Persona e tarefa claras.
-    - Contexto completo da instalação.
-    - Base de conhecimento (RAG).
-    - Instruções de raciocínio passo a passo (Chain of Thought).
-    - Análise de erros comuns para guiar o modelo (Few-shot error analysis).
-    - Formato de saída JSON estrito e obrigatório.
+    Cria o prompt para extrair nomes a partir do texto já extraído localmente de um atestado,
+    evitando o envio do PDF completo ao modelo.
     """
-    # Extrai os dados do contexto para inserção no prompt
-    installation = ia_context.get("installation_info", {})
-    divisao = ia_context.get("division")
-    risco = ia_context.get("risk")
-    populations = ia_context.get("populations", [])
+    return f"""
+    Sua tarefa é analisar o texto abaixo, extraído de um atestado ou certificado de treinamento de brigada de incêndio.
+    Identifique a lista de todos os participantes treinados listados no documento.
 
-    # Captura os dados da instalação para usar no prompt e no exemplo de saída
-    razao_social_exemplo = installation.get("Razao_Social", "N/A")
-    imovel_exemplo = installation.get("Imovel", "N/A")
+    **Texto do Documento:**
+    ---
+    {pdf_text}
+    ---
 
-    return f"""
+    Retorne sua resposta estritamente no seguinte formato JSON, contendo uma única chave "nomes" com uma lista de strings:
+
+    {{"nomes": ["NOME COMPLETO DO PARTICIPANTE 1", "NOME COMPLETO DO PARTICIPANTE 2", "NOME COMPLETO DO PARTICIPANTE 3"]}}
+
+    Não inclua números de matrícula, CPF, títulos (como "Sr." ou "Dra."), ou qualquer outro texto. Apenas os nomes completos.
+    Se nenhum nome for encontrado, retorne uma lista vazia.
+    """
+
+
+# --- Prompt de cálculo da brigada: partes estáticas pré-compiladas ---
+# As partes fixas ficam em templates no nível do módulo; a cada chamada apenas os valores da
+# instalação e o contexto recuperado são substituídos. O hash dos templates e do código que os
+# preenche identifica a versão do prompt (usada no cache de resultados).
+
+_CALCULATION_PERSONA = """
     **Persona:** Você é um Engenheiro de Segurança do Trabalho especialista em normas, altamente preciso e metódico. Sua tarefa é gerar um relatório técnico em formato JSON com o cálculo de brigadistas para múltiplos turnos, seguindo rigorosamente as regras da Base de Conhecimento.
 
-    **Base de Conhecimento (Sua ÚNICA fonte de regras):**
+"""
+
+_CALCULATION_KNOWLEDGE_TEMPLATE = Template("""    **Base de Conhecimento (Sua ÚNICA fonte de regras):**
     ---
-    {knowledge_context}
+    $knowledge_context
     ---
 
-    **Cenário de Entrada para Análise:**
-    - Razão Social: {razao_social_exemplo}
-    - Imóvel: {imovel_exemplo}
-    - Divisão da Planta: {divisao}
-    - Nível de Risco: {risco}
-    - População por Turno: {populations}
+""")
+
+_CALCULATION_SCENARIO_TEMPLATE = Template("""    **Cenário de Entrada para Análise:**
+    - Razão Social: $razao_social
+    - Imóvel: $imovel
+    - Divisão da Planta: $divisao
+    - Nível de Risco: $risco
+    - População por Turno: $populations
+
+""")
 
-    **Sua Tarefa (Raciocínio Passo a Passo Obrigatório):**
+_CALCULATION_INSTRUCTIONS_TEMPLATE = Template("""    **Sua Tarefa (Raciocínio Passo a Passo Obrigatório):**
     Você deve calcular o número de brigadistas para cada turno. Siga **EXATAMENTE** este processo de raciocínio para CADA TURNO:
 
     **ETAPA 1: CÁLCULO BASE**
-    1.  **Busque a Regra Base:** Encontre na Base de Conhecimento a regra específica para a **população base (até 10 pessoas)** da Divisão '{divisao}' e Risco '{risco}'. Esta é a sua `regra_base_aplicada`.
+    1.  **Busque a Regra Base:** Encontre na Base de Conhecimento a regra específica para a **população base (até 10 pessoas)** da Divisão '$divisao' e Risco '$risco'. Esta é a sua `regra_base_aplicada`.
     2.  **Calcule o Número Base:** Se a regra for um número, use-o. Se a regra for 'Todos', o número base (`calculo_base`) é 10.
 
     **ETAPA 2: CÁLCULO DE ACRÉSCIMO (Apenas para população > 10)**
-    3.  **Busque a Regra de Acréscimo:** Encontre na Base de Conhecimento a regra geral de **acréscimo** para o Risco '{risco}'. Esta é a sua `regra_acrescimo_aplicada`.
+    3.  **Busque a Regra de Acréscimo:** Encontre na Base de Conhecimento a regra geral de **acréscimo** para o Risco '$risco'. Esta é a sua `regra_acrescimo_aplicada`.
     4.  **Calcule o Acréscimo:** Calcule `(população_do_turno - 10) / fator_de_risco`. **ARREDONDE QUALQUER RESULTADO DECIMAL PARA CIMA**.
     
     **ETAPA 3: CÁLCULO FINAL DO TURNO**
@@ -137,41 +154,189 @@ def get_brigade_calculation_prompt(ia_context: dict, knowledge_context: str) ->
     - **ERRO DE REGRA:** NÃO confunda a "Regra Base" com a "Regra de Acréscimo". Elas são duas regras diferentes e devem ser buscadas e citadas separadamente.
     - **ERRO DE ARREDONDAMENTO:** Um cálculo de `11 / 10` resulta em `1.1`. **NÃO ARREDONDE PARA BAIXO (1)**. O correto é **SEMPRE ARREDONDAR PARA CIMA (2)**.
 
-    **Formato de Saída (JSON ESTRITO OBRIGATÓRIO):**
+""")
+
+_CALCULATION_OUTPUT_TEMPLATE = Template("""    **Formato de Saída (JSON ESTRITO OBRIGATÓRIO):**
     Após realizar o raciocínio para TODOS os turnos, compile os resultados APENAS no seguinte formato JSON. Não inclua nenhum texto antes ou depois do JSON.
     **CRÍTICO: A seção 'dados_da_instalacao' DEVE conter as chaves 'razao_social' e 'imovel'.**
 
     ```json
-    {{
-      "dados_da_instalacao": {{
-        "razao_social": "{razao_social_exemplo}",
-        "imovel": "{imovel_exemplo}"
-      }},
+    {
+      "dados_da_instalacao": {
+        "razao_social": "$razao_social",
+        "imovel": "$imovel"
+      },
       "calculo_por_turno": [
-        {{
+        {
           "turno": 1,
-          "populacao": {populations[0] if len(populations) > 0 else 0},
+          "populacao": $pop_turno1,
           "regra_base_aplicada": "A regra da Base de Conhecimento específica para a população base (até 10 pessoas).",
           "calculo_base": <numero_base_brigadistas>,
           "regra_acrescimo_aplicada": "A regra da Base de Conhecimento geral para o acréscimo, ou 'Não aplicável'.",
           "calculo_acrescimo": <numero_adicional_brigadistas>,
           "total_turno": <total_brigadistas_no_turno>
-        }},
-        {{
+        },
+        {
           "turno": 2,
-          "populacao": {populations[1] if len(populations) > 1 else 0},
+          "populacao": $pop_turno2,
           "regra_base_aplicada": "...",
           "calculo_base": <...>,
           "regra_acrescimo_aplicada": "...",
           "calculo_acrescimo": <...>,
           "total_turno": <...>
-        }}
+        }
       ],
-      "resumo_final": {{
+      "resumo_final": {
         "total_geral_brigadistas": <soma_de_todos_os_'total_turno'>,
         "maior_turno_necessidade": <o_maior_valor_entre_os_'total_turno'>
-      }}
-    }}
+      }
+    }
     ```
+    """)
+
+# Estimativa simples de tokens (~4 caracteres por token em português)
+CHARS_PER_TOKEN = 4
+
+# Orçamento padrão de tokens para as regras recuperadas da base de conhecimento
+DEFAULT_KNOWLEDGE_TOKEN_BUDGET = 1200
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa do número de tokens de um texto, sem depender de um tokenizador."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def build_knowledge_context(rule_citations: list, token_budget: int = DEFAULT_KNOWLEDGE_TOKEN_BUDGET) -> tuple[str, dict]:
     """
-    
+    Monta o contexto da Base de Conhecimento a partir das regras recuperadas (em ordem de
+    relevância): remove duplicatas e inclui regras até o orçamento de tokens. A última regra
+    que não couber inteira é truncada, se ainda sobrar espaço útil.
+
+    Returns:
+        tuple: (contexto, estatísticas com regras usadas, duplicadas e descartadas).
+    """
+    seen = set()
+    lines = []
+    used_tokens = 0
+    duplicated = 0
+    dropped = 0
+    for citation in rule_citations:
+        normalized = " ".join(str(citation).split())
+        key = normalized.lower()
+        if not normalized or key in seen:
+            duplicated += 1
+            continue
+        seen.add(key)
+        line = f"- {normalized}"
+        line_tokens = estimate_tokens(line)
+        remaining = token_budget - used_tokens
+        if line_tokens <= remaining:
+            lines.append(line)
+            used_tokens += line_tokens
+        elif remaining >= 32:
+            # Trunca a regra para ocupar o espaço que resta no orçamento.
+            lines.append(line[:remaining * CHARS_PER_TOKEN - 3].rstrip() + "...")
+            used_tokens = token_budget
+        else:
+            dropped += 1
+    context = "\n".join(lines) + ("\n" if lines else "")
+    return context, {
+        "regras_usadas": len(lines),
+        "regras_duplicadas": duplicated,
+        "regras_descartadas": dropped,
+        "tokens_contexto": used_tokens,
+    }
+
+
+def build_brigade_calculation_prompt(ia_context: dict, rule_citations: list,
+                                     token_budget: int = DEFAULT_KNOWLEDGE_TOKEN_BUDGET) -> tuple[str, dict]:
+    """
+    Monta o prompt de cálculo com o contexto deduplicado e limitado ao orçamento de tokens.
+
+    Returns:
+        tuple: (prompt, estatísticas com tamanho em caracteres, tokens estimados e versão).
+    """
+    knowledge_context, stats = build_knowledge_context(rule_citations, token_budget)
+    prompt = get_brigade_calculation_prompt(ia_context, knowledge_context)
+    stats.update({
+        "caracteres_prompt": len(prompt),
+        "tokens_estimados": estimate_tokens(prompt),
+        "orcamento_contexto": token_budget,
+        "versao_prompt": get_brigade_calculation_prompt_version(),
+    })
+    return prompt, stats
+
+
+def get_brigade_calculation_prompt(ia_context: dict, knowledge_context: str) -> str:
+    """
+    Cria um prompt avançado e robusto para que a IA execute o cálculo da brigada.
+    Este prompt inclui:
+    - Persona e tarefa claras.
+    - Contexto completo da instalação.
+    - Base de conhecimento (RAG).
+    - Instruções de raciocínio passo a passo (Chain of Thought).
+    - Análise de erros comuns para guiar o modelo (Few-shot error analysis).
+    - Formato de saída JSON estrito e obrigatório.
+    """
+    # Extrai os dados do contexto para inserção no prompt
+    installation = ia_context.get("installation_info", {})
+    divisao = ia_context.get("division")
+    risco = ia_context.get("risk")
+    populations = ia_context.get("populations", [])
+
+    # Captura os dados da instalação para usar no prompt e no exemplo de saída
+    values = {
+        "razao_social": installation.get("Razao_Social", "N/A"),
+        "imovel": installation.get("Imovel", "N/A"),
+        "divisao": divisao,
+        "risco": risco,
+        "populations": populations,
+        "pop_turno1": populations[0] if len(populations) > 0 else 0,
+        "pop_turno2": populations[1] if len(populations) > 1 else 0,
+        "knowledge_context": knowledge_context,
+    }
+
+    return "".join([
+        _CALCULATION_PERSONA,
+        _CALCULATION_KNOWLEDGE_TEMPLATE.substitute(values),
+        _CALCULATION_SCENARIO_TEMPLATE.substitute(values),
+        _CALCULATION_INSTRUCTIONS_TEMPLATE.substitute(values),
+        _CALCULATION_OUTPUT_TEMPLATE.substitute(values),
+    ])
+
+
+def _source_version(fn) -> str:
+    """Hash curto do código-fonte de uma função geradora de prompt."""
+    return hashlib.sha256(inspect.getsource(fn).encode("utf-8")).hexdigest()[:16]
+
+
+@lru_cache(maxsize=None)
+def get_brigade_calculation_prompt_version() -> str:
+    """
+    Retorna um identificador curto da versão do prompt de cálculo: hash dos templates e do
+    código que monta o prompt (seleção das regras, orçamento de tokens e preenchimento).
+    Qualquer alteração no prompt muda a versão, invalidando resultados cacheados.
+    """
+    return hashlib.sha256("\x00".join([
+        _CALCULATION_PERSONA,
+        _CALCULATION_KNOWLEDGE_TEMPLATE.template,
+        _CALCULATION_SCENARIO_TEMPLATE.template,
+        _CALCULATION_INSTRUCTIONS_TEMPLATE.template,
+        _CALCULATION_OUTPUT_TEMPLATE.template,
+        str(CHARS_PER_TOKEN),
+        _source_version(estimate_tokens),
+        _source_version(build_knowledge_context),
+        _source_version(get_brigade_calculation_prompt),
+    ]).encode("utf-8")).hexdigest()[:16]
+
+
+@lru_cache(maxsize=None)
+def get_report_generation_prompt_version() -> str:
+    """Identificador curto da versão do prompt de relatório, usado no cache de relatórios."""
+    return _source_version(get_report_generation_prompt)
+
+
+@lru_cache(maxsize=None)
+def get_pdf_extraction_prompt_version() -> str:
+    """Versão conjunta dos prompts de extração de nomes (PDF original e texto extraído)."""
+    return _source_version(get_pdf_extraction_prompt) + _source_version(get_pdf_text_extraction_prompt)
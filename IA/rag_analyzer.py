@@ -1,17 +1,114 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-import google.generativeai as genai
 from google.generativeai.types import HarmCategory, HarmBlockThreshold
 import json
-from .prompts import get_pdf_extraction_prompt, get_brigade_calculation_prompt, get_report_generation_prompt
+import hashlib
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from utils.calculator import calculate_shift_breakdown, get_table_divisions, get_risk_levels
+from utils.nbr_rules import load_rule_engine
+from utils.settings import get_app_setting
+from utils.google_sheets_handler import get_worksheet_pool
+from .embedding_store import EmbeddingStore, QueryEmbeddingCache, content_hash, EMBEDDING_MODEL, DEFAULT_EMBEDDING_CACHE_DIR
+from .retrieval import DenseIndex, IVFIndex, LexicalIndex, MetadataFilter, reciprocal_rank_fusion
+from .gemini_client import GeminiClient, GenAIBackend, FakeGeminiBackend
+from .pdf_preprocessing import pdf_content_hash, extract_text_layer, has_usable_text
+from .result_cache import ResultCache, make_cache_key, DEFAULT_RESULT_CACHE_PATH
+from .prompts import (
+    get_pdf_extraction_prompt, get_pdf_text_extraction_prompt, build_brigade_calculation_prompt,
+    get_report_generation_prompt, DEFAULT_KNOWLEDGE_TOKEN_BUDGET, get_pdf_extraction_prompt_version,
+    get_brigade_calculation_prompt_version, get_report_generation_prompt_version
+)
+
+GENERATION_MODEL = 'gemini-2.5-pro'
+
+# Colunas da base de conhecimento que podem ser usadas como filtro na busca
+RAG_FILTER_COLUMNS = ["norma_referencia", "section_number"]
+
+# Configuração de geração para respostas em JSON estrito
+JSON_GENERATION_CONFIG = {"response_mime_type": "application/json"}
+
+@st.cache_resource
+def get_gemini_client() -> GeminiClient:
+    """
+    Cliente Gemini compartilhado pelo processo: um único semáforo de concorrência e um único
+    conjunto de métricas para todas as sessões do Streamlit.
+    Com gemini_backend = "fake", usa o modelo local simulado (execução offline e benchmarks).
+    """
+    if str(get_app_setting("gemini_backend", "genai")).lower() == "fake":
+        backend = FakeGeminiBackend(
+            latency=float(get_app_setting("fake_gemini_latency_seconds", 0.0)),
+            latency_jitter=float(get_app_setting("fake_gemini_latency_jitter_seconds", 0.0)),
+            error_rate=float(get_app_setting("fake_gemini_error_rate", 0.0)),
+            seed=int(get_app_setting("fake_seed", 0))
+        )
+    else:
+        backend = GenAIBackend(st.secrets["general"]["GOOGLE_API_KEY"])
+    return GeminiClient(
+        backend,
+        timeout=float(get_app_setting("gemini_timeout_seconds", 60)),
+        max_retries=int(get_app_setting("gemini_max_retries", 3)),
+        max_concurrency=int(get_app_setting("gemini_max_concurrency", 4))
+    )
+
+def _embed_documents(texts: list, progress=None) -> list:
+    """
+    Gera os embeddings de documentos da base de conhecimento em lotes paralelos, respeitando
+    o limite de textos por requisição da API. Textos de lotes que falharam voltam como None.
+    """
+    requests_per_minute = float(get_app_setting("embedding_requests_per_minute", 0))
+    return get_gemini_client().embed_batches(
+        texts, task_type="RETRIEVAL_DOCUMENT", model=EMBEDDING_MODEL, progress=progress,
+        batch_size=int(get_app_setting("embedding_batch_size", 100)),
+        max_batch_chars=int(get_app_setting("embedding_batch_max_chars", 100000)),
+        requests_per_minute=requests_per_minute or None,
+        retry_rounds=int(get_app_setting("embedding_batch_retry_rounds", 1))
+    )
+
+def _embed_queries(texts: list) -> list:
+    """
+    Gera os embeddings de consultas feitas à base de conhecimento. Usa um prazo curto,
+    pois a busca lexical local cobre a falta do embedding.
+    """
+    return get_gemini_client().embed(
+        texts, task_type="RETRIEVAL_QUERY", model=EMBEDDING_MODEL,
+        timeout=float(get_app_setting("query_embedding_timeout_seconds", 10))
+    )
+
+@st.cache_resource
+def get_query_embedding_cache() -> QueryEmbeddingCache:
+    """Cache de embeddings de consultas compartilhado por todas as sessões do processo."""
+    persist = str(get_app_setting("persist_query_cache", True)).lower() not in ("false", "0", "no")
+    return QueryEmbeddingCache(
+        EMBEDDING_MODEL,
+        maxsize=int(get_app_setting("query_cache_size", 512)),
+        directory=get_app_setting("embedding_cache_dir", DEFAULT_EMBEDDING_CACHE_DIR) if persist else None
+    )
+
+@st.cache_resource
+def get_result_cache() -> ResultCache:
+    """Cache persistente dos resultados de cálculo da IA, compartilhado entre as sessões."""
+    return ResultCache(
+        get_app_setting("result_cache_path", DEFAULT_RESULT_CACHE_PATH),
+        max_entries=int(get_app_setting("result_cache_max_entries", 2000))
+    )
+
+def compute_knowledge_base_version(rag_df: pd.DataFrame) -> str:
+    """Hash do conteúdo da base de conhecimento; muda sempre que alguma regra é alterada."""
+    if rag_df.empty:
+        return "vazia"
+    columns = [col for col in ["question", "answer_chunk", "norma_referencia", "section_number"] if col in rag_df.columns]
+    row_hashes = pd.util.hash_pandas_object(rag_df[columns].astype(str), index=False).to_numpy()
+    return hashlib.sha256(row_hashes.tobytes()).hexdigest()[:16]
 
 @st.cache_data(ttl=3600) # Cache de 1 hora para a base de conhecimento indexada
 def load_and_embed_rag_base(_gspread_client, rag_sheet_id: str) -> tuple[pd.DataFrame, np.ndarray | None]:
     """
     Carrega a planilha RAG pelo ID fornecido, gera embeddings para a coluna 'question'
-    e armazena os resultados em cache.
+    e armazena os resultados em cache. Os embeddings também são persistidos em disco
+    (EmbeddingStore), de modo que apenas perguntas novas ou alteradas são enviadas à API.
     """
     # Validação inicial do ID da planilha
     if not rag_sheet_id or rag_sheet_id == "not_defined":
@@ -20,30 +117,68 @@ def load_and_embed_rag_base(_gspread_client, rag_sheet_id: str) -> tuple[pd.Data
         
     try:
         # Abre a planilha RAG e lê a aba de conhecimento
-        spreadsheet = _gspread_client.open_by_key(rag_sheet_id)
-        worksheet = spreadsheet.worksheet("RAG_Knowledge_Base")
-        df = pd.DataFrame(worksheet.get_all_records())
+        records = get_worksheet_pool(_gspread_client).get_all_records(rag_sheet_id, "RAG_Knowledge_Base")
+        df = pd.DataFrame(records)
 
         # Validação das colunas essenciais
         required_columns = ["question", "answer_chunk", "norma_referencia", "section_number"]
         if df.empty or not all(col in df.columns for col in required_columns):
             st.error(f"A aba 'RAG_Knowledge_Base' está vazia ou não contém todas as colunas necessárias: {required_columns}.")
             return pd.DataFrame(), None
-        
-        with st.spinner(f"Indexando a base de conhecimento da IA ({len(df)} regras)..."):
-            questions_to_embed = df["question"].tolist()
-            result = genai.embed_content(
-                model='models/text-embedding-004',
-                content=questions_to_embed,
-                task_type="RETRIEVAL_DOCUMENT"
-            )
-            embeddings = np.array(result['embedding'])
-        st.success("Base de conhecimento da IA indexada!")
-        return df, embeddings
     except Exception as e:
-        st.error(f"Falha ao carregar e indexar a base de conhecimento RAG (ID: {rag_sheet_id}): {e}")
+        st.error(f"Falha ao carregar a base de conhecimento RAG (ID: {rag_sheet_id}): {e}")
         return pd.DataFrame(), None
 
+    try:
+        store = EmbeddingStore(get_app_setting("embedding_cache_dir", DEFAULT_EMBEDDING_CACHE_DIR), EMBEDDING_MODEL)
+        questions_to_embed = df["question"].astype(str).tolist()
+        pending = store.missing_texts(questions_to_embed)
+        if pending:
+            progress_bar = st.progress(0.0, text=f"Indexando a base de conhecimento da IA ({len(pending)} de {len(df)} regras novas ou alteradas)...")
+            def report_progress(done: int, total: int) -> None:
+                progress_bar.progress(done / total, text=f"Indexando a base de conhecimento da IA: {done} de {total} regras...")
+            embeddings = store.sync(questions_to_embed, lambda texts: _embed_documents(texts, progress=report_progress))
+            progress_bar.empty()
+            failed = store.missing_texts(questions_to_embed)
+            if failed:
+                # Regras sem embedding continuam acessíveis pela busca lexical e serão reenviadas na próxima carga.
+                st.warning(f"{len(failed)} regras da base de conhecimento não puderam ser indexadas agora; elas serão reenviadas na próxima carga.")
+            else:
+                st.success("Base de conhecimento da IA indexada!")
+        else:
+            # Todos os embeddings já estão no disco: nenhuma chamada à API.
+            embeddings = store.sync(questions_to_embed, _embed_documents)
+        return df, embeddings
+    except Exception as e:
+        # Sem embeddings, a base continua disponível para a busca lexical local.
+        st.warning(f"Falha ao indexar a base de conhecimento RAG com embeddings; usando apenas busca lexical: {e}")
+        return df, None
+
+def build_rule_query(divisao: str, risco: str) -> str:
+    """Monta a consulta usada para buscar na base de conhecimento as regras de uma Divisão/Risco."""
+    return f"Regras de cálculo de brigada para Divisão {divisao} e Risco {risco}, incluindo regras base e de acréscimo."
+
+def _normalize_text(text) -> str:
+    """Remove acentos e caixa para comparar trechos da base de conhecimento."""
+    decomposed = unicodedata.normalize("NFKD", str(text))
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+def _format_rule_citation(row) -> str:
+    """Formata uma linha da base RAG no mesmo padrão usado no contexto enviado à IA."""
+    ref = row.get('norma_referencia', 'N/A')
+    sec = row.get('section_number', 'N/A')
+    ans = row.get('answer_chunk', 'Conteúdo indisponível.')
+    return f"{ans} (Fonte: {ref}, {sec})"
+
+def _find_rule_citation(rules_df: pd.DataFrame, terms: list) -> str | None:
+    """Retorna a primeira regra recuperada cujo texto contém todos os termos informados."""
+    normalized_terms = [_normalize_text(term) for term in terms]
+    for _, row in rules_df.iterrows():
+        text = _normalize_text(f"{row.get('question', '')} {row.get('answer_chunk', '')}")
+        if all(term in text for term in normalized_terms):
+            return _format_rule_citation(row)
+    return None
+
 class RAGAnalyzer:
     def __init__(self, gspread_client, rag_sheet_id: str):
         """
@@ -52,42 +187,147 @@ class RAGAnalyzer:
         - Carrega e indexa a base de conhecimento da planilha, usando a função cacheada.
         """
         try:
-            api_key = st.secrets["general"]["GOOGLE_API_KEY"]
-            genai.configure(api_key=api_key)
+            self.client = get_gemini_client()
             self.safety_settings = {
                 HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
                 HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
                 HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
                 HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
             }
-            self.model = genai.GenerativeModel(
-                'gemini-2.5-pro',
-                safety_settings=self.safety_settings
-            )
         except Exception as e:
             st.error(f"Falha ao configurar o modelo Gemini: {e}")
             st.stop()
         
         # Chama a função global cacheada, passando os argumentos "hashable"
         self.rag_df, self.rag_embeddings = load_and_embed_rag_base(gspread_client, rag_sheet_id)
+        self._build_indexes()
+        self.kb_version = compute_knowledge_base_version(self.rag_df)
+        self.result_cache = get_result_cache()
+        # Orçamento de tokens para as regras recuperadas no prompt de cálculo
+        self.knowledge_token_budget = int(get_app_setting("prompt_knowledge_token_budget", DEFAULT_KNOWLEDGE_TOKEN_BUDGET))
 
-    def _find_relevant_chunks(self, query_text: str, top_k: int = 5) -> pd.DataFrame:
-        """Encontra as regras mais relevantes na base de conhecimento usando busca semântica."""
-        if self.rag_df.empty or self.rag_embeddings is None or self.rag_embeddings.size == 0:
-            return pd.DataFrame()
+        self.query_cache = get_query_embedding_cache()
+        self._warm_query_cache()
+
+    def _build_indexes(self) -> None:
+        """
+        Monta os índices de busca sobre a base carregada:
+        - DenseIndex (busca exata) sempre que houver embeddings;
+        - IVFIndex (busca aproximada, persistido em disco) quando a base tiver pelo menos
+          `app_settings.ann_min_rows` linhas;
+        - MetadataFilter para restringir a busca por norma e seção;
+        - LexicalIndex (TF-IDF local) sobre 'question' e 'answer_chunk', que não depende
+          da API de embeddings.
+        """
+        self.dense_index = None
+        self.ann_index = None
+        self.metadata_filter = None
+        self.lexical_index = None
+        self.ann_nprobe = int(get_app_setting("ann_nprobe", 8))
+        # Modo de busca: "hybrid" (densa + lexical), "dense" ou "lexical" (sem rede).
+        self.retrieval_mode = str(get_app_setting("retrieval_mode", "hybrid")).lower()
+        # Filtro padrão opcional (ex: "ABNT NBR 14276") para não recuperar regras de outras normas.
+        default_norma = get_app_setting("rag_norma_referencia")
+        self.default_filters = {"norma_referencia": default_norma} if default_norma else None
+
+        if self.rag_df.empty:
+            return
+
+        self.metadata_filter = MetadataFilter({col: self.rag_df[col].to_numpy() for col in RAG_FILTER_COLUMNS})
+        documents = (self.rag_df["question"].astype(str) + "\n" + self.rag_df["answer_chunk"].astype(str)).tolist()
         try:
-            query_embedding_result = genai.embed_content(
-                model='models/text-embedding-004',
-                content=[query_text],
-                task_type="RETRIEVAL_QUERY"
+            self.lexical_index = LexicalIndex(documents)
+        except ValueError as e:
+            st.warning(f"Não foi possível montar o índice lexical da base de conhecimento: {e}")
+
+        if self.rag_embeddings is None or self.rag_embeddings.size == 0:
+            return
+
+        self.dense_index = DenseIndex(self.rag_embeddings)
+
+        if len(self.rag_df) >= int(get_app_setting("ann_min_rows", 20000)):
+            # O índice depende dos vetores, não só dos textos: linhas cujo embedding falhou entram
+            # como vetores nulos e, quando forem calculadas, o índice precisa ser reconstruído.
+            vectors_digest = hashlib.sha256(np.ascontiguousarray(self.dense_index.vectors)).hexdigest()
+            fingerprint = content_hash(
+                "\n".join(self.rag_df["question"].astype(str)) + "\x00" + vectors_digest, EMBEDDING_MODEL
             )
-            query_embedding = np.array(query_embedding_result['embedding'])
-            similarities = cosine_similarity(query_embedding, self.rag_embeddings)[0]
-            top_k_indices = similarities.argsort()[-top_k:][::-1]
-            return self.rag_df.iloc[top_k_indices]
+            nlist = get_app_setting("ann_nlist")
+            index_path = Path(get_app_setting("embedding_cache_dir", DEFAULT_EMBEDDING_CACHE_DIR)) / "ivf_index.npz"
+            try:
+                with st.spinner("Preparando o índice aproximado da base de conhecimento..."):
+                    self.ann_index = IVFIndex.load_or_build(
+                        index_path, self.dense_index.vectors, fingerprint,
+                        nlist=int(nlist) if nlist else None, nprobe=self.ann_nprobe
+                    )
+            except Exception as e:
+                st.warning(f"Não foi possível montar o índice aproximado; usando busca exata: {e}")
+
+    def _warm_query_cache(self) -> None:
+        """
+        Pré-calcula os embeddings das consultas de regras para todas as combinações de
+        Divisão e Risco da tabela, em uma única chamada à API.
+        """
+        if self.dense_index is None or self.retrieval_mode == "lexical":
+            return
+        queries = [build_rule_query(d, r) for d in get_table_divisions() for r in get_risk_levels()]
+        try:
+            self.query_cache.warm(queries, _embed_queries)
         except Exception as e:
-            st.warning(f"Erro durante a busca semântica na base de conhecimento: {e}")
+            st.warning(f"Não foi possível pré-carregar o cache de consultas da IA: {e}")
+
+    def _find_relevant_chunks(self, query_text: str, top_k: int = 5, filters: dict | None = None) -> pd.DataFrame:
+        """
+        Encontra as regras mais relevantes na base de conhecimento.
+
+        Combina a busca semântica (embeddings) com a busca lexical local por Reciprocal Rank
+        Fusion. Se a busca semântica falhar ou estiver desativada, usa apenas a lexical.
+        `filters` (ex: {"norma_referencia": "ABNT NBR 14276"}) restringe as linhas antes da
+        pontuação; sem filtros explícitos, usa o filtro padrão configurado.
+        """
+        if self.rag_df.empty or (self.dense_index is None and self.lexical_index is None):
+            return pd.DataFrame()
+        try:
+            mask = self.metadata_filter.mask(filters or self.default_filters)
+        except ValueError as e:
+            st.warning(f"Filtro inválido na busca da base de conhecimento: {e}")
+            return pd.DataFrame()
+
+        # Cada busca traz mais candidatos que o necessário para a fusão dos resultados.
+        candidates_k = top_k * 4
+        dense_indices = None
+        if self.dense_index is not None and self.retrieval_mode != "lexical":
+            try:
+                query_embedding = self.query_cache.get(query_text, _embed_queries)
+                if self.ann_index is not None:
+                    dense_indices, _ = self.ann_index.search(query_embedding, candidates_k, nprobe=self.ann_nprobe, mask=mask)
+                else:
+                    dense_indices, _ = self.dense_index.search(query_embedding, candidates_k, mask=mask)
+            except Exception as e:
+                st.warning(f"Busca semântica indisponível, usando apenas a busca lexical: {e}")
+
+        lexical_indices = None
+        if self.lexical_index is not None and (self.retrieval_mode != "dense" or dense_indices is None):
+            lexical_indices, _ = self.lexical_index.search(query_text, candidates_k, mask=mask)
+
+        if dense_indices is not None and lexical_indices is not None:
+            top_k_indices = reciprocal_rank_fusion([dense_indices, lexical_indices], top_k)
+        elif dense_indices is not None:
+            top_k_indices = dense_indices[:top_k]
+        elif lexical_indices is not None:
+            top_k_indices = lexical_indices[:top_k]
+        else:
             return pd.DataFrame()
+        return self.rag_df.iloc[top_k_indices]
+
+    def _generate(self, contents, generation_config=None):
+        """Chama o modelo generativo através do cliente compartilhado (timeout, retries e métricas)."""
+        return self.client.generate(
+            contents,
+            model=GENERATION_MODEL,
+            generation_config=generation_config,
+            safety_settings=self.safety_settings
+        )
 
     def _handle_blocked_response(self, response) -> None:
         """Função de helper para exibir mensagens de erro detalhadas sobre bloqueios."""
@@ -102,79 +342,248 @@ class RAGAnalyzer:
         except (AttributeError, IndexError):
             st.warning("Não foi possível obter detalhes adicionais sobre o bloqueio.")
 
-    def calculate_brigade_with_rag(self, ia_context: dict) -> dict | None:
-        """Usa a IA e a base de conhecimento RAG para executar o cálculo da brigada e retornar um JSON."""
+    def _calculation_cache_key(self, ia_context: dict) -> str:
+        """Chave do cache de resultados a partir das entradas normalizadas do cálculo."""
+        installation = ia_context.get("installation_info") or {}
+        installation_id = installation.get("ID_Empresa") or f"{installation.get('Razao_Social')}|{installation.get('Imovel')}"
+        return make_cache_key(
+            division=str(ia_context.get("division", "")).strip(),
+            risk=str(ia_context.get("risk", "")).strip(),
+            populations=[int(pop) for pop in ia_context.get("populations", [])],
+            installation_id=str(installation_id).strip(),
+            kb_version=self.kb_version,
+            prompt_version=get_brigade_calculation_prompt_version(),
+            knowledge_token_budget=self.knowledge_token_budget,
+            model=GENERATION_MODEL
+        )
+
+    def calculate_brigade_with_rag(self, ia_context: dict) -> tuple[dict | None, dict | None]:
+        """
+        Usa a IA e a base de conhecimento RAG para executar o cálculo da brigada.
+
+        Returns:
+            tuple: (JSON do cálculo ou None, estatísticas do prompt montado ou None se o
+            resultado veio do cache). As estatísticas são devolvidas a quem chamou, e não
+            guardadas no analisador, que é compartilhado por todas as sessões.
+        """
         divisao = ia_context.get("division")
         risco = ia_context.get("risk")
 
-        query = f"Regras de cálculo de brigada para Divisão {divisao} e Risco {risco}, incluindo regras base e de acréscimo."
+        cache_key = self._calculation_cache_key(ia_context)
+        cached_result = self.result_cache.get(cache_key)
+        if cached_result is not None:
+            return cached_result, None
+
+        query = build_rule_query(divisao, risco)
         
         relevant_rules_df = self._find_relevant_chunks(query, top_k=5)
         if relevant_rules_df.empty:
             st.error("Não foram encontradas regras suficientes na base de conhecimento para realizar o cálculo.")
-            return None
+            return None, None
 
-        knowledge_context = ""
-        for _, row in relevant_rules_df.iterrows():
-            # Usa .get() para acesso seguro, evitando KeyErrors se a planilha estiver mal formatada
-            ref = row.get('norma_referencia', 'N/A')
-            sec = row.get('section_number', 'N/A')
-            ans = row.get('answer_chunk', 'Conteúdo indisponível.')
-            knowledge_context += f"- {ans} (Fonte: {ref}, {sec})\n"
-        
-        prompt = get_brigade_calculation_prompt(ia_context, knowledge_context)
+        # Regras em ordem de relevância; duplicatas e excesso além do orçamento são descartados
+        rule_citations = [_format_rule_citation(row) for _, row in relevant_rules_df.iterrows()]
+        prompt, prompt_stats = build_brigade_calculation_prompt(
+            ia_context, rule_citations, token_budget=self.knowledge_token_budget
+        )
         
         try:
-            generation_config = genai.types.GenerationConfig(response_mime_type="application/json")
-            response = self.model.generate_content(prompt, generation_config=generation_config)
+            response = self._generate(prompt, generation_config=JSON_GENERATION_CONFIG)
 
             if not response.parts:
                 self._handle_blocked_response(response)
-                return None
+                return None, prompt_stats
             
-            return json.loads(response.text)
+            result = json.loads(response.text)
+            self.result_cache.put(cache_key, result)
+            return result, prompt_stats
         except json.JSONDecodeError:
             st.error("A IA não retornou um JSON válido. Verifique a resposta abaixo.")
             st.text_area("Resposta Bruta da IA:", response.text if 'response' in locals() else "Nenhuma resposta.", height=200)
-            return None
+            return None, prompt_stats
         except Exception as e:
             st.error(f"Erro ao executar o cálculo com a IA: {e}")
+            return None, prompt_stats
+
+    def calculate_brigade_locally(self, ia_context: dict) -> dict | None:
+        """
+        Executa o cálculo da brigada localmente (sem chamar o modelo generativo) e monta o
+        mesmo JSON produzido por `calculate_brigade_with_rag`. As citações das regras vêm
+        das linhas recuperadas da base de conhecimento; se nenhuma for encontrada, cita-se
+        diretamente a Tabela A.1 da norma.
+        """
+        installation = ia_context.get("installation_info") or {}
+        divisao = ia_context.get("division")
+        risco = ia_context.get("risk")
+        populations = ia_context.get("populations", [])
+
+        try:
+            rule = load_rule_engine().get_rule(divisao, risco)
+            shifts = [calculate_shift_breakdown(divisao, risco, int(pop)) for pop in populations]
+        except ValueError as e:
+            st.error(f"Erro ao executar o cálculo: {e}")
             return None
 
+        relevant_rules_df = self._find_relevant_chunks(build_rule_query(divisao, risco), top_k=5)
+        regra_base = None
+        regra_acrescimo = None
+        if not relevant_rules_df.empty:
+            regra_base = _find_rule_citation(relevant_rules_df, [divisao, risco])
+            regra_acrescimo = (_find_rule_citation(relevant_rules_df, ["acréscimo", risco])
+                               or _find_rule_citation(relevant_rules_df, ["adicional", risco]))
+
+        norma = load_rule_engine().norma
+        if regra_base is None:
+            regra_base = f"{norma}, Tabela A.1: Divisão {divisao}, Risco {risco}."
+        if regra_acrescimo is None:
+            regra_acrescimo = (f"{norma}, Tabela A.1, Nota 5: acréscimo de 1 brigadista a cada "
+                               f"{rule.divisor} pessoas (ou fração) acima de {rule.limits[-1]}.")
+
+        calculo_por_turno = []
+        for i, (pop, shift) in enumerate(zip(populations, shifts), start=1):
+            calculo_por_turno.append({
+                "turno": i,
+                "populacao": int(pop),
+                "regra_base_aplicada": regra_base,
+                "calculo_base": shift["calculo_base"],
+                "regra_acrescimo_aplicada": regra_acrescimo if shift["calculo_acrescimo"] > 0 else "Não aplicável",
+                "calculo_acrescimo": shift["calculo_acrescimo"],
+                "total_turno": shift["total_turno"]
+            })
+
+        totais = [t["total_turno"] for t in calculo_por_turno]
+        return {
+            "dados_da_instalacao": {
+                "razao_social": installation.get("Razao_Social", "N/A"),
+                "imovel": installation.get("Imovel", "N/A")
+            },
+            "calculo_por_turno": calculo_por_turno,
+            "resumo_final": {
+                "total_geral_brigadistas": sum(totais),
+                "maior_turno_necessidade": max(totais) if totais else 0
+            }
+        }
+
+    def _extract_names_from_pdf_bytes(self, pdf_bytes: bytes) -> dict:
+        """
+        Extrai os nomes de um PDF. Não usa elementos do Streamlit, para poder rodar em
+        threads de trabalho; erros são levantados como exceções.
+
+        Etapas antes da chamada ao modelo:
+        1. Hash do conteúdo: PDFs já processados retornam o resultado do cache.
+        2. Camada de texto local: se o PDF tiver texto, apenas o texto compacto é enviado;
+           o PDF completo só é enviado para documentos digitalizados.
+        """
+        cache_key = make_cache_key(
+            kind="pdf_nomes",
+            pdf_hash=pdf_content_hash(pdf_bytes),
+            prompt_version=get_pdf_extraction_prompt_version(),
+            model=GENERATION_MODEL
+        )
+        cached_result = self.result_cache.get(cache_key)
+        if cached_result is not None:
+            return cached_result
+
+        pdf_text = extract_text_layer(pdf_bytes)
+        if has_usable_text(pdf_text):
+            contents = get_pdf_text_extraction_prompt(pdf_text)
+        else:
+            contents = [get_pdf_extraction_prompt(), {"mime_type": "application/pdf", "data": pdf_bytes}]
+        response = self._generate(contents, generation_config=JSON_GENERATION_CONFIG)
+
+        if not response.parts:
+            reason = getattr(getattr(response, "prompt_feedback", None), "block_reason", None)
+            raise ValueError(f"A IA retornou uma resposta vazia (possível bloqueio: {getattr(reason, 'name', 'desconhecido')}).")
+        result = json.loads(response.text)
+        if result.get("nomes"):
+            self.result_cache.put(cache_key, result)
+        return result
+
     def extract_brigadistas_from_pdf(self, pdf_file) -> dict:
         """Usa o Gemini para extrair uma lista de nomes de um PDF."""
         try:
-            prompt = get_pdf_extraction_prompt()
-            pdf_bytes = pdf_file.read()
-            pdf_part = {"mime_type": "application/pdf", "data": pdf_bytes}
-            generation_config = genai.types.GenerationConfig(response_mime_type="application/json")
-            
-            response = self.model.generate_content([prompt, pdf_part], generation_config=generation_config)
-
-            if not response.parts:
-                self._handle_blocked_response(response)
-                return {"nomes": []}
-                
-            return json.loads(response.text)
+            return self._extract_names_from_pdf_bytes(pdf_file.read())
         except Exception as e:
             st.error(f"Ocorreu um erro ao processar o PDF com a IA: {e}")
             return {"nomes": []}
 
-    def generate_full_report(self, calculation_json: dict) -> str:
+    def extract_brigadistas_from_pdfs(self, pdf_items: list, max_workers: int | None = None):
         """
-        Usa a IA para gerar um relatório técnico completo em Markdown com base no
-        resultado do cálculo (em formato JSON).
+        Extrai nomes de vários PDFs em paralelo, em um pool de threads limitado.
+
+        Args:
+            pdf_items (list): Lista de tuplas (identificador, bytes do PDF).
+            max_workers (int): Número máximo de extrações simultâneas.
+
+        Yields:
+            tuple: (identificador, dados_extraídos ou None, mensagem de erro ou None),
+            na ordem em que cada arquivo termina. A falha de um arquivo não afeta os demais.
+        """
+        if not pdf_items:
+            return
+        max_workers = max_workers or int(get_app_setting("pdf_extraction_workers", 4))
+
+        # Arquivos idênticos no mesmo lote são processados uma única vez.
+        unique_items = {}
+        for item_id, pdf_bytes in pdf_items:
+            unique_items.setdefault(pdf_content_hash(pdf_bytes), (pdf_bytes, []))[1].append(item_id)
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(unique_items))) as executor:
+            futures = {
+                executor.submit(self._extract_names_from_pdf_bytes, pdf_bytes): item_ids
+                for pdf_bytes, item_ids in unique_items.values()
+            }
+            for future in as_completed(futures):
+                try:
+                    extracted_data, error = future.result(), None
+                except Exception as e:
+                    extracted_data, error = None, str(e)
+                for item_id in futures[future]:
+                    yield item_id, extracted_data, error
+
+    def generate_full_report_stream(self, calculation_json: dict):
+        """
+        Versão em streaming de `generate_full_report`: produz os trechos do relatório em
+        Markdown à medida que o modelo os gera. O texto completo é montado ao final e
+        guardado no cache de resultados, de modo que pedidos repetidos não chamam a IA.
+
+        Se a geração falhar, o erro é exibido e relançado depois dos trechos já produzidos,
+        para que quem consome o stream não trate um relatório incompleto como pronto.
         """
         if not calculation_json:
-            return "Erro: Dados de cálculo não fornecidos para gerar o relatório."
-            
+            st.error("Erro: Dados de cálculo não fornecidos para gerar o relatório.")
+            raise ValueError("Dados de cálculo não fornecidos para gerar o relatório.")
+
+        cache_key = make_cache_key(
+            kind="relatorio",
+            calculation=calculation_json,
+            prompt_version=get_report_generation_prompt_version(),
+            model=GENERATION_MODEL
+        )
+        cached_report = self.result_cache.get(cache_key)
+        if cached_report is not None:
+            yield cached_report["texto"]
+            return
+
+        chunks = []
         try:
             # Cria o prompt usando o JSON do cálculo
             prompt = get_report_generation_prompt(calculation_json)
             
-            # Chama a IA para gerar o texto do relatório
-            response = self.model.generate_content(prompt)
-            
-            return response.text
+            # Chama a IA e repassa cada trecho assim que ele chega
+            for chunk in self.client.stream_generate(prompt, model=GENERATION_MODEL, safety_settings=self.safety_settings):
+                chunks.append(chunk)
+                yield chunk
         except Exception as e:
-            return f"**Erro ao gerar o relatório:**\n\n{str(e)}"
+            st.error(f"Erro ao gerar o relatório: {e}")
+            raise
+
+        if chunks:
+            self.result_cache.put(cache_key, {"texto": "".join(chunks)})
+
+    def generate_full_report(self, calculation_json: dict) -> str:
+        """
+        Usa a IA para gerar um relatório técnico completo em Markdown com base no
+        resultado do cálculo (em formato JSON). Falhas da IA são relançadas.
+        """
+        return "".join(self.generate_full_report_stream(calculation_json))
@@ -0,0 +1,345 @@
+import time
+from pathlib import Path
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Normaliza cada linha para norma 1 (linhas nulas permanecem nulas)."""
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(matrix / norms, dtype=np.float32)
+
+
+def _top_k(scores: np.ndarray, top_k: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Seleciona os `top_k` maiores valores de cada linha de `scores` com argpartition
+    (O(n)) e ordena apenas esses k resultados.
+    """
+    n = scores.shape[1]
+    k = min(top_k, n)
+    if k <= 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.int64), empty.astype(np.float32)
+    if k < n:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(n), scores.shape).copy()
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind="stable")
+    return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(candidate_scores, order, axis=1)
+
+
+class DenseIndex:
+    """
+    Índice de busca exata por similaridade de cosseno.
+
+    Os embeddings são normalizados uma única vez e guardados como float32 contíguo,
+    de modo que cada busca é apenas um produto matriz-vetor seguido de argpartition.
+    """
+    def __init__(self, embeddings: np.ndarray):
+        self.vectors = _normalize_rows(embeddings)
+
+    def __len__(self) -> int:
+        return self.vectors.shape[0]
+
+    def search_batch(self, queries: np.ndarray, top_k: int = 5) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Busca várias consultas de uma vez.
+
+        Returns:
+            tuple: (índices, similaridades), ambos com formato (n_consultas, top_k),
+            ordenados da maior para a menor similaridade.
+        """
+        scores = _normalize_rows(queries) @ self.vectors.T
+        return _top_k(scores, top_k)
+
+    def search(self, query: np.ndarray, top_k: int = 5, mask: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Busca uma única consulta e retorna (índices, similaridades). Se `mask` for
+        informada, apenas as linhas permitidas por ela são pontuadas.
+        """
+        if mask is None:
+            indices, scores = self.search_batch(np.asarray(query).reshape(1, -1), top_k)
+            return indices[0], scores[0]
+        candidates = np.flatnonzero(mask)
+        scores = self.vectors[candidates] @ _normalize_rows(query)[0]
+        indices, scores = _top_k(scores[None, :], top_k)
+        return candidates[indices[0]], scores[0]
+
+
+class MetadataFilter:
+    """
+    Índice invertido (valor -> linhas) sobre colunas de metadados da base de conhecimento,
+    usado para restringir a busca antes do cálculo de similaridade.
+    """
+    def __init__(self, columns: dict):
+        self.size = len(next(iter(columns.values()))) if columns else 0
+        self._postings = {}
+        for name, values in columns.items():
+            values = np.asarray(values).astype(str)
+            postings = {}
+            for value in np.unique(values):
+                postings[value] = np.flatnonzero(values == value)
+            self._postings[name] = postings
+
+    def mask(self, filters: dict | None) -> np.ndarray | None:
+        """
+        Retorna uma máscara booleana das linhas que atendem a todos os filtros.
+        Cada filtro aceita um valor ou uma lista de valores (qualquer um deles).
+        """
+        if not filters:
+            return None
+        mask = np.ones(self.size, dtype=bool)
+        for name, accepted in filters.items():
+            if name not in self._postings:
+                raise ValueError(f"Coluna de filtro desconhecida: '{name}'.")
+            if isinstance(accepted, (str, int, float)):
+                accepted = [accepted]
+            column_mask = np.zeros(self.size, dtype=bool)
+            for value in accepted:
+                rows = self._postings[name].get(str(value))
+                if rows is not None:
+                    column_mask[rows] = True
+            mask &= column_mask
+        return mask
+
+
+class LexicalIndex:
+    """
+    Índice lexical TF-IDF (unigramas e bigramas, sem acentos) construído localmente.
+    Não depende de rede e responde em frações de milissegundo para bases pequenas;
+    serve de alternativa quando o modelo de embeddings está indisponível.
+    """
+    def __init__(self, documents: list):
+        # O padrão de tokens mantém códigos com hífen (ex: "D-2", "I-1") como um único termo.
+        self.vectorizer = TfidfVectorizer(strip_accents="unicode", lowercase=True, sublinear_tf=True,
+                                          ngram_range=(1, 2), token_pattern=r"(?u)\w+(?:-\w+)*")
+        self.matrix = self.vectorizer.fit_transform(documents).tocsr()
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    def search(self, query: str, top_k: int = 5, mask: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Retorna (índices, similaridades) dos documentos com algum termo em comum com a
+        consulta, ordenados por similaridade de cosseno TF-IDF.
+        """
+        query_vector = self.vectorizer.transform([query])
+        scores = (self.matrix @ query_vector.T).toarray().ravel().astype(np.float32)
+        candidates = np.flatnonzero(scores > 0)
+        if mask is not None:
+            candidates = candidates[mask[candidates]]
+        indices, top_scores = _top_k(scores[candidates][None, :], top_k)
+        return candidates[indices[0]], top_scores[0]
+
+
+def reciprocal_rank_fusion(rankings: list, top_k: int = 5, k: int = 60) -> np.ndarray:
+    """
+    Combina listas ordenadas de índices (ex: busca densa e lexical) pela soma de
+    1 / (k + posição). Documentos bem posicionados nas duas listas sobem no resultado.
+    """
+    fused = {}
+    for ranking in rankings:
+        for position, index in enumerate(np.asarray(ranking).tolist()):
+            fused[index] = fused.get(index, 0.0) + 1.0 / (k + position + 1)
+    ordered = sorted(fused, key=lambda index: fused[index], reverse=True)
+    return np.asarray(ordered[:top_k], dtype=np.int64)
+
+
+def _spherical_kmeans(vectors: np.ndarray, nlist: int, n_iter: int, rng, chunk: int = 16_384) -> np.ndarray:
+    """K-means sobre vetores normalizados (similaridade de cosseno). Retorna os centróides."""
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+    for _ in range(n_iter):
+        assignments = _assign(vectors, centroids, chunk)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        counts = np.bincount(assignments, minlength=nlist)
+        empty = counts == 0
+        if empty.any():
+            # Listas vazias recebem novos pontos aleatórios como semente.
+            sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+        centroids = _normalize_rows(sums)
+    return centroids
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray, chunk: int = 16_384) -> np.ndarray:
+    """Atribui cada vetor ao centróide mais similar, em blocos para limitar a memória."""
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), chunk):
+        assignments[start:start + chunk] = np.argmax(vectors[start:start + chunk] @ centroids.T, axis=1)
+    return assignments
+
+
+class IVFIndex:
+    """
+    Índice aproximado do tipo IVF (inverted file) em NumPy puro.
+
+    Os vetores são agrupados em `nlist` listas por k-means; cada busca pontua apenas as
+    linhas das `nprobe` listas mais próximas da consulta. Aumentar `nprobe` melhora o
+    recall ao custo de latência. Filtros de metadados são aplicados aos candidatos antes
+    da pontuação.
+    """
+    def __init__(self, vectors: np.ndarray, centroids: np.ndarray, order: np.ndarray,
+                 offsets: np.ndarray, fingerprint: str = "", nprobe: int = 8):
+        self.vectors = vectors
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+        self.fingerprint = fingerprint
+        self.nprobe = nprobe
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    def __len__(self) -> int:
+        return self.vectors.shape[0]
+
+    @classmethod
+    def build(cls, embeddings: np.ndarray, nlist: int | None = None, nprobe: int = 8, n_iter: int = 15,
+              train_size: int | None = None, fingerprint: str = "", seed: int = 0) -> "IVFIndex":
+        vectors = _normalize_rows(embeddings)
+        n = len(vectors)
+        nlist = max(1, min(nlist or int(np.sqrt(n)), n))
+        rng = np.random.default_rng(seed)
+        train_size = min(n, train_size or nlist * 64)
+        sample = vectors[rng.choice(n, train_size, replace=False)] if train_size < n else vectors
+        centroids = _spherical_kmeans(sample, nlist, n_iter, rng)
+        assignments = _assign(vectors, centroids)
+        order = np.argsort(assignments, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=nlist))])
+        return cls(vectors, centroids, order, offsets, fingerprint, nprobe)
+
+    def search(self, query: np.ndarray, top_k: int = 5, nprobe: int | None = None,
+               mask: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """Busca aproximada de uma consulta. Retorna (índices, similaridades)."""
+        q = _normalize_rows(query)[0]
+        nprobe = max(1, min(nprobe or self.nprobe, self.nlist))
+        centroid_scores = self.centroids @ q
+        if nprobe < self.nlist:
+            probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        else:
+            probe = np.arange(self.nlist)
+        candidates = np.concatenate([self.order[self.offsets[l]:self.offsets[l + 1]] for l in probe])
+        if mask is not None:
+            candidates = candidates[mask[candidates]]
+            if len(candidates) < top_k and nprobe < self.nlist:
+                # Filtro muito restritivo para as listas visitadas: pontua todas as linhas permitidas.
+                candidates = np.flatnonzero(mask)
+        elif len(candidates) < top_k and nprobe < self.nlist:
+            candidates = np.arange(len(self))
+        scores = self.vectors[candidates] @ q
+        indices, scores = _top_k(scores[None, :], top_k)
+        return candidates[indices[0]], scores[0]
+
+    def save(self, path: str) -> None:
+        """Grava apenas a estrutura do índice; os vetores continuam no EmbeddingStore."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp.npz")
+        np.savez(tmp_path, centroids=self.centroids, order=self.order, offsets=self.offsets,
+                 fingerprint=np.array(self.fingerprint))
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: str, embeddings: np.ndarray, fingerprint: str, nprobe: int = 8) -> "IVFIndex | None":
+        """Carrega um índice salvo, desde que tenha sido construído para os mesmos embeddings."""
+        try:
+            with np.load(path) as data:
+                if str(data["fingerprint"]) != fingerprint or int(data["offsets"][-1]) != len(embeddings):
+                    return None
+                return cls(_normalize_rows(embeddings), data["centroids"], data["order"],
+                           data["offsets"], fingerprint, nprobe)
+        except (OSError, KeyError, ValueError):
+            return None
+
+    @classmethod
+    def load_or_build(cls, path: str, embeddings: np.ndarray, fingerprint: str, nlist: int | None = None,
+                      nprobe: int = 8) -> "IVFIndex":
+        """Reaproveita o índice salvo em disco ou constrói (e salva) um novo."""
+        index = cls.load(path, embeddings, fingerprint, nprobe)
+        if index is None or (nlist and index.nlist != nlist):
+            index = cls.build(embeddings, nlist=nlist, nprobe=nprobe, fingerprint=fingerprint)
+            index.save(path)
+        return index
+
+
+def benchmark_dense_index(sizes=(1_000, 10_000, 100_000, 300_000), dim: int = 768,
+                          top_k: int = 5, repeats: int = 20, seed: int = 0) -> list:
+    """
+    Micro-benchmark da busca no DenseIndex comparada à abordagem anterior
+    (similaridade sobre a matriz não normalizada + argsort completo).
+    Retorna uma lista de dicionários com os tempos médios em milissegundos.
+    """
+    rng = np.random.default_rng(seed)
+    results = []
+    for size in sizes:
+        corpus = rng.standard_normal((size, dim)).astype(np.float64)
+        query = rng.standard_normal((1, dim))
+        index = DenseIndex(corpus)
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            norms = np.linalg.norm(corpus, axis=1) * np.linalg.norm(query)
+            similarities = (corpus @ query[0]) / norms
+            similarities.argsort()[-top_k:][::-1]
+        baseline_ms = (time.perf_counter() - start) * 1000 / repeats
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            index.search(query, top_k)
+        index_ms = (time.perf_counter() - start) * 1000 / repeats
+
+        batch = rng.standard_normal((32, dim))
+        start = time.perf_counter()
+        for _ in range(repeats):
+            index.search_batch(batch, top_k)
+        batch_ms = (time.perf_counter() - start) * 1000 / repeats / len(batch)
+
+        results.append({
+            "corpus": size,
+            "anterior_ms": baseline_ms,
+            "indice_ms": index_ms,
+            "lote_por_consulta_ms": batch_ms
+        })
+    return results
+
+
+def benchmark_ivf_index(size: int = 100_000, dim: int = 768, top_k: int = 5, nprobes=(1, 4, 8, 16, 32),
+                        n_queries: int = 50, seed: int = 0) -> list:
+    """Mede latência e recall@k do IVFIndex em relação à busca exata para vários `nprobe`."""
+    rng = np.random.default_rng(seed)
+    # Dados agrupados, como em uma base com várias normas e seções.
+    centers = rng.standard_normal((64, dim))
+    corpus = centers[rng.integers(0, 64, size)] + 0.5 * rng.standard_normal((size, dim))
+    queries = corpus[rng.integers(0, size, n_queries)] + 0.5 * rng.standard_normal((n_queries, dim))
+    exact = DenseIndex(corpus)
+    expected, _ = exact.search_batch(queries, top_k)
+    ivf = IVFIndex.build(corpus)
+
+    results = []
+    for nprobe in nprobes:
+        hits = 0
+        start = time.perf_counter()
+        for q, truth in zip(queries, expected):
+            found, _ = ivf.search(q, top_k, nprobe=nprobe)
+            hits += len(set(found.tolist()) & set(truth.tolist()))
+        elapsed_ms = (time.perf_counter() - start) * 1000 / n_queries
+        results.append({"nprobe": nprobe, "ms_por_consulta": elapsed_ms, "recall": hits / (n_queries * top_k)})
+    return results
+
+
+if __name__ == "__main__":
+    print(f"{'corpus':>10} {'anterior (ms)':>15} {'índice (ms)':>13} {'lote/consulta (ms)':>20}")
+    for row in benchmark_dense_index():
+        print(f"{row['corpus']:>10} {row['anterior_ms']:>15.2f} {row['indice_ms']:>13.2f} {row['lote_por_consulta_ms']:>20.3f}")
+
+    print()
+    print(f"{'nprobe':>8} {'ms/consulta':>12} {'recall@5':>10}")
+    for row in benchmark_ivf_index():
+        print(f"{row['nprobe']:>8} {row['ms_por_consulta']:>12.2f} {row['recall']:>10.3f}")
@@ -1,10 +1,15 @@
 import streamlit as st
-from utils.google_sheets_handler import GoogleSheetsHandler
+from utils.google_sheets_handler import (
+    GoogleSheetsHandler, using_fake_sheets, get_sheet_cache, get_sheet_replica, read_replica_enabled,
+    get_sheets_quota
+)
+from utils.fake_gsheets import FAKE_RAG_SPREADSHEET_ID
 from IA.rag_analyzer import RAGAnalyzer
 from about import show_about_page
 from auth.login_page import show_login_page, show_logout_button
 from auth.auth_utils import get_user_display_name, get_user_email
 from operations import front
+from utils.settings import get_app_setting
 
 st.set_page_config(page_title="Cálculo de Brigadistas", page_icon="🔥", layout="wide")
 
@@ -14,7 +19,10 @@ def initialize_services():
     handler = GoogleSheetsHandler()
     
     try:
-        rag_sheet_id = st.secrets["app_settings"]["rag_sheet_id"]
+        if using_fake_sheets():
+            rag_sheet_id = get_app_setting("rag_sheet_id", FAKE_RAG_SPREADSHEET_ID)
+        else:
+            rag_sheet_id = st.secrets["app_settings"]["rag_sheet_id"]
     except KeyError:
         st.error("Configuração 'app_settings.rag_sheet_id' não encontrada no secrets.toml.")
         st.stop()
@@ -38,10 +46,71 @@ def main():
         try:
             df_empresas_debug = handler.get_data_as_df("Empresas")
             st.success("Conexão com a planilha de dados OK.")
+            storage_stats = handler.storage.stats()
+            if storage_stats["backend"] == "parquet":
+                st.write(
+                    f"**Armazenamento local (Parquet):** {storage_stats['reads']} leituras, "
+                    f"{storage_stats['lookups']} buscas, {storage_stats['appended_rows']} linhas gravadas, "
+                    f"{storage_stats['refreshes']} releituras da planilha ({storage_stats['reimports']} abas reescritas)"
+                )
+                if storage_stats["last_error"]:
+                    st.warning(f"Última falha ao reler a planilha: {storage_stats['last_error']}")
+            sheet_stats = get_sheet_cache().stats()
+            st.write(
+                f"**Cache das planilhas:** {sheet_stats['tabs']} abas, {sheet_stats['hits']} acertos, "
+                f"{sheet_stats['loads']} leituras, {sheet_stats['local_appends']} escritas locais, "
+                f"{sheet_stats['memory_bytes'] / 1e6:.1f} MB"
+            )
+            quota_stats = get_sheets_quota().stats()
+            for kind, label in (("read", "leituras"), ("write", "escritas")):
+                stats = quota_stats[kind]
+                st.write(
+                    f"**Cota do Sheets ({label}):** {stats['calls']} requisições, {stats['waiting']} na fila "
+                    f"(máx. {stats['max_waiting']}), {stats['throttle_seconds']:.1f}s de espera, "
+                    f"{stats['retries']} novas tentativas"
+                )
+            if quota_stats["coalesced"]:
+                st.write(f"**Leituras agrupadas:** {quota_stats['coalesced']}")
+            if read_replica_enabled():
+                replica_stats = get_sheet_replica(handler.client, handler.spreadsheet_id).stats()
+                st.write(
+                    f"**Réplica local:** {replica_stats['syncs']} sincronizações "
+                    f"({replica_stats['full_syncs']} completas), {replica_stats['rows_pulled']} linhas copiadas"
+                )
+                if replica_stats["last_error"]:
+                    st.warning(f"Última falha de sincronização: {replica_stats['last_error']}")
+            if handler.write_queue is not None:
+                write_stats = handler.write_queue.stats()
+                st.write(
+                    f"**Fila de escrita:** {write_stats['pending_rows']} linhas pendentes, "
+                    f"{write_stats['written_rows']} gravadas em {write_stats['write_calls']} chamadas"
+                )
+                if write_stats["last_error"]:
+                    st.warning(f"Última falha de gravação: {write_stats['last_error']}")
+                if write_stats["dead_letter_batches"]:
+                    st.error(
+                        f"{write_stats['dead_letter_batches']} lote(s) não gravado(s), guardados em "
+                        f"'{handler.write_queue.dead_letter_path}' para conferência na planilha e reenvio manual."
+                    )
             if not rag_analyzer.rag_df.empty:
                 st.success("Base de conhecimento RAG carregada com sucesso.")
             else:
                 st.error("Falha ao carregar base de conhecimento RAG.")
+            cache_stats = rag_analyzer.query_cache.stats()
+            st.write(
+                f"**Cache de consultas da IA:** {cache_stats['hits']} acertos, "
+                f"{cache_stats['misses']} falhas ({cache_stats['size']}/{cache_stats['maxsize']} entradas)"
+            )
+            result_stats = rag_analyzer.result_cache.stats()
+            st.write(
+                f"**Cache de resultados da IA:** {result_stats['hits']} acertos, "
+                f"{result_stats['misses']} falhas ({result_stats['size']}/{result_stats['max_entries']} entradas)"
+            )
+            st.write("**Chamadas ao Gemini:**")
+            st.json(rag_analyzer.client.metrics.snapshot(), expanded=False)
+            if st.session_state.get("last_prompt_stats"):
+                st.write("**Último prompt de cálculo:**")
+                st.json(st.session_state.last_prompt_stats, expanded=False)
         except Exception as e:
             st.error(f"Erro ao carregar dados: {e}")
 
@@ -4,8 +4,10 @@ from utils.google_sheets_handler import GoogleSheetsHandler
 from IA.rag_analyzer import RAGAnalyzer
 import re
 from operations.pdf_generator import generate_pdf_report_abnt
+from utils.calculator import get_table_divisions, get_risk_levels
 
-
+CALC_MODE_LOCAL = "Local (tabela da norma)"
+CALC_MODE_IA = "IA (Gemini)"
 
 
 @st.dialog("Adicionar Nova Instalação")
@@ -24,7 +26,7 @@ def add_installation_dialog(handler: GoogleSheetsHandler):
 
         st.subheader("Parâmetros de Cálculo")
         new_divisao = st.selectbox("Divisão", get_table_divisions(), key="dialog_div")
-        new_risco = st.selectbox("Risco", ["Baixo", "Médio", "Alto"], key="dialog_risk")
+        new_risco = st.selectbox("Risco", get_risk_levels(), key="dialog_risk")
         
         col1, col2, col3 = st.columns(3)
         with col1: new_t1 = st.number_input("Pop T1", 0, key="dialog_t1")
@@ -62,10 +64,6 @@ def is_valid_date_format(date_string: str) -> bool:
     return pattern.match(date_string) is not None
 
 
-def get_table_divisions():
-    """Retorna uma lista fixa de divisões para o selectbox."""
-    return ["M-2", "D-2", "I-1", "I-2", "I-3", "J-4", "C-1", "C-2"]
-
 def render_sidebar(handler: GoogleSheetsHandler, company_list: list) -> str:
     """
     Desenha a barra lateral completa, incluindo seleção de empresa e botão de adicionar.
@@ -102,6 +100,33 @@ def render_sidebar(handler: GoogleSheetsHandler, company_list: list) -> str:
     return selected_company
 
 
+def show_write_status(handler: GoogleSheetsHandler, state_key: str):
+    """Mostra a situação da última gravação enfileirada guardada em st.session_state[state_key]."""
+    status = handler.get_write_status(st.session_state.get(state_key))
+    if not status:
+        return
+    if status["status"] == "gravado":
+        st.caption(f"✅ Gravação na planilha concluída ({status['rows']} linha(s)).")
+    elif status["status"] == "erro":
+        st.caption(
+            f"⚠️ Falha ao gravar na planilha (tentativa {status.get('attempts', 1)}), "
+            f"nova tentativa em andamento: {status['error']}"
+        )
+    elif status["status"] == "falhou" and status.get("ambiguous"):
+        st.error(
+            f"❌ A planilha não confirmou a gravação de {status['rows']} linha(s) ({status['error']}). "
+            "Ela pode ter sido aplicada mesmo assim: confira a planilha antes de reenviar os dados "
+            "guardados no arquivo de falhas."
+        )
+    elif status["status"] == "falhou":
+        st.error(
+            f"❌ Não foi possível gravar {status['rows']} linha(s) na planilha: {status['error']}. "
+            "Os dados foram guardados no arquivo de falhas para reenvio manual."
+        )
+    else:
+        st.caption(f"⏳ Gravação na planilha pendente ({status['rows']} linha(s)).")
+
+
 def show_brigade_management_page(handler: GoogleSheetsHandler, rag_analyzer: RAGAnalyzer, company_list: list):
     """
     Desenha e gerencia a interface da página de Gestão de Brigadistas.
@@ -117,33 +142,57 @@ def show_brigade_management_page(handler: GoogleSheetsHandler, rag_analyzer: RAG
     st.markdown(f"Adicionar atestados para a empresa: **{selected_company}**")
     
     with st.container(border=True):
-        st.subheader("1. Detalhes do Atestado")
-        validity_date = st.text_input("Data de Validade (DD/MM/AAAA)", placeholder="Ex: 31/12/2025")
-        uploaded_file = st.file_uploader("Carregue o atestado PDF", type="pdf")
+        st.subheader("1. Detalhes dos Atestados")
+        default_validity = st.text_input("Data de Validade padrão (DD/MM/AAAA)", placeholder="Ex: 31/12/2025")
+        uploaded_files = st.file_uploader("Carregue os atestados PDF", type="pdf", accept_multiple_files=True)
 
-    is_date_valid = is_valid_date_format(validity_date)
+        # Cada atestado mantém a sua própria data de validade (inicialmente a data padrão).
+        validity_dates = []
+        for i, pdf in enumerate(uploaded_files or []):
+            validity_dates.append(
+                st.text_input(f"Validade de '{pdf.name}' (DD/MM/AAAA)", value=default_validity, key=f"validade_{i}_{pdf.name}")
+            )
+
+    invalid_files = [pdf.name for pdf, date in zip(uploaded_files or [], validity_dates) if not is_valid_date_format(date)]
+    can_submit = bool(uploaded_files) and bool(selected_company) and not invalid_files
     
-    if st.button("Extrair e Adicionar Brigadistas com IA", disabled=(not all([uploaded_file, selected_company, is_date_valid]))):
-        with st.spinner("IA analisando o atestado... Este processo pode levar um momento."):
-            extracted_data = rag_analyzer.extract_brigadistas_from_pdf(uploaded_file)
+    if st.button("Extrair e Adicionar Brigadistas com IA", disabled=not can_submit):
+        pdf_items = [(i, pdf.getvalue()) for i, pdf in enumerate(uploaded_files)]
+        progress = st.progress(0.0, text=f"IA analisando {len(pdf_items)} atestado(s)...")
+        extracted = {}
 
-        if extracted_data and "nomes" in extracted_data and extracted_data["nomes"]:
-            nomes = extracted_data["nomes"]
-            st.success(f"IA extraiu {len(nomes)} nomes do atestado com sucesso!")
-            
+        for done, (i, extracted_data, error) in enumerate(rag_analyzer.extract_brigadistas_from_pdfs(pdf_items), start=1):
+            file_name = uploaded_files[i].name
+            progress.progress(done / len(pdf_items), text=f"{done} de {len(pdf_items)} atestado(s) processado(s)")
+            if error:
+                st.error(f"'{file_name}': erro ao processar o PDF com a IA: {error}")
+            elif extracted_data and extracted_data.get("nomes"):
+                extracted[i] = extracted_data["nomes"]
+                st.success(f"'{file_name}': IA extraiu {len(extracted[i])} nomes.")
+            else:
+                st.error(f"'{file_name}': a IA não conseguiu extrair uma lista de nomes válida. Verifique o PDF ou tente novamente.")
+                if extracted_data:
+                    st.json(extracted_data)
+
+        if extracted:
             with st.expander("Ver nomes extraídos antes de salvar"):
-                st.write(nomes)
+                for i in sorted(extracted):
+                    st.write(f"**{uploaded_files[i].name}** (validade {validity_dates[i]})")
+                    st.write(extracted[i])
                 
-            with st.spinner("Adicionando brigadistas à planilha..."):
-                empresas_df = handler.get_data_as_df("Empresas")
-                id_empresa = empresas_df.loc[empresas_df['Razao_Social'] == selected_company, 'ID_Empresa'].iloc[0]
-                handler.add_brigadistas_to_sheet(id_empresa, nomes, validity_date)
-        else:
-            st.error("A IA não conseguiu extrair uma lista de nomes válida do documento. Verifique o PDF ou tente novamente.")
-            if extracted_data:
-                st.json(extracted_data)
-    elif not is_date_valid and validity_date:
-        st.error("Formato de data inválido. Por favor, use DD/MM/AAAA.")
+            id_empresa = handler.get_company_id(selected_company)
+            if id_empresa is None:
+                st.error(f"Não foi possível encontrar o ID da empresa para '{selected_company}'. Brigadistas não salvos.")
+            else:
+                with st.spinner("Adicionando brigadistas à planilha..."):
+                    # Uma única escrita na planilha para todos os atestados processados.
+                    st.session_state.brigadistas_write_ticket = handler.add_brigadistas_batch(
+                        [(id_empresa, extracted[i], validity_dates[i]) for i in sorted(extracted)]
+                    )
+    elif invalid_files and any(validity_dates):
+        st.error(f"Formato de data inválido em: {', '.join(invalid_files)}. Por favor, use DD/MM/AAAA.")
+
+    show_write_status(handler, "brigadistas_write_ticket")
 
 
 def show_calculator_page(handler: GoogleSheetsHandler, rag_analyzer: RAGAnalyzer, user_email: str, company_list: list):
@@ -175,7 +224,7 @@ def show_calculator_page(handler: GoogleSheetsHandler, rag_analyzer: RAGAnalyzer
         st.header("1. Parâmetros para Cálculo")
         div_options = get_table_divisions()
         div_index = div_options.index(default_values.get("Divisao")) if default_values.get("Divisao") in div_options else 0
-        risk_options = ["Baixo", "Médio", "Alto"]
+        risk_options = get_risk_levels()
         risk_index = risk_options.index(default_values.get("Risco")) if default_values.get("Risco") in risk_options else 2
         
         col1, col2 = st.columns(2)
@@ -186,7 +235,7 @@ def show_calculator_page(handler: GoogleSheetsHandler, rag_analyzer: RAGAnalyzer
             
         st.subheader("População Fixa por Turno")
         pop_keys = sorted([k for k in default_values.keys() if k.startswith('Pop_Turno')])
-        initial_pops = [int(default_values.get(k, 0)) for k in pop_keys]
+        initial_pops = [int(default_values.get(k) or 0) for k in pop_keys]  # Células vazias contam como 0
         if not initial_pops:
             initial_pops = [0, 0, 0]
             
@@ -197,7 +246,14 @@ def show_calculator_page(handler: GoogleSheetsHandler, rag_analyzer: RAGAnalyzer
                 pop = col.number_input(f"Pop. Turno {i+1}", min_value=0, step=1, value=initial_pops[i])
                 turn_populations.append(pop)
                 
-        submit_button = st.form_submit_button(label='Calcular e Analisar com IA')
+        calc_mode = st.radio(
+            "Modo de Cálculo",
+            [CALC_MODE_LOCAL, CALC_MODE_IA],
+            horizontal=True,
+            help="O modo local aplica a tabela da norma diretamente, sem chamar o modelo de IA."
+        )
+                
+        submit_button = st.form_submit_button(label='Calcular e Analisar')
 
     if submit_button:
         ia_context = {
@@ -206,9 +262,22 @@ def show_calculator_page(handler: GoogleSheetsHandler, rag_analyzer: RAGAnalyzer
             "risk": risk_level,
             "populations": turn_populations
         }
-        with st.spinner("IA está consultando a norma e realizando o cálculo..."):
-            calculation_result = rag_analyzer.calculate_brigade_with_rag(ia_context)
+        if calc_mode == CALC_MODE_LOCAL:
+            calculation_result = rag_analyzer.calculate_brigade_locally(ia_context)
+        else:
+            with st.spinner("IA está consultando a norma e realizando o cálculo..."):
+                calculation_result, prompt_stats = rag_analyzer.calculate_brigade_with_rag(ia_context)
+            st.session_state.last_prompt_stats = prompt_stats
+            if prompt_stats:
+                st.caption(
+                    f"Prompt: ~{prompt_stats['tokens_estimados']} tokens, "
+                    f"{prompt_stats['regras_usadas']} regras da norma "
+                    f"({prompt_stats['regras_duplicadas']} duplicadas, {prompt_stats['regras_descartadas']} fora do orçamento)."
+                )
         
+        if 'generated_report' in st.session_state:
+            del st.session_state.generated_report
+
         if calculation_result:
             st.session_state.last_result = calculation_result
             st.session_state.last_inputs = { 
@@ -219,14 +288,14 @@ def show_calculator_page(handler: GoogleSheetsHandler, rag_analyzer: RAGAnalyzer
             }
         else:
             st.session_state.last_result = None
-            st.error("Não foi possível obter o resultado do cálculo da IA.")
+            st.error("Não foi possível obter o resultado do cálculo.")
 
     if 'last_result' in st.session_state and st.session_state.last_result:
         result_json = st.session_state.last_result
         inputs = st.session_state.last_inputs
         instalacao = result_json.get("dados_da_instalacao", {})
         
-        st.header(f"2. Resultado do Cálculo via IA para: {instalacao.get('imovel', 'N/A')}")
+        st.header(f"2. Resultado do Cálculo para: {instalacao.get('imovel', 'N/A')}")
         
         with st.container(border=True):
             st.subheader("Resumo do Dimensionamento")
@@ -238,21 +307,32 @@ def show_calculator_page(handler: GoogleSheetsHandler, rag_analyzer: RAGAnalyzer
             col1.metric("Total de Brigadistas (Soma dos Turnos)", total_geral)
             col2.metric("Efetivo Mínimo por Turno (Maior Turno)", maior_turno)
 
-        with st.expander("Ver Detalhamento do Cálculo da IA (JSON)"):
+        with st.expander("Ver Detalhamento do Cálculo (JSON)"):
             st.json(result_json)
+
+        # O texto narrativo é a única etapa que depende do modelo generativo no modo local.
+        # O relatório é exibido em streaming, à medida que a IA o redige.
+        if st.button("Gerar Relatório Técnico com IA"):
+            with st.expander("Relatório Técnico (IA)", expanded=True):
+                try:
+                    report = st.write_stream(rag_analyzer.generate_full_report_stream(result_json))
+                except Exception:
+                    # O erro já foi exibido; um relatório interrompido não é guardado nem vai para o PDF.
+                    report = None
+                st.session_state.generated_report = report
+        elif st.session_state.get('generated_report'):
+            with st.expander("Relatório Técnico (IA)", expanded=True):
+                st.markdown(st.session_state.generated_report)
         
         st.subheader("3. Ações e Relatórios")
         col_save, col_pdf = st.columns(2)
 
         with col_save:
             if st.button("Salvar Cálculo na Planilha", use_container_width=True):
-                empresas_df = handler.get_data_as_df("Empresas")
                 razao_social = instalacao.get("razao_social")
 
-                id_empresa_series = empresas_df.loc[empresas_df['Razao_Social'] == razao_social, 'ID_Empresa']
-                if not id_empresa_series.empty:
-                    id_empresa = id_empresa_series.iloc[0]
-                    
+                id_empresa = handler.get_company_id(razao_social)
+                if id_empresa is not None:
                     calculo_info = result_json.get("calculo_por_turno", [])
                     populacoes = [t.get("populacao") for t in calculo_info]
                     detalhes_turnos = [t.get("total_turno") for t in calculo_info]
@@ -266,12 +346,13 @@ def show_calculator_page(handler: GoogleSheetsHandler, rag_analyzer: RAGAnalyzer
                         "total_calculado": resumo.get("total_geral_brigadistas"), 
                         "detalhe_turnos": str(detalhes_turnos)
                     }
-                    handler.save_calculation_result(data_to_save)
+                    st.session_state.result_write_ticket = handler.save_calculation_result(data_to_save)
                 else:
                     st.error(f"Não foi possível encontrar o ID da empresa para '{razao_social}'. Resultado não salvo.")
+            show_write_status(handler, "result_write_ticket")
         
         with col_pdf:
-            pdf_bytes = generate_pdf_report_abnt(result_json, inputs)
+            pdf_bytes = generate_pdf_report_abnt(result_json, inputs, st.session_state.get('generated_report'))
             if pdf_bytes:
                 st.download_button(
                     label="Baixar Relatório ABNT (PDF)",
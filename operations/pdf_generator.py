@@ -1,6 +1,8 @@
 import streamlit as st
 from weasyprint import HTML, CSS
 from datetime import datetime
+import html
+import re
 
 def generate_organogram_html(resumo: dict) -> str:
     """
@@ -10,7 +12,7 @@ def generate_organogram_html(resumo: dict) -> str:
     
     # Este é um organograma genérico. Pode ser expandido para mostrar
     # a distribuição por turno se os dados estiverem disponíveis.
-    html = f"""
+    organograma = f"""
     <div class="org-chart">
         <div class="org-level">
             <div class="org-box coordinator">Coordenador Geral da Brigada</div>
@@ -27,12 +29,65 @@ def generate_organogram_html(resumo: dict) -> str:
         </div>
     </div>
     """
-    return html
+    return organograma
 
-def generate_pdf_report_abnt(calculation_json: dict, inputs: dict) -> bytes:
+def markdown_to_html(markdown_text: str) -> str:
+    """
+    Converte o Markdown simples produzido pela IA (títulos, listas, negrito, tabelas e
+    parágrafos) em HTML para o PDF. O texto é escapado antes da conversão.
+    """
+    def inline(text: str) -> str:
+        return re.sub(r"\*\*(.+?)\*\*", r"<strong>\1</strong>", html.escape(text.strip()))
+
+    parts = []
+    paragraph = []
+    list_items = []
+    table_rows = []
+
+    def flush():
+        if paragraph:
+            parts.append(f"<p>{inline(' '.join(paragraph))}</p>")
+            paragraph.clear()
+        if list_items:
+            parts.append("<ul>" + "".join(f"<li>{inline(item)}</li>" for item in list_items) + "</ul>")
+            list_items.clear()
+        if table_rows:
+            rows = [row for row in table_rows if not re.fullmatch(r"[\s|:-]+", row)]
+            body = "".join(
+                "<tr>" + "".join(f"<td>{inline(cell)}</td>" for cell in row.strip().strip("|").split("|")) + "</tr>"
+                for row in rows
+            )
+            parts.append(f"<table><tbody>{body}</tbody></table>")
+            table_rows.clear()
+
+    for line in markdown_text.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped == "---":
+            flush()
+        elif stripped.startswith("#"):
+            flush()
+            parts.append(f"<h3>{inline(stripped.lstrip('#'))}</h3>")
+        elif stripped.startswith(("- ", "* ")):
+            if paragraph or table_rows:
+                flush()
+            list_items.append(stripped[2:])
+        elif "|" in stripped:
+            if paragraph or list_items:
+                flush()
+            table_rows.append(stripped)
+        else:
+            if list_items or table_rows:
+                flush()
+            paragraph.append(stripped)
+    flush()
+    return "\n".join(parts)
+
+def generate_pdf_report_abnt(calculation_json: dict, inputs: dict, relatorio_ia: str | None = None) -> bytes:
     """
     Gera um relatório em PDF a partir de um template HTML e do JSON de cálculo da IA,
     formatado com um layout ABNT, incluindo contextualização, organograma e referências.
+    Se o relatório técnico redigido pela IA (`relatorio_ia`, em Markdown) for informado,
+    ele é incluído como apêndice.
     """
     try:
         # --- Extração de Dados ---
@@ -86,6 +141,13 @@ def generate_pdf_report_abnt(calculation_json: dict, inputs: dict) -> bytes:
 
         organograma_html = generate_organogram_html(resumo)
 
+        apendice_html = ""
+        if relatorio_ia:
+            apendice_html = f"""
+            <h2 style="page-break-before: always;">APÊNDICE A – RELATÓRIO TÉCNICO REDIGIDO PELA IA</h2>
+            {markdown_to_html(relatorio_ia)}
+            """
+
         # --- Template CSS (Estilo ABNT Robusto + Estilos do Organograma) ---
         css_abnt = """
             @page {
@@ -165,6 +227,7 @@ def generate_pdf_report_abnt(calculation_json: dict, inputs: dict) -> bytes:
 
             <h2 style="page-break-before: always;">6 REFERÊNCIAS</h2>
             {referencias_abnt_html}
+            {apendice_html}
         </body>
         </html>
         """
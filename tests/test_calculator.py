@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from utils.calculator import calculate_brigade_batch, calculate_total_brigade
+from utils.nbr_rules import load_rule_engine
+
+
+def test_calculate_brigade_batch_matches_calculate_total_brigade():
+    engine = load_rule_engine()
+    rng = np.random.default_rng(0)
+    combos = [(d, r) for d in engine.divisions for r in engine.risks]
+    picks = rng.integers(0, len(combos), size=200)
+    divisions = [combos[i][0] for i in picks]
+    risks = [combos[i][1] for i in picks]
+    populations = rng.integers(0, 1500, size=(200, 3))
+    # Bordas: população zero e o limite da população base
+    populations[:3] = [[0, 0, 0], [10, 10, 10], [9, 11, 12]]
+
+    batch = calculate_brigade_batch(divisions, risks, populations)
+    for i, (division, risk) in enumerate(zip(divisions, risks)):
+        scalar = calculate_total_brigade(populations[i].tolist(), division, risk)
+        assert batch["brigadistas_por_turno"][i].tolist() == scalar["brigadistas_por_turno"]
+        assert batch["total_brigadistas"][i] == scalar["total_brigadistas"]
+        assert batch["maior_turno_necessidade"][i] == scalar["maior_turno_necessidade"]
+
+
+def test_calculate_brigade_batch_accepts_a_single_shift_per_installation():
+    engine = load_rule_engine()
+    division, risk = engine.divisions[0], engine.risks[0]
+    batch = calculate_brigade_batch([division, division], [risk, risk], [5, 40])
+    assert batch["brigadistas_por_turno"].shape == (2, 1)
+    assert batch["total_brigadistas"].tolist() == [
+        calculate_total_brigade([5], division, risk)["total_brigadistas"],
+        calculate_total_brigade([40], division, risk)["total_brigadistas"],
+    ]
+
+
+def test_calculate_brigade_batch_rejects_mismatched_lengths():
+    engine = load_rule_engine()
+    with pytest.raises(ValueError):
+        calculate_brigade_batch([engine.divisions[0]], [engine.risks[0]] * 2, [[10], [20]])
@@ -0,0 +1,105 @@
+import pandas as pd
+import pytest
+
+from utils.company_repository import CompanyRepository
+from utils.sheet_schema import (
+    BRIGADISTAS_SHEET, DADOS_CALCULO_SHEET, DATA_SHEET_COLUMNS, DATA_SHEETS, EMPRESAS_SHEET, apply_schema
+)
+from utils.storage_backend import StorageBackend, lookup_key
+
+
+def _numericise(value: str):
+    for convert in (int, float):
+        try:
+            return convert(value)
+        except ValueError:
+            pass
+    return value
+
+
+def _workbook() -> dict:
+    tabs = {name: [list(columns)] for name, columns in DATA_SHEET_COLUMNS.items()}
+    tabs[EMPRESAS_SHEET] += [["EMP1", "Empresa Um", "123", "Sede"], ["7", "Empresa Sete", "456", "Filial"],
+                             ["EMP9", "Empresa Um", "999", "Duplicada"]]
+    tabs[DADOS_CALCULO_SHEET] += [["EMP1", "M-2", "Baixo", "10", "5", ""], ["007", "I-1", "Alto", "30", "", ""]]
+    tabs[BRIGADISTAS_SHEET] += [["EMP1", "Ana", "a@x.com", "31/12/2030"], ["7", "Bia", "", "01/01/2029"],
+                                ["EMP1", "Caio", "c@x.com", "31/12/2030"]]
+    return tabs
+
+
+class FrameBackend(StorageBackend):
+    """Backend em memória: as abas convertidas como na leitura da planilha."""
+    name = "memoria"
+
+    def __init__(self, tabs: dict):
+        self.frames = {
+            name: apply_schema(name, pd.DataFrame([[_numericise(cell) for cell in row] for row in rows[1:]],
+                                                  columns=rows[0]))
+            for name, rows in tabs.items()
+        }
+        self.lookups = []
+
+    def read(self, sheet_name, columns=None):
+        frame = self.frames[sheet_name]
+        return frame[columns] if columns is not None else frame.copy()
+
+    def lookup(self, sheet_name, column, value, columns=None):
+        self.lookups.append((sheet_name, column))
+        frame = self.frames[sheet_name]
+        matches = frame[frame[column].astype(object).map(lookup_key) == lookup_key(_numericise(str(value)))]
+        return matches[columns] if columns is not None else matches
+
+    def append(self, sheet_name, rows, deferred=False):
+        raise NotImplementedError
+
+
+@pytest.fixture(params=["memoria", "parquet"])
+def storage(request, tmp_path):
+    tabs = _workbook()
+    if request.param == "memoria":
+        return FrameBackend(tabs)
+    pytest.importorskip("pyarrow")
+    from utils.storage_backend import ParquetBackend
+    return ParquetBackend(tmp_path, fetch_values=lambda names: {name: tabs[name] for name in names},
+                          parse_cell=_numericise, transform=apply_schema, sheet_names=DATA_SHEETS)
+
+
+def test_company_queries(storage):
+    repository = CompanyRepository(storage)
+
+    assert repository.company_names() == ["Empresa Um", "Empresa Sete", "Empresa Um"]
+    # Nomes repetidos: vale a primeira linha da planilha
+    assert repository.get_company("Empresa Um") == {
+        "ID_Empresa": "EMP1", "Razao_Social": "Empresa Um", "CNPJ": 123, "Imovel": "Sede"
+    }
+    assert repository.get_company_id("Empresa Sete") == 7
+    assert repository.get_company_by_id("EMP9")["Imovel"] == "Duplicada"
+    assert repository.get_company("Inexistente") is None
+    assert repository.get_company_id("Inexistente") is None
+
+
+def test_calculation_data_matches_ids_in_any_form(storage):
+    repository = CompanyRepository(storage)
+    assert repository.get_calculation_data("Empresa Um") == {
+        "ID_Empresa": "EMP1", "Divisao": "M-2", "Risco": "Baixo", "Pop_Turno1": 10, "Pop_Turno2": 5, "Pop_Turno3": ""
+    }
+    # "007" na aba Dados_Calculo corresponde ao ID 7 da aba Empresas
+    assert repository.get_calculation_data("Empresa Sete")["Divisao"] == "I-1"
+    assert repository.get_calculation_data("Inexistente") is None
+
+
+def test_brigadistas_come_grouped_by_company(storage):
+    repository = CompanyRepository(storage)
+
+    brigadistas = repository.get_brigadistas("Empresa Um")
+    assert brigadistas["Nome"].tolist() == ["Ana", "Caio"]
+    assert str(brigadistas["Validade"].dtype).startswith("datetime")
+    assert repository.get_brigadistas("Empresa Sete")["Nome"].tolist() == ["Bia"]
+    assert repository.get_brigadistas("Inexistente").empty
+
+
+def test_queries_go_through_the_backend_index():
+    storage = FrameBackend(_workbook())
+    repository = CompanyRepository(storage)
+    repository.get_brigadistas("Empresa Um")
+    assert storage.lookups == [(EMPRESAS_SHEET, "Razao_Social"), (BRIGADISTAS_SHEET, "ID_Empresa")]
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from IA.embedding_store import EmbeddingStore
+
+
+def _vector(text: str) -> list:
+    return [float(len(text)), float(sum(map(ord, text)) % 97), 1.0]
+
+
+class RecordingEmbedder:
+    """Embedder que registra os textos pedidos e falha (None) nos textos de `failing`."""
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.requests = []
+
+    def __call__(self, texts: list) -> list:
+        self.requests.append(list(texts))
+        return [None if text in self.failing else _vector(text) for text in texts]
+
+
+def test_sync_partial_failure_zero_fills_and_retries_only_failed(tmp_path):
+    texts = ["a", "bb", "ccc", "bb"]
+    store = EmbeddingStore(str(tmp_path), model="test-model")
+
+    first = RecordingEmbedder(failing={"ccc"})
+    matrix = store.sync(texts, first)
+    assert first.requests == [["a", "bb", "ccc"]]
+    assert matrix.shape == (4, 3)
+    np.testing.assert_array_equal(matrix[0], _vector("a"))
+    np.testing.assert_array_equal(matrix[1], matrix[3])
+    np.testing.assert_array_equal(matrix[2], np.zeros(3))
+    assert len(store) == 2  # o texto que falhou não é gravado
+
+    # Uma nova instância (ex: após reiniciar) relê o disco e só reenvia o texto que falhou.
+    reopened = EmbeddingStore(str(tmp_path), model="test-model")
+    second = RecordingEmbedder()
+    matrix = reopened.sync(texts, second)
+    assert second.requests == [["ccc"]]
+    np.testing.assert_array_equal(matrix[2], _vector("ccc"))
+    assert len(reopened) == 3
+
+    third = RecordingEmbedder()
+    reopened.sync(texts, third)
+    assert third.requests == []
+
+
+def test_sync_raises_when_nothing_could_be_embedded(tmp_path):
+    store = EmbeddingStore(str(tmp_path), model="test-model")
+    with pytest.raises(ValueError):
+        store.sync(["a", "b"], RecordingEmbedder(failing={"a", "b"}))
+    assert len(store) == 0
+
+
+def test_sync_rejects_wrong_number_of_embeddings(tmp_path):
+    store = EmbeddingStore(str(tmp_path), model="test-model")
+    with pytest.raises(ValueError):
+        store.sync(["a", "b"], lambda texts: [_vector("a")])
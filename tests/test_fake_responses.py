@@ -0,0 +1,59 @@
+import json
+
+from IA.fake_responses import respond_to_prompt
+from IA.prompts import (
+    build_brigade_calculation_prompt, get_pdf_extraction_prompt, get_pdf_text_extraction_prompt,
+    get_report_generation_prompt
+)
+from utils.calculator import calculate_shift_breakdown
+from utils.nbr_rules import load_rule_engine
+
+
+def _calculation_prompt(populations: list) -> tuple[str, str, str]:
+    engine = load_rule_engine()
+    division, risk = engine.divisions[0], engine.risks[-1]
+    prompt, _ = build_brigade_calculation_prompt({
+        "installation_info": {"Razao_Social": "ACME Ltda", "Imovel": "Galpão 1"},
+        "division": division, "risk": risk, "populations": populations,
+    }, ["Regra da tabela"])
+    return prompt, division, risk
+
+
+def test_calculation_prompt_gets_the_rule_engine_result_in_the_requested_schema():
+    populations = [8, 37, 250]
+    prompt, division, risk = _calculation_prompt(populations)
+
+    result = json.loads(respond_to_prompt(prompt))
+
+    assert result["dados_da_instalacao"] == {"razao_social": "ACME Ltda", "imovel": "Galpão 1"}
+    totals = [calculate_shift_breakdown(division, risk, pop)["total_turno"] for pop in populations]
+    assert [shift["total_turno"] for shift in result["calculo_por_turno"]] == totals
+    assert [shift["populacao"] for shift in result["calculo_por_turno"]] == populations
+    assert result["resumo_final"] == {"total_geral_brigadistas": sum(totals), "maior_turno_necessidade": max(totals)}
+
+
+def test_report_prompt_gets_markdown_built_from_the_calculation():
+    prompt, _, _ = _calculation_prompt([12, 40])
+    calculation = json.loads(respond_to_prompt(prompt))
+
+    report = respond_to_prompt(get_report_generation_prompt(calculation))
+
+    assert report.startswith("### Relatório de Dimensionamento de Brigada de Incêndio")
+    for section in ("Introdução", "Metodologia Aplicada", "Detalhamento do Cálculo", "Conclusão", "Referências Normativas"):
+        assert section in report
+    assert f"**{calculation['resumo_final']['total_geral_brigadistas']}** brigadistas" in report
+
+
+def test_extraction_prompts_get_a_name_list():
+    text = "CERTIFICADO DE TREINAMENTO\nParticipantes:\nMaria da Silva\nJoão Pereira Souza\nCarga horária: 8h\n"
+    assert json.loads(respond_to_prompt(get_pdf_text_extraction_prompt(text))) == {
+        "nomes": ["Maria da Silva", "João Pereira Souza"]
+    }
+
+    contents = [get_pdf_extraction_prompt(), {"mime_type": "application/pdf", "data": b"%PDF-1.4 exemplo"}]
+    names = json.loads(respond_to_prompt(contents))["nomes"]
+    assert names and names == json.loads(respond_to_prompt(contents))["nomes"]
+
+
+def test_unknown_prompt_gets_an_empty_json():
+    assert respond_to_prompt("outra tarefa") == "{}"
@@ -0,0 +1,201 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from IA.embedding_store import EmbeddingStore
+from IA.gemini_client import AsyncRateLimiter, FakeGeminiBackend, FakeResponse, GeminiClient, split_into_batches
+from utils.simulation import FakeServiceError
+
+
+class ScriptedBackend:
+    """
+    Backend de teste: cada chamada espera `delay` segundos e, enquanto houver itens em
+    `failures`, levanta o próximo. Registra o pico de chamadas simultâneas.
+    """
+    def __init__(self, delay: float = 0.0, failures=(), failing_texts=()):
+        self.delay = delay
+        self.failures = list(failures)
+        self.failing_texts = set(failing_texts)
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def _enter(self):
+        with self._lock:
+            self.calls += 1
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            failure = self.failures.pop(0) if self.failures else None
+        try:
+            time.sleep(self.delay)
+        finally:
+            with self._lock:
+                self.active -= 1
+        if failure is not None:
+            raise failure
+
+    def embed_content(self, model, texts, task_type, timeout=None):
+        self._enter()
+        if self.failing_texts & set(texts):
+            raise FakeServiceError("lote com texto que sempre falha")
+        return [[float(len(text))] for text in texts]
+
+    def generate_content(self, model, contents, generation_config=None, safety_settings=None,
+                         timeout=None, stream=False):
+        self._enter()
+        return [FakeResponse("a"), FakeResponse("b")] if stream else FakeResponse(f"resposta: {contents}")
+
+
+def _client(backend, **options) -> GeminiClient:
+    options = {"timeout": 5.0, "max_retries": 3, "base_delay": 0.001, "max_delay": 0.002, **options}
+    return GeminiClient(backend, **options)
+
+
+def test_transient_errors_are_retried_with_backoff():
+    backend = ScriptedBackend(failures=[FakeServiceError("429"), FakeServiceError("503")])
+    client = _client(backend)
+
+    assert client.generate("p", model="m").text == "resposta: p"
+    assert backend.calls == 3
+    stats = client.metrics.snapshot()["generate"]
+    assert (stats["calls"], stats["errors"], stats["retries"]) == (3, 2, 2)
+
+
+def test_retries_stop_after_max_retries_and_other_errors_are_not_retried():
+    backend = ScriptedBackend(failures=[FakeServiceError("503")] * 10)
+    client = _client(backend, max_retries=2)
+    with pytest.raises(FakeServiceError):
+        client.embed(["a"], task_type="t", model="m")
+    assert backend.calls == 3
+
+    backend = ScriptedBackend(failures=[ValueError("pedido inválido")])
+    client = _client(backend)
+    with pytest.raises(ValueError):
+        client.embed(["a"], task_type="t", model="m")
+    assert backend.calls == 1
+
+
+def test_each_attempt_is_bounded_by_the_timeout():
+    backend = ScriptedBackend(delay=0.5)
+    client = _client(backend, timeout=0.05, max_retries=1)
+
+    start = time.perf_counter()
+    with pytest.raises((TimeoutError, asyncio.TimeoutError)):
+        client.generate("p", model="m")
+    assert time.perf_counter() - start < 0.5
+    stats = client.metrics.snapshot()["generate"]
+    assert (stats["calls"], stats["timeouts"]) == (2, 1)
+
+
+@pytest.mark.parametrize("timeout", [5.0, 0.02])
+def test_semaphore_limits_concurrent_calls_even_after_timeouts(timeout):
+    backend = ScriptedBackend(delay=0.05)
+    client = _client(backend, timeout=timeout, max_retries=0, max_concurrency=2)
+
+    async def burst():
+        return await asyncio.gather(*(client.agenerate(str(i), model="m") for i in range(8)), return_exceptions=True)
+
+    client.run(burst())
+    time.sleep(0.2)  # chamadas abandonadas por timeout continuam ocupando a vaga até terminar
+    assert backend.calls == 8
+    assert backend.peak == 2
+
+
+def test_embed_batches_keeps_successful_batches_when_one_fails():
+    texts = [f"texto {i}" for i in range(10)]
+    backend = ScriptedBackend(failing_texts={"texto 4"})
+    client = _client(backend, max_retries=0)
+    progress = []
+
+    vectors = client.embed_batches(texts, task_type="t", model="m", batch_size=3, retry_rounds=1,
+                                   progress=lambda done, total: progress.append((done, total)))
+
+    assert vectors[3:6] == [None, None, None]
+    assert vectors[:3] + vectors[6:] == [[float(len(text))] for text in texts[:3] + texts[6:]]
+    # 4 lotes na primeira rodada e o lote que falhou mais uma vez
+    assert backend.calls == 5
+    assert progress[-1] == (7, 10)
+
+
+def test_stream_yields_chunks_and_records_time_to_first_chunk():
+    text = "trecho " * 40
+    client = _client(FakeGeminiBackend(responder=lambda contents: text, latency=0.05))
+
+    chunks = list(client.stream_generate("p", model="m"))
+
+    assert len(chunks) > 1 and "".join(chunks) == text
+    snapshot = client.metrics.snapshot()
+    assert snapshot["generate_stream"]["calls"] == 1
+    assert snapshot["generate_stream_ttfb"]["p50_ms"] >= 50
+
+
+def test_stream_retries_errors_before_the_first_chunk():
+    backend = ScriptedBackend(failures=[FakeServiceError("503")])
+    client = _client(backend)
+    assert list(client.stream_generate("p", model="m")) == ["a", "b"]
+    assert client.metrics.snapshot()["generate_stream"]["retries"] == 1
+
+
+def test_fake_backend_is_deterministic():
+    first, second = FakeGeminiBackend(dimension=8), FakeGeminiBackend(dimension=8)
+    assert first.embed_content("m", ["a", "b"], "t") == second.embed_content("m", ["a", "b"], "t")
+    assert first.embed_content("m", ["a"], "t") != first.embed_content("m", ["b"], "t")
+
+    failing = [FakeGeminiBackend(error_rate=0.5, seed=7) for _ in range(2)]
+    outcomes = []
+    for backend in failing:
+        results = []
+        for _ in range(20):
+            try:
+                backend.generate_content("m", "outro prompt")
+                results.append(True)
+            except FakeServiceError:
+                results.append(False)
+        outcomes.append(results)
+    assert outcomes[0] == outcomes[1] and not all(outcomes[0])
+    assert json.loads(FakeGeminiBackend().generate_content("m", "outro prompt").text) == {}
+
+
+def test_split_into_batches_caps_items_and_characters():
+    texts = ["a" * 5, "b" * 5, "c" * 5, "d" * 20, "e", "f"]
+    assert split_into_batches(texts, max_items=2) == [(0, 2), (2, 4), (4, 6)]
+    # Um texto maior que o limite de caracteres forma um lote sozinho
+    assert split_into_batches(texts, max_items=10, max_chars=12) == [(0, 2), (2, 3), (3, 4), (4, 6)]
+    assert split_into_batches([], max_items=3) == []
+
+
+def test_rate_limiter_spaces_out_request_starts():
+    limiter = AsyncRateLimiter(requests_per_minute=1200)  # uma a cada 50 ms
+    starts = []
+
+    async def burst():
+        async def one():
+            await limiter.acquire()
+            starts.append(time.perf_counter())
+        await asyncio.gather(*(one() for _ in range(4)))
+
+    asyncio.run(burst())
+    gaps = [later - earlier for earlier, later in zip(starts, starts[1:])]
+    assert min(gaps) >= 0.04
+
+
+def test_batched_embeddings_fill_the_store_and_resend_only_failed_batches(tmp_path):
+    texts = [f"regra {i}" for i in range(9)]
+    backend = ScriptedBackend(failing_texts={"regra 7"})
+    client = _client(backend, max_retries=0)
+    embed = lambda pending: client.embed_batches(pending, task_type="t", model="m", batch_size=4, retry_rounds=0)
+
+    store = EmbeddingStore(str(tmp_path), model="m")
+    matrix = store.sync(texts, embed)
+    # Lotes [0-3], [4-7] e [8]; só o segundo falha
+    assert backend.calls == 3
+    assert len(store) == 5 and not matrix[4:8].any() and matrix[[0, 3, 8]].all()
+
+    backend.failing_texts.clear()
+    matrix = store.sync(texts, embed)
+    assert backend.calls == 4  # apenas os textos do lote que falhou
+    assert len(store) == 9 and matrix.all()
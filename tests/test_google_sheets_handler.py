@@ -0,0 +1,144 @@
+import pytest
+
+pytest.importorskip("streamlit")
+pytest.importorskip("gspread")
+
+from utils import google_sheets_handler as handler  # noqa: E402
+from utils.fake_gsheets import FakeGspreadClient  # noqa: E402
+from utils.sheet_schema import BRIGADISTAS_SHEET, DATA_SHEET_COLUMNS, DATA_SHEETS, EMPRESAS_SHEET  # noqa: E402
+
+SHEET_ID = "planilha-teste"
+
+
+def _workbook() -> dict:
+    tabs = {name: [list(columns)] for name, columns in DATA_SHEET_COLUMNS.items()}
+    tabs[EMPRESAS_SHEET] += [["EMP1", "Empresa Um", "123", "Sede"], ["7", "Empresa Sete", "456", ""]]
+    tabs[BRIGADISTAS_SHEET] += [["EMP1", "Ana", "a@x.com", "31/12/2030"]]
+    return tabs
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """Cliente gspread em memória, com os caches do processo (compartilhados) zerados."""
+    monkeypatch.setenv("BRIGADA_WRITE_BEHIND_ENABLED", "false")
+    monkeypatch.setenv("BRIGADA_READ_REPLICA_ENABLED", "false")
+    for cached in (handler.get_sheets_quota, handler.get_worksheet_pool, handler.get_sheet_cache):
+        cached.clear()
+    yield FakeGspreadClient({SHEET_ID: _workbook()})
+    for cached in (handler.get_worksheet_pool, handler.get_sheet_cache):
+        cached.clear()
+
+
+def test_values_to_df_converts_cells_like_get_all_records():
+    frame = handler.values_to_df([["ID", "Nome", "Pop"], ["1", "Ana", "10"], ["2", "Bia"]])
+    assert frame.columns.tolist() == ["ID", "Nome", "Pop"]
+    assert frame.to_dict("records") == [{"ID": 1, "Nome": "Ana", "Pop": 10}, {"ID": 2, "Nome": "Bia", "Pop": ""}]
+    assert handler.values_to_df([]).empty
+
+
+def test_data_tabs_are_loaded_with_a_single_batch_read(client):
+    frames = handler.load_data_sheets(client, SHEET_ID)
+
+    assert set(frames) == set(DATA_SHEETS)
+    assert client.calls.get("read") == 1
+    assert frames[EMPRESAS_SHEET].frame["Razao_Social"].tolist() == ["Empresa Um", "Empresa Sete"]
+    assert frames[BRIGADISTAS_SHEET].frame["Nome"].tolist() == ["Ana"]
+
+    # Dentro do prazo do cache, nenhuma nova leitura
+    handler.load_data_sheets(client, SHEET_ID)
+    assert client.calls.get("read") == 1
+
+
+def test_batch_read_falls_back_to_one_read_per_tab(client):
+    calls = []
+    pool = handler.get_worksheet_pool(client)
+
+    def failing_batch_get(sheet_id, ranges):
+        calls.append(list(ranges))
+        raise RuntimeError("batchGet indisponível")
+
+    pool.batch_get = failing_batch_get
+    frames = handler.load_data_sheets(client, SHEET_ID, (EMPRESAS_SHEET, BRIGADISTAS_SHEET))
+
+    assert calls == [["'Empresas'", "'Brigadistas_Treinados'"]]
+    assert frames[EMPRESAS_SHEET].frame["ID_Empresa"].tolist() == ["EMP1", 7]
+    assert client.calls.get("read") == 2
+
+
+class ReopenableClient:
+    """
+    Cliente cujos handles ficam desatualizados quando a planilha é "recriada" (`recreate`):
+    a partir daí, os handles antigos levantam WorksheetNotFound, como no gspread.
+    """
+    def __init__(self, fake: FakeGspreadClient):
+        self.fake = fake
+        self.generation = 0
+        self.opens = 0
+
+    def recreate(self) -> None:
+        self.generation += 1
+
+    def open_by_key(self, key: str):
+        self.opens += 1
+        return StaleableHandle(self, self.fake.open_by_key(key), self.generation)
+
+
+class StaleableHandle:
+    def __init__(self, client: ReopenableClient, target, generation: int):
+        self._client = client
+        self._target = target
+        self._generation = generation
+
+    def __getattr__(self, name):
+        if self._client.generation != self._generation:
+            raise handler.gspread.exceptions.WorksheetNotFound("handle desatualizado")
+        value = getattr(self._target, name)
+        if name == "worksheet":
+            return lambda title: StaleableHandle(self._client, value(title), self._generation)
+        return value
+
+
+def _pool(client) -> handler.WorksheetPool:
+    return handler.WorksheetPool(client, quota=handler.SheetsQuota(backoff_base=0.001, backoff_max=0.01))
+
+
+def test_pool_reuses_spreadsheet_and_worksheet_handles():
+    client = ReopenableClient(FakeGspreadClient({SHEET_ID: _workbook()}))
+    pool = _pool(client)
+
+    for _ in range(3):
+        assert len(pool.get_all_records(SHEET_ID, EMPRESAS_SHEET)) == 2
+    pool.append_rows(SHEET_ID, EMPRESAS_SHEET, [["EMP9", "Empresa Nove", "", ""]])
+    pool.batch_get(SHEET_ID, ["'Empresas'"])
+
+    assert client.opens == 1
+    assert client.fake.calls.get("metadata") == 1
+
+
+def test_pool_refreshes_stale_handles_once():
+    client = ReopenableClient(FakeGspreadClient({SHEET_ID: _workbook()}))
+    pool = _pool(client)
+    pool.get_all_records(SHEET_ID, EMPRESAS_SHEET)
+
+    client.recreate()
+    assert len(pool.get_all_records(SHEET_ID, EMPRESAS_SHEET)) == 2
+    assert client.opens == 2
+
+    client.recreate()
+    pool.append_rows(SHEET_ID, BRIGADISTAS_SHEET, [["EMP1", "Bia", "", ""]])
+    assert client.opens == 3
+    assert [record["Nome"] for record in pool.get_all_records(SHEET_ID, BRIGADISTAS_SHEET)] == ["Ana", "Bia"]
+
+
+def test_pool_does_not_retry_other_errors():
+    client = ReopenableClient(FakeGspreadClient({SHEET_ID: _workbook()}))
+    pool = _pool(client)
+    with pytest.raises(handler.gspread.exceptions.WorksheetNotFound):
+        pool.get_all_records(SHEET_ID, "Aba Inexistente")
+
+    def failing(worksheet):
+        raise ValueError("erro da operação")
+
+    with pytest.raises(ValueError):
+        pool.with_worksheet(SHEET_ID, EMPRESAS_SHEET, failing)
+    assert client.opens == 2  # só a aba inexistente provocou uma reabertura
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from utils.nbr_rules import compile_rule_table, load_rule_engine
+
+
+def _populations(rule) -> np.ndarray:
+    """Populações nas bordas de cada faixa e acima da última (onde entra o acréscimo)."""
+    edges = {0, 1, -5}
+    for limit in rule.limits:
+        edges.update({limit - 1, limit, limit + 1})
+    last = rule.limits[-1]
+    edges.update(last + k for k in range(1, 4 * rule.divisor + 2))
+    return np.array(sorted(edges), dtype=np.int64)
+
+
+def test_evaluate_batch_matches_scalar_for_every_rule():
+    engine = load_rule_engine()
+    for division in engine.divisions:
+        for risk in engine.risks:
+            rule = engine.get_rule(division, risk)
+            populations = _populations(rule).reshape(-1, 1)
+            divisions = np.full(len(populations), division, dtype=object)
+            risks = np.full(len(populations), risk, dtype=object)
+
+            batch = engine.evaluate_batch(divisions, risks, populations)[:, 0]
+            scalar = [engine.evaluate(division, risk, int(p)) for p in populations[:, 0]]
+            assert batch.tolist() == scalar, (division, risk)
+
+
+def test_evaluate_batch_with_mixed_rules_keeps_row_order():
+    engine = load_rule_engine()
+    rng = np.random.default_rng(0)
+    combos = [(d, r) for d in engine.divisions for r in engine.risks]
+    picks = rng.integers(0, len(combos), size=300)
+    divisions = np.array([combos[i][0] for i in picks], dtype=object)
+    risks = np.array([combos[i][1] for i in picks], dtype=object)
+    populations = rng.integers(0, 2000, size=(300, 3))
+
+    batch = engine.evaluate_batch(divisions, risks, populations)
+    for row, (division, risk) in enumerate(zip(divisions, risks)):
+        assert batch[row].tolist() == [engine.evaluate(division, risk, int(p)) for p in populations[row]]
+
+
+def test_todos_band_and_unknown_combination():
+    engine = compile_rule_table({
+        "acrescimo_por_risco": {"Baixo": 20},
+        "divisoes": {"X-1": {"faixas": {"Baixo": [{"ate": 2, "brigadistas": "Todos"}, {"ate": 10, "brigadistas": 4}]}}},
+    })
+    populations = np.array([[1], [2], [3], [10], [11], [31]])
+    divisions = np.full(6, "X-1", dtype=object)
+    risks = np.full(6, "Baixo", dtype=object)
+    assert engine.evaluate_batch(divisions, risks, populations)[:, 0].tolist() == [1, 2, 3, 4, 5, 6]
+    with pytest.raises(ValueError):
+        engine.evaluate_batch(np.array(["X-1"], dtype=object), np.array(["Alto"], dtype=object), np.array([[1]]))
+    with pytest.raises(ValueError):
+        engine.evaluate("X-1", "Alto", 5)
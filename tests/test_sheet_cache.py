@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.sheet_cache import SheetCache, _memory_bytes, freeze_frame
+from utils.sheet_schema import BRIGADISTAS_SHEET, DADOS_CALCULO_SHEET, apply_schema
+
+SHEET_ID = "planilha-teste"
+
+
+class CountingLoader:
+    """Loader de teste: devolve uma aba com uma linha por nome e registra os pedidos."""
+    def __init__(self):
+        self.requests = []
+
+    def __call__(self, sheet_names):
+        self.requests.append(tuple(sheet_names))
+        return {name: pd.DataFrame({"ID": [1], "Nome": [name]}) for name in sheet_names}
+
+
+def test_tabs_are_loaded_together_once_within_the_ttl():
+    cache, loader = SheetCache(ttl=60), CountingLoader()
+
+    first = cache.get_many(SHEET_ID, ("A", "B"), loader)
+    second = cache.get_many(SHEET_ID, ("A", "B"), loader)
+
+    assert loader.requests == [("A", "B")]
+    assert second["A"].frame is first["A"].frame
+    assert cache.stats()["loads"] == 1 and cache.stats()["hits"] == 1
+
+    # Só a aba ainda não carregada vai ao loader
+    cache.get_many(SHEET_ID, ("A", "C"), loader)
+    assert loader.requests[-1] == ("C",)
+
+
+def test_expired_tabs_are_reloaded():
+    cache, loader = SheetCache(ttl=0), CountingLoader()
+    cache.get(SHEET_ID, "A", loader)
+    cache.get(SHEET_ID, "A", loader)
+    assert loader.requests == [("A",), ("A",)]
+
+
+def test_append_rows_writes_through_with_a_new_version():
+    cache, loader = SheetCache(ttl=60), CountingLoader()
+    before = cache.get(SHEET_ID, "A", loader)
+
+    parse_cell = lambda value: int(value) if value.isdigit() else value
+    cache.append_rows(SHEET_ID, "A", [["2", "Nova"], ["3"]], parse_cell=parse_cell)
+    after = cache.get(SHEET_ID, "A", loader)
+
+    assert loader.requests == [("A",)]
+    assert after.version > before.version
+    assert after.frame.to_dict("records") == [{"ID": 1, "Nome": "A"}, {"ID": 2, "Nome": "Nova"}, {"ID": 3, "Nome": ""}]
+    # Quem leu a versão anterior continua com o DataFrame antigo
+    assert before.frame["ID"].tolist() == [1]
+
+
+def test_append_to_a_tab_not_in_cache_only_invalidates_it():
+    cache, loader = SheetCache(ttl=60), CountingLoader()
+    cache.append_rows(SHEET_ID, "A", [["2", "Nova"]])
+    assert cache.get(SHEET_ID, "A", loader).frame["ID"].tolist() == [1]
+    assert cache.stats()["local_appends"] == 0
+
+
+def test_invalidating_one_tab_keeps_the_others():
+    cache, loader = SheetCache(ttl=60), CountingLoader()
+    cache.get_many(SHEET_ID, ("A", "B"), loader)
+    cache.get(SHEET_ID + "-outra", "A", loader)
+
+    cache.invalidate(SHEET_ID, "A")
+    cache.get_many(SHEET_ID, ("A", "B"), loader)
+    assert loader.requests[-1] == ("A",)
+
+    cache.invalidate(SHEET_ID)
+    assert cache.stats()["tabs"] == 1
+
+
+def test_derived_objects_are_rebuilt_only_when_versions_change():
+    cache, loader = SheetCache(ttl=60), CountingLoader()
+    builds = []
+
+    def build():
+        builds.append(1)
+        return object()
+
+    versions = lambda: (cache.get(SHEET_ID, "A", loader).version,)
+    first = cache.derived("repositorio", versions(), build)
+    assert cache.derived("repositorio", versions(), build) is first
+
+    cache.append_rows(SHEET_ID, "A", [["2", "Nova"]])
+    assert cache.derived("repositorio", versions(), build) is not first
+    assert len(builds) == 2
+
+
+def test_transform_is_applied_to_loaded_and_appended_frames():
+    transform = lambda sheet_name, frame: frame.assign(ID=pd.to_numeric(frame["ID"]).astype("Int32"))
+    cache, loader = SheetCache(ttl=60, transform=transform), CountingLoader()
+
+    assert str(cache.get(SHEET_ID, "A", loader).frame["ID"].dtype) == "Int32"
+    cache.append_rows(SHEET_ID, "A", [["2", "Nova"]])
+    frame = cache.get(SHEET_ID, "A", loader).frame
+    assert str(frame["ID"].dtype) == "Int32" and frame["ID"].tolist() == [1, 2]
+
+
+def _typed_frames() -> list:
+    calculo = apply_schema(DADOS_CALCULO_SHEET, pd.DataFrame({
+        "ID_Empresa": ["EMP1", 7], "Divisao": ["M-2", "I-1"], "Risco": ["Baixo", "Alto"],
+        "Pop_Turno1": [28, 10], "Pop_Turno2": [8, ""], "Pop_Turno3": [5, ""]
+    }))
+    brigadistas = apply_schema(BRIGADISTAS_SHEET, pd.DataFrame({
+        "ID_Empresa": ["EMP1"], "Nome": ["Ana"], "Email": [""], "Validade": ["31/12/2030"]
+    }))
+    return [calculo, brigadistas]
+
+
+def test_frozen_frames_cannot_be_changed_through_shallow_copies():
+    frame = _typed_frames()[0]
+    original = frame.copy()
+    freeze_frame(frame)
+    # Inteiros anuláveis e categorias guardam os valores em arrays internos (_data, _codes)
+    for column, value in (("Pop_Turno1", 99), ("Divisao", "I-1"), ("ID_Empresa", 7)):
+        copy = frame.copy(deep=False)
+        try:
+            copy.loc[0, column] = value
+        except ValueError:
+            pass  # pandas 2.x: arrays somente leitura recusam a escrita
+    pd.testing.assert_frame_equal(frame, original)
+
+
+def test_readers_share_the_cached_arrays():
+    cache, loader = SheetCache(ttl=60), CountingLoader()
+    frame = cache.get(SHEET_ID, "A", loader).frame
+    copy = frame.copy(deep=False)
+    assert np.shares_memory(copy["ID"].to_numpy(), frame["ID"].to_numpy())
+    with pytest.raises(ValueError):
+        frame["ID"].to_numpy()[0] = 99
+
+
+def test_memory_bytes_matches_deep_memory_usage():
+    for frame in _typed_frames():
+        expected = int(frame.memory_usage(deep=True).sum())
+        assert _memory_bytes(freeze_frame(frame)) == expected
+    cache, loader = SheetCache(ttl=60), CountingLoader()
+    cache.get_many(SHEET_ID, ("A", "B"), loader)
+    assert cache.stats()["memory_bytes"] > 0
@@ -0,0 +1,88 @@
+import re
+
+from utils.sheet_replica import SheetReplica
+
+
+class FakeSheet:
+    """`fetch_values` em memória: responde intervalos A1 ('Aba'!A1:ZZZ, 'Aba'!1:1, 'Aba'!A5:ZZZ)."""
+    def __init__(self, tabs: dict):
+        self.tabs = tabs
+        self.requests = []
+
+    def __call__(self, ranges: list) -> list:
+        self.requests.append(list(ranges))
+        results = []
+        for a1 in ranges:
+            match = re.fullmatch(r"'(.*)'!(?:(1:1)|A(\d+):ZZZ)", a1)
+            name, header_row, first_row = match.group(1), match.group(2), match.group(3)
+            values = self.tabs[name]
+            results.append(values[:1] if header_row else values[int(first_row) - 1:])
+        return results
+
+
+def _tabs() -> dict:
+    return {
+        "Empresas": [["ID_Empresa", "Razao_Social"], ["EMP1", "Empresa Um"], ["7", "Empresa Sete"]],
+        "Brigadistas_Treinados": [["ID_Empresa", "Nome"], ["EMP1", "Ana"]],
+    }
+
+
+def _replica(tmp_path, sheet: FakeSheet, **options) -> SheetReplica:
+    options.setdefault("full_sync_interval", 3600)
+    return SheetReplica(sheet, tuple(sheet.tabs), str(tmp_path / "replica.sqlite"), **options)
+
+
+def test_first_sync_copies_every_tab(tmp_path):
+    sheet = FakeSheet(_tabs())
+    replica = _replica(tmp_path, sheet)
+    assert not replica.is_ready()
+
+    assert replica.sync() == ["Empresas", "Brigadistas_Treinados"]
+    assert replica.is_ready()
+    assert replica.read_values("Empresas") == sheet.tabs["Empresas"]
+    assert replica.lookup("Empresas", "ID_Empresa", 7) == [["7", "Empresa Sete"]]
+    assert replica.read_values("Inexistente") == []
+
+
+def test_incremental_sync_pulls_only_new_rows(tmp_path):
+    sheet = FakeSheet(_tabs())
+    replica = _replica(tmp_path, sheet)
+    replica.sync()
+
+    sheet.tabs["Brigadistas_Treinados"].append(["7", "Bia"])
+    rows_before = replica.stats()["rows_pulled"]
+    assert replica.sync() == ["Brigadistas_Treinados"]
+
+    # Uma única chamada: cabeçalho e linhas após a última conhecida, de cada aba
+    assert sheet.requests[-1] == ["'Empresas'!1:1", "'Empresas'!A4:ZZZ",
+                                  "'Brigadistas_Treinados'!1:1", "'Brigadistas_Treinados'!A3:ZZZ"]
+    assert replica.stats()["rows_pulled"] == rows_before + 1
+    assert replica.read_values("Brigadistas_Treinados") == sheet.tabs["Brigadistas_Treinados"]
+
+    assert replica.sync() == []
+
+
+def test_full_sync_rewrites_only_edited_tabs(tmp_path):
+    sheet = FakeSheet(_tabs())
+    replica = _replica(tmp_path, sheet)
+    replica.sync()
+    sheet.tabs["Brigadistas_Treinados"].append(["7", "Bia"])
+    replica.sync()
+
+    # Edição manual: o número de linhas não muda, só o conteúdo
+    sheet.tabs["Empresas"][1] = ["EMP1", "Empresa Um Ltda"]
+    assert replica.sync() == []  # o incremental não percebe edições
+    assert replica.sync(full=True) == ["Empresas"]
+    assert replica.read_values("Empresas") == sheet.tabs["Empresas"]
+    assert replica.stats()["full_syncs"] == 2
+
+
+def test_changed_headers_reload_the_tab(tmp_path):
+    sheet = FakeSheet(_tabs())
+    replica = _replica(tmp_path, sheet)
+    replica.sync()
+
+    sheet.tabs["Empresas"] = [["ID_Empresa", "Razao_Social", "CNPJ"], ["EMP1", "Empresa Um", "123"]]
+    assert replica.sync() == ["Empresas"]
+    assert replica.read_values("Empresas") == sheet.tabs["Empresas"]
+    assert sheet.requests[-1] == ["'Empresas'!A1:ZZZ"]
@@ -0,0 +1,69 @@
+import pandas as pd
+
+from utils.sheet_schema import (
+    BRIGADISTAS_SHEET, DADOS_CALCULO_SHEET, EMPRESAS_SHEET, RESULTADOS_SHEET, DATA_SHEET_COLUMNS,
+    apply_schema, frame_to_records, record_to_row,
+)
+
+# Registros como a leitura da planilha os devolve (números convertidos, células vazias como "")
+SHEET_RECORDS = {
+    EMPRESAS_SHEET: [
+        {"ID_Empresa": "EMP00001", "Razao_Social": "Empresa 1 Ltda", "CNPJ": 12345678000199, "Imovel": "Sede"},
+        {"ID_Empresa": 7, "Razao_Social": "Empresa 7", "CNPJ": "", "Imovel": ""},
+    ],
+    DADOS_CALCULO_SHEET: [
+        {"ID_Empresa": "EMP00001", "Divisao": "M-2", "Risco": "Baixo", "Pop_Turno1": 28, "Pop_Turno2": 8, "Pop_Turno3": 5},
+        {"ID_Empresa": 7, "Divisao": "I-1", "Risco": "Alto", "Pop_Turno1": 10, "Pop_Turno2": "", "Pop_Turno3": ""},
+    ],
+    BRIGADISTAS_SHEET: [
+        {"ID_Empresa": "EMP00001", "Nome": "Ana", "Email": "ana@exemplo.com", "Validade": "31/12/2030"},
+        {"ID_Empresa": "EMP00001", "Nome": "Bia", "Email": "", "Validade": ""},
+        {"ID_Empresa": 7, "Nome": "Caio", "Email": "ana@exemplo.com", "Validade": "01/02/2029"},
+    ],
+    RESULTADOS_SHEET: [
+        {"ID_Empresa": "EMP00001", "Data_Hora": "2025-03-04 05:06:07", "Usuario": "u", "Divisao": "M-2",
+         "Risco": "Baixo", "Populacao_Turnos": "[28, 8, 5]", "Total_Calculado": 6, "Detalhe_Turnos": "{}"},
+    ],
+}
+
+
+def test_frame_to_records_round_trips_the_typed_frame():
+    for sheet_name, records in SHEET_RECORDS.items():
+        frame = pd.DataFrame(records, columns=DATA_SHEET_COLUMNS[sheet_name])
+        typed = apply_schema(sheet_name, frame)
+        assert frame_to_records(typed) == records, sheet_name
+
+
+def test_schema_types_are_applied_and_blanks_become_missing():
+    frame = pd.DataFrame(SHEET_RECORDS[DADOS_CALCULO_SHEET])
+    typed = apply_schema(DADOS_CALCULO_SHEET, frame)
+    assert str(typed["Pop_Turno2"].dtype) == "Int32"
+    assert typed["Pop_Turno2"].isna().tolist() == [False, True]
+    assert isinstance(typed["Divisao"].dtype, pd.CategoricalDtype)
+
+    brigadistas = apply_schema(BRIGADISTAS_SHEET, pd.DataFrame(SHEET_RECORDS[BRIGADISTAS_SHEET]))
+    assert str(brigadistas["Validade"].dtype).startswith("datetime64")
+
+
+def test_records_are_native_python_values():
+    typed = apply_schema(DADOS_CALCULO_SHEET, pd.DataFrame(SHEET_RECORDS[DADOS_CALCULO_SHEET]))
+    record = frame_to_records(typed)[0]
+    assert type(record["Pop_Turno1"]) is int
+    assert type(record["Divisao"]) is str
+    # Como na página de cálculo, populações vazias contam como 0.
+    blanks = frame_to_records(typed)[1]
+    assert [int(blanks[key] or 0) for key in ("Pop_Turno1", "Pop_Turno2", "Pop_Turno3")] == [10, 0, 0]
+
+
+def test_columns_that_do_not_fit_the_type_are_kept_as_read():
+    frame = pd.DataFrame([{"ID_Empresa": 1, "Divisao": "M-2", "Risco": "Baixo",
+                           "Pop_Turno1": "muitos", "Pop_Turno2": 2.5, "Pop_Turno3": 3}])
+    typed = apply_schema(DADOS_CALCULO_SHEET, frame)
+    assert str(typed["Pop_Turno1"].dtype) != "Int32"
+    assert frame_to_records(typed)[0]["Pop_Turno1"] == "muitos"
+    assert frame_to_records(typed)[0]["Pop_Turno2"] == 2.5
+
+
+def test_record_to_row_follows_the_sheet_columns():
+    row = record_to_row(BRIGADISTAS_SHEET, {"Nome": "Ana", "ID_Empresa": "EMP1", "Validade": "31/12/2030"})
+    assert row == ["EMP1", "Ana", None, "31/12/2030"]
@@ -0,0 +1,159 @@
+import threading
+
+import pytest
+
+from utils.sheets_quota import (
+    QUOTA_READ, QUOTA_WRITE, SheetsQuota, TokenBucket, is_ambiguous_write_error, is_retryable_error
+)
+
+
+class Response:
+    def __init__(self, status_code: int, headers: dict | None = None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class APIError(Exception):
+    """Erro com `response.status_code`, como o gspread.exceptions.APIError."""
+    def __init__(self, status_code: int, headers: dict | None = None):
+        super().__init__(status_code)
+        self.response = Response(status_code, headers)
+
+
+class Flaky:
+    """Operação que falha com os erros de `errors`, em ordem, e depois retorna "ok"."""
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+def _quota(**options) -> SheetsQuota:
+    return SheetsQuota(backoff_base=0.001, backoff_max=0.01, **options)
+
+
+def test_reads_retry_transient_errors():
+    quota = _quota()
+    operation = Flaky(APIError(429), APIError(503), ConnectionError(), TimeoutError())
+    assert quota.call(QUOTA_READ, operation) == "ok"
+    assert operation.calls == 5
+    assert quota.stats()[QUOTA_READ]["retries"] == 4
+
+
+def test_writes_retry_only_quota_errors():
+    quota = _quota()
+    operation = Flaky(APIError(429))
+    assert quota.call(QUOTA_WRITE, operation) == "ok"
+    assert operation.calls == 2
+
+    for error in (APIError(503), ConnectionError(), TimeoutError()):
+        operation = Flaky(error)
+        with pytest.raises(type(error)):
+            quota.call(QUOTA_WRITE, operation)
+        assert operation.calls == 1  # a escrita pode ter sido aplicada: não é repetida
+    assert quota.stats()[QUOTA_WRITE]["errors"] == 3
+
+
+def test_failed_writes_that_may_have_been_applied_are_ambiguous():
+    for error in (APIError(500), APIError(503), ConnectionError(), TimeoutError()):
+        assert is_ambiguous_write_error(error)
+    # 429: a API não aplicou a escrita; 4xx: pedido recusado
+    for error in (APIError(429), APIError(400), APIError(403), ValueError("valor inválido")):
+        assert not is_ambiguous_write_error(error)
+
+
+def test_retries_stop_at_max_retries_and_skip_permanent_errors():
+    quota = _quota(max_retries=2)
+    operation = Flaky(*[APIError(500)] * 5)
+    with pytest.raises(APIError):
+        quota.call(QUOTA_READ, operation)
+    assert operation.calls == 3
+
+    operation = Flaky(APIError(400))
+    with pytest.raises(APIError):
+        quota.call(QUOTA_READ, operation)
+    assert operation.calls == 1
+    assert not is_retryable_error(APIError(404), QUOTA_READ)
+
+
+def test_retry_after_header_is_respected():
+    quota = SheetsQuota(backoff_base=10.0, backoff_max=0.05)
+    operation = Flaky(APIError(429, {"Retry-After": "0.02"}))
+    assert quota.call(QUOTA_READ, operation) == "ok"
+    assert quota.stats()[QUOTA_READ]["backoff_seconds"] == pytest.approx(0.02)
+
+
+def test_concurrent_calls_with_same_key_are_coalesced():
+    quota = _quota()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow_read():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {"values": [1, 2, 3]}
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(quota.call(QUOTA_READ, slow_read, key="aba")))
+    leader.start()
+    assert started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(quota.call(QUOTA_READ, slow_read, key="aba")))
+                 for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    while quota.stats()["coalesced"] < 3:
+        threading.Event().wait(0.001)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert len(results) == 4 and all(result is results[0] for result in results)
+    assert quota.stats()["in_flight"] == 0
+    # Depois de concluída, a mesma chave volta a ir à API.
+    assert quota.call(QUOTA_READ, slow_read, key="aba") == {"values": [1, 2, 3]}
+    assert len(calls) == 2
+
+
+def test_coalesced_callers_receive_the_leader_error():
+    quota = _quota(max_retries=0)
+    started, release = threading.Event(), threading.Event()
+
+    def failing_read():
+        started.set()
+        release.wait(5)
+        raise APIError(400)
+
+    errors = []
+
+    def call():
+        try:
+            quota.call(QUOTA_READ, failing_read, key="aba")
+        except APIError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call)]
+    threads[0].start()
+    assert started.wait(5)
+    threads.append(threading.Thread(target=call))
+    threads[1].start()
+    while quota.stats()["coalesced"] < 1:
+        threading.Event().wait(0.001)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert len(errors) == 2 and errors[0] is errors[1]
+
+
+def test_token_bucket_spaces_requests_after_burst():
+    bucket = TokenBucket(requests_per_minute=60, capacity=2)
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(1.0, abs=0.05)
+    assert TokenBucket(None).reserve() == 0.0
@@ -0,0 +1,176 @@
+import json
+
+import pandas as pd
+import pytest
+
+from utils.sheet_schema import DATA_SHEET_COLUMNS, DATA_SHEETS, BRIGADISTAS_SHEET, EMPRESAS_SHEET, apply_schema
+from utils.storage_backend import MANIFEST_FILE, StorageBackend, lookup_key
+
+pytest.importorskip("pyarrow")
+from utils.storage_backend import ParquetBackend  # noqa: E402
+
+
+def _numericise(value: str):
+    """Conversão das células lidas da planilha, como o numericise do gspread."""
+    for convert in (int, float):
+        try:
+            return convert(value)
+        except ValueError:
+            pass
+    return value
+
+
+def _workbook() -> dict:
+    tabs = {name: [list(columns)] for name, columns in DATA_SHEET_COLUMNS.items()}
+    tabs[EMPRESAS_SHEET] += [["EMP1", "Empresa Um", "1", "Sede"], ["7", "Empresa Sete", "2", "Filial"]]
+    tabs[BRIGADISTAS_SHEET] += [["EMP1", "Ana", "a@x.com", "31/12/2030"], ["7", "Bia", "", "01/01/2029"],
+                                ["EMP1", "Caio", "c@x.com", "31/12/2030"], ["007", "Duda", "", ""]]
+    return tabs
+
+
+class FakeSource:
+    """Planilha de origem: `fetch_values` devolve as abas e `writer` acrescenta linhas a elas."""
+    def __init__(self, tabs: dict):
+        self.tabs = tabs
+        self.fetches = []
+        self.fail_writes = False
+
+    def fetch_values(self, sheet_names: tuple) -> dict:
+        self.fetches.append(tuple(sheet_names))
+        return {name: [list(row) for row in self.tabs[name]] for name in sheet_names}
+
+    def writer(self, sheet_name: str, rows: list, deferred: bool) -> str | None:
+        if self.fail_writes:
+            raise ConnectionError("planilha indisponível")
+        self.tabs[sheet_name].extend([str(cell) for cell in row] for row in rows)
+        return "w-1" if deferred else None
+
+
+def _backend(tmp_path, source: FakeSource, **options) -> ParquetBackend:
+    return ParquetBackend(tmp_path, fetch_values=source.fetch_values, writer=source.writer, parse_cell=_numericise,
+                          transform=apply_schema, sheet_names=DATA_SHEETS, **options)
+
+
+def test_storage_backend_is_abstract():
+    with pytest.raises(TypeError):
+        StorageBackend()
+
+
+def test_lookup_key_normalises_numbers():
+    assert lookup_key(7) == lookup_key(7.0) == lookup_key(_numericise("007")) == "7"
+    assert lookup_key("EMP1") == "EMP1"
+    assert lookup_key(7.5) == "7.5"
+
+
+def test_lookup_matches_numeric_ids_in_any_form(tmp_path):
+    backend = _backend(tmp_path, FakeSource(_workbook()))
+    for value in ("7", "007", 7, 7.0):
+        assert backend.lookup(BRIGADISTAS_SHEET, "ID_Empresa", value)["Nome"].tolist() == ["Bia", "Duda"], value
+    assert backend.lookup(BRIGADISTAS_SHEET, "ID_Empresa", "EMP1")["Nome"].tolist() == ["Ana", "Caio"]
+    # Coluna sem chave normalizada: mesma comparação, feita após a leitura.
+    assert backend.lookup(BRIGADISTAS_SHEET, "Nome", "Caio")["ID_Empresa"].tolist() == ["EMP1"]
+    assert backend.lookup(BRIGADISTAS_SHEET, "ID_Empresa", "nenhuma").empty
+
+
+def test_append_writes_to_the_source_first(tmp_path):
+    source = FakeSource(_workbook())
+    backend = _backend(tmp_path, source)
+    assert backend.append(BRIGADISTAS_SHEET, [["EMP1", "Eva", "", "31/12/2030"]], deferred=True) == "w-1"
+    assert source.tabs[BRIGADISTAS_SHEET][-1] == ["EMP1", "Eva", "", "31/12/2030"]
+    assert backend.lookup(BRIGADISTAS_SHEET, "ID_Empresa", "EMP1")["Nome"].tolist() == ["Ana", "Caio", "Eva"]
+
+    source.fail_writes = True
+    with pytest.raises(ConnectionError):
+        backend.append(BRIGADISTAS_SHEET, [["EMP1", "Fabi", "", ""]])
+    assert "Fabi" not in backend.read(BRIGADISTAS_SHEET)["Nome"].tolist()
+
+
+def test_refresh_picks_up_sheet_edits_and_skips_unchanged_tabs(tmp_path):
+    source = FakeSource(_workbook())
+    backend = _backend(tmp_path, source, refresh_interval=None)
+    assert len(backend.read(EMPRESAS_SHEET)) == 2
+    assert source.fetches == [DATA_SHEETS]  # todas as abas em uma única leitura
+
+    # Sem invalidação (e sem prazo), a réplica não volta à planilha.
+    source.tabs[EMPRESAS_SHEET].append(["8", "Empresa Oito", "3", ""])
+    assert len(backend.read(EMPRESAS_SHEET)) == 2
+
+    backend.invalidate()
+    assert backend.refresh() == [EMPRESAS_SHEET]
+    assert backend.read(EMPRESAS_SHEET)["Razao_Social"].tolist()[-1] == "Empresa Oito"
+
+
+def test_local_data_is_served_when_the_source_is_unavailable(tmp_path):
+    source = FakeSource(_workbook())
+    backend = _backend(tmp_path, source, refresh_interval=0.0)
+    assert len(backend.read(EMPRESAS_SHEET)) == 2
+
+    def unavailable(sheet_names):
+        raise ConnectionError("sem rede")
+
+    backend.fetch_values = unavailable
+    assert len(backend.read(EMPRESAS_SHEET)) == 2
+    assert backend.stats()["last_error"] == "sem rede"
+
+
+def test_compaction_keeps_rows_and_orphan_parts_are_ignored(tmp_path):
+    source = FakeSource(_workbook())
+    backend = _backend(tmp_path, source, compact_after=3)
+    for i in range(5):
+        backend.append(BRIGADISTAS_SHEET, [["EMP1", f"Nova {i}", "", ""]])
+    sheet_dir = tmp_path / BRIGADISTAS_SHEET
+    manifest = json.loads((sheet_dir / MANIFEST_FILE).read_text(encoding="utf-8"))
+    assert backend.stats()["compactions"] == 1
+    assert sorted(path.name for path in sheet_dir.glob("part-*")) == sorted(manifest["parts"])
+    expected = backend.read(BRIGADISTAS_SHEET)
+    assert len(expected) == 9
+
+    # Uma compactação interrompida antes da troca do manifesto deixa um arquivo órfão,
+    # com as mesmas linhas: ele é ignorado (e removido) na próxima abertura.
+    orphan = sheet_dir / "part-99999999.parquet"
+    orphan.write_bytes((sheet_dir / manifest["parts"][0]).read_bytes())
+    reopened = _backend(tmp_path, source, refresh_interval=None)
+    pd.testing.assert_frame_equal(reopened.read(BRIGADISTAS_SHEET), expected)
+    assert not orphan.exists()
+
+
+def test_read_does_not_expose_the_cached_frame(tmp_path):
+    backend = _backend(tmp_path, FakeSource(_workbook()))
+    frame = backend.read(EMPRESAS_SHEET)
+    assert frame is not backend.read(EMPRESAS_SHEET)
+
+    # Cópia rasa de arrays somente leitura: a alteração no lugar é recusada (pandas 2.x)
+    # ou copia os dados antes de escrever (copy-on-write); o cache não muda em nenhum caso.
+    try:
+        frame.loc[0, "Razao_Social"] = "Alterada"
+    except ValueError:
+        pass
+    assert backend.read(EMPRESAS_SHEET)["Razao_Social"].tolist()[0] == "Empresa Um"
+
+    # Colunas novas ou removidas na cópia também não afetam o cache.
+    frame["Extra"] = 1
+    assert "Extra" not in backend.read(EMPRESAS_SHEET).columns
+
+
+def test_lookup_matches_the_sheets_backend(tmp_path, monkeypatch):
+    pytest.importorskip("streamlit")
+    pytest.importorskip("gspread")
+    monkeypatch.setenv("BRIGADA_WRITE_BEHIND_ENABLED", "false")
+    monkeypatch.setenv("BRIGADA_READ_REPLICA_ENABLED", "false")
+    from utils.fake_gsheets import FakeGspreadClient
+    from utils.google_sheets_handler import SheetsBackend, parse_written_cell
+
+    tabs = _workbook()
+    client = FakeGspreadClient({"lookup-parity": tabs})
+    sheets = SheetsBackend(client, "lookup-parity")
+    parquet = ParquetBackend(
+        tmp_path, fetch_values=lambda names: {name: tabs[name] for name in names},
+        parse_cell=parse_written_cell, transform=apply_schema, sheet_names=DATA_SHEETS
+    )
+    cases = [(BRIGADISTAS_SHEET, "ID_Empresa", value) for value in ("7", "007", 7, 7.0, "EMP1", "nenhuma")]
+    cases += [(EMPRESAS_SHEET, "Razao_Social", "Empresa Sete"), (BRIGADISTAS_SHEET, "Nome", "Ana")]
+    for sheet_name, column, value in cases:
+        expected = sheets.lookup(sheet_name, column, value).reset_index(drop=True)
+        found = parquet.lookup(sheet_name, column, value)
+        pd.testing.assert_frame_equal(found, expected, check_dtype=False, check_categorical=False,
+                                      check_index_type=False, obj=f"{sheet_name}.{column} == {value!r}")
@@ -0,0 +1,117 @@
+import json
+import threading
+
+import pytest
+
+from utils.write_queue import WriteBehindQueue, STATUS_FAILED, STATUS_PENDING, STATUS_WRITTEN
+
+
+class Response:
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+
+
+class APIError(Exception):
+    """Erro com `response.status_code`, como o gspread.exceptions.APIError."""
+    def __init__(self, status_code: int):
+        super().__init__(status_code)
+        self.response = Response(status_code)
+
+
+class RecordingWriter:
+    """write_fn que registra os lotes e falha nas abas de `failing` com `error()` (cota excedida)."""
+    def __init__(self, failing=(), error=lambda: APIError(429)):
+        self.failing = set(failing)
+        self.error = error
+        self.batches = []
+        self._lock = threading.Lock()
+
+    def __call__(self, sheet_id: str, sheet_name: str, rows: list) -> None:
+        with self._lock:
+            self.batches.append((sheet_id, sheet_name, rows))
+        if sheet_name in self.failing:
+            raise self.error()
+
+
+def _queue(tmp_path, writer, **options):
+    options.setdefault("flush_interval", 0.01)
+    options.setdefault("retry_base_delay", 0.01)
+    options.setdefault("retry_max_delay", 0.02)
+    return WriteBehindQueue(writer, journal_path=str(tmp_path / "journal.jsonl"),
+                            dead_letter_path=str(tmp_path / "dead.jsonl"), **options)
+
+
+def _journal(tmp_path) -> list:
+    path = tmp_path / "journal.jsonl"
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()] if path.exists() else []
+
+
+def test_unacknowledged_entries_are_replayed_on_startup(tmp_path):
+    # O primeiro processo aceita as linhas mas "cai" antes de enviá-las.
+    stuck = _queue(tmp_path, RecordingWriter(failing={"Aba"}), flush_interval=3600)
+    first = stuck.enqueue("planilha", "Aba", [["1", "a"]])
+    second = stuck.enqueue("planilha", "Aba", [["2", "b"]])
+    assert stuck.status(first)["status"] == STATUS_PENDING
+    assert [record["op"] for record in _journal(tmp_path)] == ["enqueue", "enqueue"]
+
+    writer = RecordingWriter()
+    replayed = _queue(tmp_path, writer)
+    assert replayed.flush(timeout=5)
+    assert writer.batches == [("planilha", "Aba", [["1", "a"], ["2", "b"]])]
+    assert replayed.status(first)["status"] == replayed.status(second)["status"] == STATUS_WRITTEN
+    # Sem pendências, o diário é compactado, e os novos tickets continuam a numeração.
+    assert _journal(tmp_path) == []
+    assert replayed.enqueue("planilha", "Aba", [["3"]]) == "w-3"
+
+
+def test_acknowledged_entries_are_not_replayed(tmp_path):
+    writer = RecordingWriter()
+    queue = _queue(tmp_path, writer)
+    queue.enqueue("planilha", "Aba", [["1"]])
+    assert queue.flush(timeout=5)
+
+    again = RecordingWriter()
+    assert _queue(tmp_path, again).flush(timeout=5)
+    assert again.batches == []
+
+
+def test_quota_errors_back_off_per_tab_until_dead_lettered(tmp_path):
+    writer = RecordingWriter(failing={"Ruim"})
+    queue = _queue(tmp_path, writer, max_attempts=3)
+    bad = queue.enqueue("planilha", "Ruim", [["x"]])
+    good = queue.enqueue("planilha", "Boa", [["y"]])
+
+    assert queue.flush(timeout=5)  # termina mesmo com a aba que não grava
+    assert queue.status(good)["status"] == STATUS_WRITTEN
+    status = queue.status(bad)
+    assert status["status"] == STATUS_FAILED and status["attempts"] == 3
+    assert sum(1 for _, name, _ in writer.batches if name == "Ruim") == 3
+
+    dead = queue.dead_letters()
+    assert [(record["sheet_name"], record["ids"], record["rows"]) for record in dead] == [("Ruim", [bad], [["x"]])]
+    assert dead[0]["ambiguous"] is False
+    assert queue.stats()["dead_letter_batches"] == 1
+
+    # O lote desistido não volta para a fila ao reiniciar.
+    restarted = _queue(tmp_path, RecordingWriter())
+    assert restarted.pending_rows("planilha", "Ruim") == []
+    assert restarted.stats()["dead_letter_batches"] == 1
+
+
+@pytest.mark.parametrize("error, ambiguous", [
+    (lambda: APIError(500), True),
+    (ConnectionError, True),
+    (lambda: APIError(400), False),
+    (lambda: RuntimeError("falha"), False),
+])
+def test_other_write_errors_are_dead_lettered_without_resending(tmp_path, error, ambiguous):
+    writer = RecordingWriter(failing={"Aba"}, error=error)
+    queue = _queue(tmp_path, writer, max_attempts=5)
+    ticket = queue.enqueue("planilha", "Aba", [["x"]])
+
+    assert queue.flush(timeout=5)
+    # Após um 5xx ou erro de rede as linhas podem já estar na planilha: reenviar as duplicaria.
+    assert len(writer.batches) == 1
+    status = queue.status(ticket)
+    assert (status["status"], status["attempts"], status["ambiguous"]) == (STATUS_FAILED, 1, ambiguous)
+    assert [record["ambiguous"] for record in queue.dead_letters()] == [ambiguous]
@@ -1,78 +1,38 @@
-import math
+import numpy as np
 
-# Dados da Tabela A.1 da ABNT NBR 14276 (parcial, focando nos grupos mais comuns)
-# A estrutura é: Divisão -> Risco -> População -> Brigadistas
-# "Todos" significa que 100% da população do turno deve ser brigadista.
-NBR_TABLE = {
-    'D-2': { # Agência Bancária
-        'Baixo':  {10: 2}, 'Médio': {10: 4}, 'Alto': {10: 'Todos'}
-    },
-    'M-2': { # Tanques ou parque de tanques
-        'Baixo':  {10: 'Todos'}, 'Médio': {10: 'Todos'}, 'Alto': {10: 'Todos'}
-    },
-    'I-1': { # Indústria com baixo risco
-        'Baixo': {10: 2}, 'Médio': {10: 4}, 'Alto': {10: 'Todos'}
-    },
-    'I-2': { # Indústria com médio risco
-        'Baixo': {10: 2}, 'Médio': {10: 4}, 'Alto': {10: 'Todos'}
-    },
-    'I-3': { # Indústria com alto risco
-        'Baixo': {10: 2}, 'Médio': {10: 4}, 'Alto': {10: 'Todos'}
-    },
-    'C-1': { # Comércio com baixo risco
-        'Baixo': {10: 2}, 'Médio': {10: 4}, 'Alto': {10: 'Todos'}
-    },
-    'C-2': { # Comércio com médio risco
-        'Baixo': {10: 2}, 'Médio': {10: 4}, 'Alto': {10: 'Todos'}
-    },
-    'J-4': { # Depósitos de alto risco
-        'Baixo': {10: 2}, 'Médio': {10: 'Todos'}, 'Alto': {10: 'Todos'}
-    }
-    # Adicione outras divisões da norma aqui conforme necessário
-}
+from utils.nbr_rules import load_rule_engine
+
+# As regras da Tabela A.1 da ABNT NBR 14276 ficam em utils/data/nbr14276_tabela_a1.json
+# e são compiladas uma única vez por processo (ver utils/nbr_rules.py).
 
-# Constantes da Nota 5 da norma (pessoas por brigadista adicional)
-ACRESCIMO_POR_RISCO = {
-    "Baixo": 20,
-    "Médio": 15,
-    "Alto": 10
-}
 
 def get_table_divisions() -> list:
     """Retorna a lista de divisões disponíveis na tabela para o selectbox da UI."""
-    return sorted(list(NBR_TABLE.keys()))
+    return list(load_rule_engine().divisions)
+
+def get_risk_levels() -> list:
+    """Retorna os níveis de risco previstos na tabela, na ordem Baixo, Médio, Alto."""
+    return list(load_rule_engine().risks)
 
 def calculate_brigade_for_shift(division: str, risk: str, population: int) -> int:
     """
     Calcula o número de brigadistas para um único turno, baseado na NBR 14276.
+    A faixa de população é localizada por bisseção na regra compilada da Divisão/Risco.
     """
-    if population <= 0:
-        return 0
-        
-    if division not in NBR_TABLE or risk not in NBR_TABLE[division]:
-        raise ValueError(f"Combinação de Divisão '{division}' e Risco '{risk}' não encontrada na norma implementada.")
-
-    # Pega o valor base para população até 10 pessoas
-    base_calc = NBR_TABLE[division][risk].get(10)
-
-    # Se a regra for "Todos", o número de brigadistas é igual à população do turno.
-    if base_calc == 'Todos':
-        return population
-
-    base_brigadistas = int(base_calc)
+    return load_rule_engine().evaluate(division, risk, population)
 
-    # Se a população for 10 ou menos, retorna o valor base (limitado ao número de pessoas).
-    if population <= 10:
-        return min(population, base_brigadistas)
-
-    # Se a população for maior que 10, calcula o acréscimo (Nota 5 da norma)
-    pop_excedente = population - 10
-    divisor = ACRESCIMO_POR_RISCO[risk]
-    
-    # math.ceil arredonda para cima, garantindo que qualquer fração de grupo conte como 1 brigadista a mais.
-    brigadistas_adicionais = math.ceil(pop_excedente / divisor)
-    
-    return base_brigadistas + brigadistas_adicionais
+def calculate_shift_breakdown(division: str, risk: str, population: int) -> dict:
+    """
+    Detalha o cálculo de um turno em parcela base (faixa da Tabela A.1) e acréscimo (Nota 5),
+    no mesmo formato das chaves de 'calculo_por_turno' usadas pela página e pelo relatório PDF.
+    """
+    rule = load_rule_engine().get_rule(division, risk)
+    base, acrescimo = rule.breakdown(population)
+    return {
+        "calculo_base": base,
+        "calculo_acrescimo": acrescimo,
+        "total_turno": base + acrescimo
+    }
 
 def calculate_total_brigade(turn_populations: list, division: str, risk: str) -> dict:
     """
@@ -95,3 +55,35 @@ def calculate_total_brigade(turn_populations: list, division: str, risk: str) ->
         "brigadistas_por_turno": brigade_per_shift,
         "maior_turno_necessidade": max(brigade_per_shift) if brigade_per_shift else 0
     }
+
+
+def calculate_brigade_batch(divisions, risks, turn_populations) -> dict:
+    """
+    Versão vetorizada de `calculate_total_brigade` para muitas instalações de uma vez.
+
+    Args:
+        divisions (array-like): Divisão de cada instalação (ex: ['M-2', 'I-1']).
+        risks (array-like): Nível de risco de cada instalação.
+        turn_populations (array-like): Matriz (instalações x turnos) com a população
+            de cada turno. Ex: df[['Pop_Turno1', 'Pop_Turno2', 'Pop_Turno3']].
+
+    Returns:
+        dict: Arrays NumPy com os mesmos resultados da versão escalar
+        ('brigadistas_por_turno', 'total_brigadistas' e 'maior_turno_necessidade').
+    """
+    divisions = np.asarray(divisions, dtype=object).ravel()
+    risks = np.asarray(risks, dtype=object).ravel()
+    populations = np.asarray(turn_populations, dtype=np.int64)
+    if populations.ndim == 1:
+        populations = populations.reshape(-1, 1)
+
+    if not (len(divisions) == len(risks) == populations.shape[0]):
+        raise ValueError("Os arrays de divisões, riscos e populações devem ter o mesmo número de instalações.")
+
+    por_turno = load_rule_engine().evaluate_batch(divisions, risks, populations)
+
+    return {
+        "total_brigadistas": por_turno.sum(axis=1),
+        "brigadistas_por_turno": por_turno,
+        "maior_turno_necessidade": por_turno.max(axis=1) if por_turno.shape[1] else np.zeros(len(divisions), dtype=np.int64)
+    }
@@ -0,0 +1,52 @@
+import pandas as pd
+
+from utils.sheet_schema import EMPRESAS_SHEET, DADOS_CALCULO_SHEET, BRIGADISTAS_SHEET, frame_to_records
+from utils.storage_backend import StorageBackend
+
+
+class CompanyRepository:
+    """
+    Consultas por empresa sobre as abas Empresas, Dados_Calculo e Brigadistas_Treinados.
+
+    As buscas por Razão Social e por ID_Empresa usam o índice de busca do backend de
+    armazenamento (`StorageBackend.lookup`): no Google Sheets, posições das linhas agrupadas
+    por chave uma vez por versão da aba; no Parquet, o filtro sobre a coluna de chave
+    normalizada. Assim os brigadistas de uma empresa vêm já agrupados, sem percorrer a aba.
+    Em caso de nomes ou IDs repetidos, vale a primeira linha da planilha, como na busca antiga.
+    Os registros retornados são dicionários novos, de modo que a instância pode ser compartilhada.
+    """
+    def __init__(self, storage: StorageBackend):
+        self.storage = storage
+
+    def _first_match(self, sheet_name: str, column: str, value) -> dict | None:
+        """Primeira linha da aba em que `column` == `value`, no formato lido da planilha, ou None."""
+        if value is None:
+            return None
+        matches = self.storage.lookup(sheet_name, column, value)
+        return frame_to_records(matches.head(1))[0] if not matches.empty else None
+
+    def company_names(self) -> list:
+        """Razão Social de todas as empresas, na ordem da planilha."""
+        names = self.storage.read(EMPRESAS_SHEET, columns=["Razao_Social"])
+        return names["Razao_Social"].tolist() if "Razao_Social" in names.columns else []
+
+    def get_company(self, company_name: str) -> dict | None:
+        return self._first_match(EMPRESAS_SHEET, "Razao_Social", company_name)
+
+    def get_company_by_id(self, id_empresa) -> dict | None:
+        return self._first_match(EMPRESAS_SHEET, "ID_Empresa", id_empresa)
+
+    def get_company_id(self, company_name: str):
+        """Retorna o ID_Empresa da empresa com a Razão Social informada (None se não existir)."""
+        company = self.get_company(company_name)
+        return company.get("ID_Empresa") if company is not None else None
+
+    def get_calculation_data(self, company_name: str) -> dict | None:
+        return self._first_match(DADOS_CALCULO_SHEET, "ID_Empresa", self.get_company_id(company_name))
+
+    def get_brigadistas(self, company_name: str) -> pd.DataFrame:
+        """Linhas de Brigadistas_Treinados da empresa (DataFrame vazio se não houver)."""
+        id_empresa = self.get_company_id(company_name)
+        if id_empresa is None:
+            return pd.DataFrame()
+        return self.storage.lookup(BRIGADISTAS_SHEET, "ID_Empresa", id_empresa)
@@ -0,0 +1,199 @@
+import json
+import random
+import re
+import threading
+
+import gspread
+
+from utils.nbr_rules import load_rule_engine
+from utils.sheet_schema import DATA_SHEET_COLUMNS
+from utils.simulation import LatencyModel
+
+# IDs usados pelas planilhas em memória quando nenhum é configurado
+FAKE_DATA_SPREADSHEET_ID = "fake-dados"
+FAKE_RAG_SPREADSHEET_ID = "fake-rag"
+
+RAG_HEADERS = ["question", "answer_chunk", "norma_referencia", "section_number"]
+
+
+def _numericise(value):
+    """Converte textos numéricos em int/float, como o get_all_records do gspread."""
+    if not isinstance(value, str) or value == "":
+        return value
+    try:
+        return int(value)
+    except ValueError:
+        try:
+            return float(value)
+        except ValueError:
+            return value
+
+
+def _row_bounds(a1: str) -> tuple:
+    """Primeira e última linha (1-based, None = até o fim) de um intervalo A1 simples."""
+    if not a1:
+        return 1, None
+    start, _, end = a1.partition(":")
+    first = int(re.sub(r"[A-Z]", "", start) or 1)
+    end_digits = re.sub(r"[A-Z]", "", end)
+    return first, int(end_digits) if end_digits else None
+
+
+class FakeWorksheet:
+    """Aba em memória com o subconjunto da interface do gspread.Worksheet usado pelo app."""
+    def __init__(self, title: str, rows: list, latency_model: LatencyModel):
+        self.title = title
+        self._rows = [list(row) for row in rows]
+        self._latency = latency_model
+        self._lock = threading.Lock()
+
+    def get_all_values(self) -> list:
+        self._latency.simulate("read")
+        with self._lock:
+            return [[str(cell) for cell in row] for row in self._rows]
+
+    def get_all_records(self) -> list:
+        self._latency.simulate("read")
+        with self._lock:
+            if not self._rows:
+                return []
+            headers = self._rows[0]
+            return [
+                {header: _numericise(row[i]) if i < len(row) else "" for i, header in enumerate(headers)}
+                for row in self._rows[1:]
+            ]
+
+    def row_values(self, row: int) -> list:
+        self._latency.simulate("read")
+        with self._lock:
+            return [str(cell) for cell in self._rows[row - 1]] if row <= len(self._rows) else []
+
+    def append_row(self, values: list, value_input_option: str = "RAW", **kwargs) -> None:
+        self.append_rows([values], value_input_option=value_input_option)
+
+    def append_rows(self, values: list, value_input_option: str = "RAW", **kwargs) -> None:
+        self._latency.simulate("write")
+        with self._lock:
+            self._rows.extend(["" if cell is None else str(cell) for cell in row] for row in values)
+
+
+class FakeSpreadsheet:
+    """Planilha em memória: um conjunto de abas identificado por um ID."""
+    def __init__(self, spreadsheet_id: str, tabs: dict, latency_model: LatencyModel):
+        self.id = spreadsheet_id
+        self._latency = latency_model
+        self._worksheets = {title: FakeWorksheet(title, rows, latency_model) for title, rows in tabs.items()}
+
+    def worksheet(self, title: str) -> FakeWorksheet:
+        self._latency.simulate("metadata")
+        if title not in self._worksheets:
+            raise gspread.exceptions.WorksheetNotFound(title)
+        return self._worksheets[title]
+
+    def values_batch_get(self, ranges: list, params: dict | None = None) -> dict:
+        """
+        Lê vários intervalos em uma única chamada. Aceita a aba inteira ('Aba'), faixas de
+        linhas ('Aba'!2:5) e intervalos abertos ('Aba'!A10:ZZZ). Como na API, células vazias
+        no fim de cada linha e linhas vazias no fim do intervalo são omitidas.
+        """
+        self._latency.simulate("read")
+        value_ranges = []
+        for range_name in ranges:
+            title, _, a1 = range_name.rpartition("!") if "!" in range_name else (range_name, "", "")
+            title = title[1:-1].replace("''", "'") if title.startswith("'") else title
+            if title not in self._worksheets:
+                raise gspread.exceptions.WorksheetNotFound(title)
+            worksheet = self._worksheets[title]
+            with worksheet._lock:
+                values = [[str(cell) for cell in row] for row in worksheet._rows]
+            first, last = _row_bounds(a1)
+            values = values[first - 1:last]
+            values = [row[:max([i + 1 for i, cell in enumerate(row) if cell != ""], default=0)] for row in values]
+            while values and not values[-1]:
+                values.pop()
+            value_ranges.append({"range": range_name, "values": values} if values else {"range": range_name})
+        return {"spreadsheetId": self.id, "valueRanges": value_ranges}
+
+    def worksheets(self) -> list:
+        self._latency.simulate("metadata")
+        return list(self._worksheets.values())
+
+    def add_worksheet(self, title: str, rows: int = 0, cols: int = 0) -> FakeWorksheet:
+        self._latency.simulate("metadata")
+        self._worksheets[title] = FakeWorksheet(title, [], self._latency)
+        return self._worksheets[title]
+
+
+class FakeGspreadClient:
+    """
+    Substituto local do cliente gspread, com planilhas em memória.
+
+    `workbooks` mapeia ID da planilha -> {nome da aba: linhas (a primeira é o cabeçalho)}.
+    Latência e taxa de erros são aplicadas a todas as operações (leitura, escrita e metadados)
+    e são reprodutíveis para a mesma `seed`.
+    """
+    def __init__(self, workbooks: dict, latency: float = 0.0, latency_jitter: float = 0.0,
+                 error_rate: float = 0.0, seed: int = 0):
+        self.latency_model = LatencyModel(latency, latency_jitter, error_rate, seed)
+        self._spreadsheets = {
+            spreadsheet_id: FakeSpreadsheet(spreadsheet_id, tabs, self.latency_model)
+            for spreadsheet_id, tabs in workbooks.items()
+        }
+
+    @property
+    def calls(self) -> dict:
+        return dict(self.latency_model.calls)
+
+    def open_by_key(self, key: str) -> FakeSpreadsheet:
+        self.latency_model.simulate("open")
+        if key not in self._spreadsheets:
+            raise gspread.exceptions.SpreadsheetNotFound(key)
+        return self._spreadsheets[key]
+
+
+def build_sample_workbooks(n_companies: int = 50, n_extra_rules: int = 0, seed: int = 0) -> dict:
+    """
+    Gera planilhas de exemplo determinísticas: a planilha de dados com `n_companies`
+    instalações e a base de conhecimento RAG com uma regra por combinação (Divisão, Risco)
+    da Tabela A.1, mais `n_extra_rules` regras sintéticas para testes de escala.
+    """
+    rng = random.Random(seed)
+    engine = load_rule_engine()
+
+    data = {title: [list(headers)] for title, headers in DATA_SHEET_COLUMNS.items()}
+    for i in range(1, n_companies + 1):
+        company_id = f"EMP{i:05d}"
+        division = rng.choice(engine.divisions)
+        risk = rng.choice(engine.risks)
+        data["Empresas"].append([company_id, f"Empresa {i:05d} Ltda", f"{rng.randrange(10**13, 10**14)}", f"Unidade {i}"])
+        data["Dados_Calculo"].append([company_id, division, risk] + [rng.randint(0, 500) for _ in range(3)])
+        for j in range(rng.randint(0, 5)):
+            data["Brigadistas_Treinados"].append([company_id, f"Brigadista {i}-{j}", "email@naoinformado.com", "31/12/2030"])
+
+    rag = [list(RAG_HEADERS)]
+    for division in engine.divisions:
+        for risk in engine.risks:
+            rule = engine.get_rule(division, risk)
+            bands = "; ".join(
+                f"até {limit} pessoas: {'todos' if value is None else value} brigadistas"
+                for limit, value in zip(rule.limits, rule.values)
+            )
+            rag.append([
+                f"Qual o número de brigadistas para a divisão {division} com risco {risk}?",
+                f"Divisão {division} ({engine.descriptions[division]}), risco {risk}: {bands}. "
+                f"Acima da última faixa, acrescentar 1 brigadista a cada {rule.divisor} pessoas.",
+                engine.norma, "Tabela A.1",
+            ])
+    for i in range(n_extra_rules):
+        rag.append([f"Pergunta sintética {i}?", f"Resposta sintética {i} para testes de escala.", engine.norma, f"Anexo {i % 50}"])
+
+    return {
+        FAKE_DATA_SPREADSHEET_ID: data,
+        FAKE_RAG_SPREADSHEET_ID: {"RAG_Knowledge_Base": rag},
+    }
+
+
+def load_workbooks(path: str) -> dict:
+    """Lê planilhas de um arquivo JSON no formato {id: {aba: [[cabeçalho], [linha], ...]}}."""
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
@@ -2,23 +2,71 @@
 import streamlit as st
 import gspread
 import pandas as pd
+import atexit
+import re
+import threading
 from datetime import datetime
+from pathlib import Path
 from google.oauth2.service_account import Credentials
+from gspread.utils import numericise
 
-EMPRESAS_SHEET = "Empresas"
-DADOS_CALCULO_SHEET = "Dados_Calculo"
-BRIGADISTAS_SHEET = "Brigadistas_Treinados"
-RESULTADOS_SHEET = "Resultados_Salvos"
-
+from utils.settings import get_app_setting
+from utils.company_repository import CompanyRepository
+from utils.sheet_cache import SheetCache, DEFAULT_SHEET_CACHE_TTL, append_parsed_rows
+from utils.write_queue import WriteBehindQueue, DEFAULT_WRITE_JOURNAL_PATH, DEFAULT_DEAD_LETTER_PATH
+from utils.sheet_replica import SheetReplica, DEFAULT_REPLICA_DIR
+from utils.sheet_schema import (
+    EMPRESAS_SHEET, DADOS_CALCULO_SHEET, BRIGADISTAS_SHEET, RESULTADOS_SHEET, DATA_SHEETS, record_to_row,
+    apply_schema
+)
+from utils.sheets_quota import SheetsQuota, QUOTA_READ, QUOTA_WRITE, is_ambiguous_write_error
+from utils.storage_backend import (
+    StorageBackend, ParquetBackend, DEFAULT_PARQUET_STORAGE_DIR, pyarrow_available, lookup_key
+)
+from utils.fake_gsheets import (
+    FakeGspreadClient, build_sample_workbooks, load_workbooks, FAKE_DATA_SPREADSHEET_ID
+)
 
 # --- Funções Globais com Cache ---
 
+def using_fake_sheets() -> bool:
+    """Indica se o app está configurado para usar as planilhas em memória (sheets_backend = "fake")."""
+    return str(get_app_setting("sheets_backend", "gspread")).lower() == "fake"
+
+
+def create_fake_gspread_client() -> FakeGspreadClient:
+    """
+    Cria o cliente de planilhas em memória para execução offline e benchmarks. Os dados vêm
+    do arquivo JSON em `fake_sheets_path` ou, se ausente, de planilhas de exemplo geradas.
+    """
+    seed = int(get_app_setting("fake_seed", 0))
+    fixture_path = get_app_setting("fake_sheets_path")
+    if fixture_path:
+        workbooks = load_workbooks(fixture_path)
+    else:
+        workbooks = build_sample_workbooks(
+            n_companies=int(get_app_setting("fake_sheets_companies", 50)),
+            n_extra_rules=int(get_app_setting("fake_rag_extra_rules", 0)),
+            seed=seed
+        )
+    return FakeGspreadClient(
+        workbooks,
+        latency=float(get_app_setting("fake_sheets_latency_seconds", 0.0)),
+        latency_jitter=float(get_app_setting("fake_sheets_latency_jitter_seconds", 0.0)),
+        error_rate=float(get_app_setting("fake_sheets_error_rate", 0.0)),
+        seed=seed
+    )
+
+
 @st.cache_resource
 def connect_to_gsheets():
     """
     Conecta ao Google Sheets usando as credenciais do st.secrets e retorna o cliente gspread.
     Usa @st.cache_resource para que a conexão seja criada apenas uma vez por sessão.
+    Com sheets_backend = "fake", retorna o cliente de planilhas em memória.
     """
+    if using_fake_sheets():
+        return create_fake_gspread_client()
     try:
         scopes = ['https://www.googleapis.com/auth/spreadsheets']
         creds_dict = st.secrets["connections"]["gsheets"]
@@ -29,16 +77,238 @@ def connect_to_gsheets():
         st.stop()
 
 
+# Códigos HTTP que indicam credencial expirada ou handle desatualizado (aba/planilha recriada)
+STALE_HANDLE_STATUS = (401, 403, 404)
+
+
+def _is_stale_handle_error(error: Exception) -> bool:
+    """Indica se o erro justifica reabrir a planilha/aba e repetir a operação uma vez."""
+    if isinstance(error, (gspread.exceptions.WorksheetNotFound, gspread.exceptions.SpreadsheetNotFound)):
+        return True
+    if isinstance(error, gspread.exceptions.APIError):
+        response = getattr(error, "response", None)
+        return getattr(response, "status_code", None) in STALE_HANDLE_STATUS
+    return False
+
+
+class WorksheetPool:
+    """
+    Cache dos handles de planilhas e abas (resultado de open_by_key e worksheet), criados sob
+    demanda e compartilhados pelo processo. Evita as requisições de metadados antes de cada
+    leitura ou escrita. Em erros de autenticação ou de metadados, os handles da planilha são
+    descartados e a operação é repetida uma vez com handles novos.
+
+    Todas as requisições passam pelo controle de cotas `quota` (limite por minuto, backoff
+    em 429/5xx e agrupamento de leituras idênticas simultâneas).
+    """
+    def __init__(self, client, quota: SheetsQuota | None = None):
+        self.client = client
+        self.quota = quota or SheetsQuota()
+        self._spreadsheets = {}
+        self._worksheets = {}
+        self._lock = threading.Lock()
+
+    def spreadsheet(self, sheet_id: str):
+        with self._lock:
+            cached = self._spreadsheets.get(sheet_id)
+        if cached is not None:
+            return cached
+        self.quota.throttle(QUOTA_READ)
+        spreadsheet = self.client.open_by_key(sheet_id)
+        with self._lock:
+            return self._spreadsheets.setdefault(sheet_id, spreadsheet)
+
+    def worksheet(self, sheet_id: str, sheet_name: str):
+        key = (sheet_id, sheet_name)
+        with self._lock:
+            cached = self._worksheets.get(key)
+        if cached is not None:
+            return cached
+        spreadsheet = self.spreadsheet(sheet_id)
+        self.quota.throttle(QUOTA_READ)
+        worksheet = spreadsheet.worksheet(sheet_name)
+        with self._lock:
+            self._worksheets[key] = worksheet
+        return worksheet
+
+    def invalidate(self, sheet_id: str) -> None:
+        """Descarta os handles de uma planilha (e de todas as suas abas)."""
+        with self._lock:
+            self._spreadsheets.pop(sheet_id, None)
+            for key in [key for key in self._worksheets if key[0] == sheet_id]:
+                del self._worksheets[key]
+
+    def _refreshing(self, sheet_id: str, operation):
+        """Executa `operation()`; se um handle estiver desatualizado, renova-os e repete uma vez."""
+        try:
+            return operation()
+        except Exception as e:
+            if not _is_stale_handle_error(e):
+                raise
+            self.invalidate(sheet_id)
+            return operation()
+
+    def with_spreadsheet(self, sheet_id: str, operation, kind: str = QUOTA_READ, key=None):
+        """
+        Executa `operation(spreadsheet)` dentro da cota `kind`, renovando o handle uma vez se
+        ele estiver desatualizado. Leituras com a mesma `key` em andamento são compartilhadas.
+        """
+        if kind != QUOTA_READ:
+            # O handle é metadado (leitura): obtido antes, com as novas tentativas das leituras.
+            self.quota.call(QUOTA_READ, lambda: self._refreshing(sheet_id, lambda: self.spreadsheet(sheet_id)))
+        return self.quota.call(
+            kind, lambda: self._refreshing(sheet_id, lambda: operation(self.spreadsheet(sheet_id))), key=key
+        )
+
+    def with_worksheet(self, sheet_id: str, sheet_name: str, operation, kind: str = QUOTA_READ, key=None):
+        """
+        Executa `operation(worksheet)` dentro da cota `kind`, renovando o handle uma vez se
+        ele estiver desatualizado. Leituras com a mesma `key` em andamento são compartilhadas.
+        """
+        if kind != QUOTA_READ:
+            # O handle é metadado (leitura): obtido antes, com as novas tentativas das leituras.
+            self.quota.call(QUOTA_READ, lambda: self._refreshing(sheet_id, lambda: self.worksheet(sheet_id, sheet_name)))
+        return self.quota.call(
+            kind, lambda: self._refreshing(sheet_id, lambda: operation(self.worksheet(sheet_id, sheet_name))), key=key
+        )
+
+    def batch_get(self, sheet_id: str, ranges: list) -> dict:
+        """values_batch_get de vários intervalos (resposta compartilhada por leituras simultâneas)."""
+        ranges = list(ranges)
+        return self.with_spreadsheet(
+            sheet_id, lambda spreadsheet: spreadsheet.values_batch_get(ranges),
+            key=("values_batch_get", sheet_id, tuple(ranges))
+        )
+
+    def get_all_records(self, sheet_id: str, sheet_name: str) -> list:
+        """get_all_records de uma aba (resultado compartilhado por leituras simultâneas)."""
+        return self.with_worksheet(
+            sheet_id, sheet_name, lambda worksheet: worksheet.get_all_records(),
+            key=("get_all_records", sheet_id, sheet_name)
+        )
+
+    def append_rows(self, sheet_id: str, sheet_name: str, rows: list) -> None:
+        """Acrescenta linhas a uma aba com uma única requisição (cota de escrita)."""
+        self.with_worksheet(
+            sheet_id, sheet_name, lambda worksheet: worksheet.append_rows(rows, value_input_option='USER_ENTERED'),
+            kind=QUOTA_WRITE
+        )
+
+
+@st.cache_resource
+def get_sheets_quota() -> SheetsQuota:
+    """
+    Controle das cotas da API do Sheets compartilhado pelo processo. Os limites padrão
+    seguem a cota por usuário do Google (60 leituras e 60 escritas por minuto).
+    """
+    return SheetsQuota(
+        read_requests_per_minute=float(get_app_setting("sheets_read_requests_per_minute", 60)),
+        write_requests_per_minute=float(get_app_setting("sheets_write_requests_per_minute", 60)),
+        burst=float(get_app_setting("sheets_quota_burst", 10)),
+        max_retries=int(get_app_setting("sheets_max_retries", 5)),
+        backoff_max=float(get_app_setting("sheets_backoff_max_seconds", 32))
+    )
+
+
+@st.cache_resource
+def get_worksheet_pool(_gspread_client) -> WorksheetPool:
+    """Pool de handles compartilhado pelo processo (um por cliente gspread)."""
+    return WorksheetPool(_gspread_client, quota=get_sheets_quota())
+
+
+@st.cache_resource
+def get_sheet_cache() -> SheetCache:
+    """
+    Cache versionado das abas da planilha de dados, compartilhado pelo processo. As abas
+    são guardadas já com os tipos do esquema (ver utils.sheet_schema).
+    """
+    return SheetCache(
+        ttl=float(get_app_setting("sheet_cache_ttl_seconds", DEFAULT_SHEET_CACHE_TTL)),
+        transform=apply_schema
+    )
+
+
+def read_replica_enabled() -> bool:
+    """Indica se as leituras da planilha de dados são servidas pela réplica local (SQLite)."""
+    return str(get_app_setting("read_replica_enabled", True)).lower() not in ("false", "0", "no")
+
+
+@st.cache_resource
+def get_sheet_replica(_gspread_client, sheet_id: str) -> SheetReplica:
+    """
+    Réplica local das abas de dados, compartilhada pelo processo e mantida em dia por uma
+    thread de sincronização. Abas alteradas pela sincronização são invalidadas no cache.
+    """
+    pool = get_worksheet_pool(_gspread_client)
+
+    def fetch_values(ranges: list) -> list:
+        response = pool.batch_get(sheet_id, ranges)
+        return [value_range.get("values", []) for value_range in response.get("valueRanges", [])]
+
+    def on_change(changed: list) -> None:
+        cache = get_sheet_cache()
+        for name in changed:
+            cache.invalidate(sheet_id, name)
+
+    slug = re.sub(r"[^A-Za-z0-9_-]", "_", sheet_id)
+    replica = SheetReplica(
+        fetch_values, DATA_SHEETS,
+        path=str(Path(get_app_setting("read_replica_dir", DEFAULT_REPLICA_DIR)) / f"sheets_replica_{slug}.sqlite3"),
+        full_sync_interval=float(get_app_setting("read_replica_full_sync_seconds", 600))
+    )
+    replica.start(interval=float(get_app_setting("read_replica_sync_seconds", 30)), on_change=on_change)
+    return replica
+
+
+def request_replica_sync(_gspread_client, sheet_id: str) -> None:
+    """Antecipa a sincronização da réplica após uma escrita na planilha."""
+    if read_replica_enabled():
+        get_sheet_replica(_gspread_client, sheet_id).request_sync()
+
+
+def write_behind_enabled() -> bool:
+    """Indica se as gravações de resultados e brigadistas passam pela fila assíncrona."""
+    return str(get_app_setting("write_behind_enabled", True)).lower() not in ("false", "0", "no")
+
+
+@st.cache_resource
+def get_write_queue(_gspread_client) -> WriteBehindQueue:
+    """
+    Fila de escrita assíncrona compartilhada pelo processo: as linhas de todas as sessões
+    são agrupadas por aba e enviadas em lotes por uma thread em segundo plano.
+    """
+    pool = get_worksheet_pool(_gspread_client)
+
+    def write_rows(sheet_id: str, sheet_name: str, rows: list) -> None:
+        pool.append_rows(sheet_id, sheet_name, rows)
+        request_replica_sync(_gspread_client, sheet_id)
+
+    queue = WriteBehindQueue(
+        write_rows,
+        journal_path=get_app_setting("write_journal_path", DEFAULT_WRITE_JOURNAL_PATH),
+        max_batch_rows=int(get_app_setting("write_batch_rows", 200)),
+        flush_interval=float(get_app_setting("write_flush_interval_seconds", 2.0)),
+        max_attempts=int(get_app_setting("write_max_attempts", 8)),
+        dead_letter_path=get_app_setting("write_dead_letter_path", DEFAULT_DEAD_LETTER_PATH)
+    )
+    # Tenta enviar o que restar ao encerrar; o diário cobre o que não for enviado a tempo.
+    atexit.register(queue.flush, 5.0)
+    return queue
+
+
 @st.cache_data(ttl=300) # Cache de 5 minutos para os dados
 def get_sheet_data_as_df(_gspread_client, sheet_id: str, sheet_name: str) -> pd.DataFrame:
     """
     Busca dados de uma aba específica de uma planilha (identificada pelo sheet_id)
     e retorna como um DataFrame pandas. Esta função é cacheada.
     """
+    return fetch_sheet_as_df(_gspread_client, sheet_id, sheet_name)
+
+
+def fetch_sheet_as_df(_gspread_client, sheet_id: str, sheet_name: str) -> pd.DataFrame:
+    """Lê uma aba (sem cache); erros são exibidos e resultam em um DataFrame vazio."""
     try:
-        spreadsheet = _gspread_client.open_by_key(sheet_id)
-        worksheet = spreadsheet.worksheet(sheet_name)
-        records = worksheet.get_all_records()
+        records = get_worksheet_pool(_gspread_client).get_all_records(sheet_id, sheet_name)
         df = pd.DataFrame(records)
         return df.dropna(how="all")
     except gspread.exceptions.SpreadsheetNotFound:
@@ -53,6 +323,223 @@ def get_sheet_data_as_df(_gspread_client, sheet_id: str, sheet_name: str) -> pd.
 
 
 
+def values_to_df(values: list) -> pd.DataFrame:
+    """
+    Converte os valores brutos de uma aba (primeira linha = cabeçalho) em DataFrame, com a
+    mesma conversão de números e células vazias do get_all_records do gspread.
+    """
+    if not values:
+        return pd.DataFrame()
+    headers = values[0]
+    records = [
+        {header: numericise(row[i]) if i < len(row) else "" for i, header in enumerate(headers)}
+        for row in values[1:]
+    ]
+    return pd.DataFrame(records, columns=headers).dropna(how="all")
+
+
+def fetch_workbook_as_dfs(_gspread_client, sheet_id: str, sheet_names: tuple) -> dict:
+    """
+    Busca várias abas de uma planilha com uma única chamada values_batch_get e retorna um
+    dicionário {nome da aba: DataFrame}. Uma falha (ex: aba inexistente) é propagada para
+    que o chamador recorra à leitura aba a aba, que informa o erro específico.
+    """
+    # O nome da aba entre aspas simples é um intervalo A1 que cobre a aba inteira.
+    ranges = ["'{}'".format(name.replace("'", "''")) for name in sheet_names]
+    response = get_worksheet_pool(_gspread_client).batch_get(sheet_id, ranges)
+    value_ranges = response.get("valueRanges", [])
+    return {name: values_to_df(value_range.get("values", [])) for name, value_range in zip(sheet_names, value_ranges)}
+
+
+def parse_written_cell(value):
+    """Valor de uma célula gravada com USER_ENTERED, como a leitura da planilha o devolveria."""
+    return numericise("" if value is None else str(value))
+
+
+def load_data_sheets(_gspread_client, sheet_id: str, sheet_names: tuple = DATA_SHEETS) -> dict:
+    """
+    Retorna {aba: CachedFrame} a partir do cache versionado. As abas ausentes ou expiradas
+    vêm da réplica local, quando habilitada, ou são lidas juntas com uma única chamada; se a
+    leitura conjunta falhar, cada aba é lida separadamente (o que informa o erro específico).
+    """
+    def loader(missing: tuple) -> dict:
+        frames = None
+        if read_replica_enabled():
+            try:
+                replica = get_sheet_replica(_gspread_client, sheet_id)
+                if not replica.is_ready():
+                    replica.sync()
+                frames = {name: values_to_df(replica.read_values(name)) for name in missing}
+            except Exception:
+                frames = None  # Réplica indisponível: lê direto da planilha
+        if frames is None:
+            try:
+                frames = fetch_workbook_as_dfs(_gspread_client, sheet_id, missing)
+            except Exception:
+                frames = {name: fetch_sheet_as_df(_gspread_client, sheet_id, name) for name in missing}
+        if write_behind_enabled():
+            # Linhas aceitas mas ainda na fila de escrita continuam visíveis após a releitura.
+            queue = get_write_queue(_gspread_client)
+            for name, frame in frames.items():
+                pending = queue.pending_rows(sheet_id, name)
+                if pending and not frame.columns.empty:
+                    frames[name] = append_parsed_rows(frame, pending, parse_written_cell)
+        return frames
+
+    return get_sheet_cache().get_many(sheet_id, tuple(sheet_names), loader)
+
+
+class SheetsBackend(StorageBackend):
+    """
+    Armazenamento na própria planilha de dados (Google Sheets), lido pelo cache versionado
+    (e pela réplica local) e gravado diretamente ou pela fila de escrita assíncrona.
+
+    As buscas usam índices {chave normalizada: posições das linhas} por (aba, coluna) (ver
+    lookup_key), montados uma vez por versão da aba em vez de uma máscara booleana O(n) a
+    cada consulta. As leituras entregam cópias do DataFrame do cache (ver StorageBackend).
+    """
+    name = "sheets"
+
+    def __init__(self, gspread_client, sheet_id: str, write_queue: WriteBehindQueue | None = None):
+        self.client = gspread_client
+        self.sheet_id = sheet_id
+        self.pool = get_worksheet_pool(gspread_client)
+        self.write_queue = write_queue
+
+    def _cached(self, sheet_name: str):
+        if sheet_name in DATA_SHEETS:
+            # As quatro abas são pedidas juntas para aproveitar a mesma leitura conjunta.
+            return load_data_sheets(self.client, self.sheet_id)[sheet_name]
+        return get_sheet_cache().get(
+            self.sheet_id, sheet_name,
+            lambda missing: {name: fetch_sheet_as_df(self.client, self.sheet_id, name) for name in missing}
+        )
+
+    @staticmethod
+    def _select(frame: pd.DataFrame, columns: list | None) -> pd.DataFrame:
+        """
+        Cópia rasa (das colunas pedidas) do DataFrame em cache: os dados continuam
+        compartilhados pelo processo, mas são somente leitura (ver freeze_frame).
+        """
+        if columns is not None:
+            frame = frame[[column for column in columns if column in frame.columns]]
+        return frame.copy(deep=False)
+
+    def read(self, sheet_name: str, columns: list | None = None) -> pd.DataFrame:
+        return self._select(self._cached(sheet_name).frame, columns)
+
+    def lookup(self, sheet_name: str, column: str, value, columns: list | None = None) -> pd.DataFrame:
+        cached = self._cached(sheet_name)
+        frame = cached.frame
+        if column not in frame.columns:
+            return self._select(frame.iloc[0:0], columns)
+
+        def build_index() -> dict:
+            # Posições por chave normalizada, como no backend Parquet ("001", 1 e 1.0 coincidem).
+            keys = frame[column].astype(object).map(lookup_key)
+            return keys.groupby(keys, sort=False).indices
+
+        positions = get_sheet_cache().derived(
+            ("index", self.sheet_id, sheet_name, column), (cached.version,), build_index
+        ).get(lookup_key(parse_written_cell(value)))
+        return self._select(frame.iloc[positions if positions is not None else slice(0, 0)], columns)
+
+    def append(self, sheet_name: str, rows: list, deferred: bool = False) -> str | None:
+        """
+        Acrescenta linhas à aba e aplica a mesma escrita à aba em cache (write-through), sem
+        invalidar as demais. Com `deferred=True` (e a fila habilitada), as linhas vão para a
+        fila de escrita assíncrona e o ticket da gravação é retornado imediatamente; caso
+        contrário, a escrita é feita agora, com uma única chamada à API.
+
+        Uma escrita imediata que falhe de forma ambígua (5xx ou erro de rede, em que as linhas
+        podem ou não ter sido gravadas) não é repetida: o erro é propagado (ver
+        describe_write_error) e a aba em cache é descartada, para ser relida da planilha.
+        """
+        ticket = None
+        if deferred and self.write_queue is not None:
+            ticket = self.write_queue.enqueue(self.sheet_id, sheet_name, rows)
+        else:
+            try:
+                self.pool.append_rows(self.sheet_id, sheet_name, rows)
+            except Exception as e:
+                if is_ambiguous_write_error(e):
+                    get_sheet_cache().invalidate(self.sheet_id, sheet_name)
+                    request_replica_sync(self.client, self.sheet_id)
+                raise
+            request_replica_sync(self.client, self.sheet_id)
+        get_sheet_cache().append_rows(self.sheet_id, sheet_name, rows, parse_cell=parse_written_cell)
+        return ticket
+
+
+def describe_write_error(error: Exception) -> str:
+    """Mensagem de uma escrita que falhou, avisando quando ela pode ter sido aplicada mesmo assim."""
+    if is_ambiguous_write_error(error):
+        return (f"{error}. A planilha não confirmou a gravação, que pode ter sido aplicada mesmo assim: "
+                "confira a aba antes de tentar novamente")
+    return str(error)
+
+
+def storage_backend_name() -> str:
+    """Backend de armazenamento da planilha de dados (storage_backend = "sheets" ou "parquet")."""
+    return str(get_app_setting("storage_backend", "sheets")).lower()
+
+
+@st.cache_resource
+def get_storage_backend(_gspread_client, sheet_id: str) -> StorageBackend:
+    """
+    Backend de armazenamento compartilhado pelo processo. Com storage_backend = "parquet",
+    as abas de dados são servidas de uma réplica Parquet local, relida da planilha (com uma
+    única leitura para todas as abas) a cada parquet_refresh_seconds; as gravações vão para a
+    planilha, pelo SheetsBackend, e são aplicadas também à réplica.
+    """
+    write_queue = get_write_queue(_gspread_client) if write_behind_enabled() else None
+    sheets_backend = SheetsBackend(_gspread_client, sheet_id, write_queue)
+    if storage_backend_name() != "parquet":
+        return sheets_backend
+    if not pyarrow_available():
+        st.warning("storage_backend = \"parquet\" requer o pacote 'pyarrow'. Usando o Google Sheets.")
+        return sheets_backend
+
+    pool = get_worksheet_pool(_gspread_client)
+
+    def fetch_values(sheet_names: tuple) -> dict:
+        ranges = ["'{}'".format(name.replace("'", "''")) for name in sheet_names]
+        response = pool.batch_get(sheet_id, ranges)
+        values = {name: value_range.get("values", [])
+                  for name, value_range in zip(sheet_names, response.get("valueRanges", []))}
+        if write_queue is not None:
+            # Linhas aceitas mas ainda na fila de escrita continuam visíveis após a releitura.
+            for name, sheet_values in values.items():
+                pending = write_queue.pending_rows(sheet_id, name)
+                if pending and sheet_values:
+                    values[name] = sheet_values + pending
+        return values
+
+    try:
+        slug = re.sub(r"[^A-Za-z0-9_-]", "_", sheet_id)
+        backend = ParquetBackend(
+            Path(get_app_setting("parquet_storage_dir", DEFAULT_PARQUET_STORAGE_DIR)) / slug,
+            fetch_values=fetch_values,
+            writer=sheets_backend.append,
+            parse_cell=parse_written_cell,
+            transform=apply_schema,
+            sheet_names=DATA_SHEETS,
+            refresh_interval=float(get_app_setting("parquet_refresh_seconds", 300)),
+            row_group_size=int(get_app_setting("parquet_row_group_size", 4096))
+        )
+    except Exception as e:
+        st.error(f"Falha ao preparar o armazenamento local Parquet: {e}. Usando o Google Sheets.")
+        return sheets_backend
+    try:
+        backend.refresh()
+    except Exception as e:
+        if not all(backend.has_sheet(name) for name in DATA_SHEETS):
+            st.error(f"Falha ao importar a planilha para o armazenamento local Parquet: {e}. Usando o Google Sheets.")
+            return sheets_backend
+        st.warning(f"Não foi possível atualizar o armazenamento local Parquet: {e}. Usando os dados locais.")
+    return backend
+
+
 class GoogleSheetsHandler:
     """
     Classe que orquestra as operações com o Google Sheets, gerenciando as
@@ -61,37 +548,44 @@ class GoogleSheetsHandler:
     def __init__(self):
         """Inicializa o handler obtendo a conexão cacheada e o ID da planilha de dados."""
         self.client = connect_to_gsheets()
-        try:
-            # Armazena o ID da planilha principal de DADOS
-            self.spreadsheet_id = st.secrets["connections"]["gsheets"]["spreadsheet"]
-        except KeyError:
-            st.error("O ID da planilha de dados ('spreadsheet') não foi encontrado em [connections.gsheets] nos seus secrets.")
-            st.stop()
+        self.write_queue = get_write_queue(self.client) if write_behind_enabled() else None
+        if using_fake_sheets():
+            self.spreadsheet_id = get_app_setting("spreadsheet_id", FAKE_DATA_SPREADSHEET_ID)
+        else:
+            try:
+                # Armazena o ID da planilha principal de DADOS
+                self.spreadsheet_id = st.secrets["connections"]["gsheets"]["spreadsheet"]
+            except KeyError:
+                st.error("O ID da planilha de dados ('spreadsheet') não foi encontrado em [connections.gsheets] nos seus secrets.")
+                st.stop()
+        self.storage = get_storage_backend(self.client, self.spreadsheet_id)
+        self.repository = CompanyRepository(self.storage)
 
     def get_data_as_df(self, sheet_name: str, rag_sheet_id: str = None) -> pd.DataFrame:
         """
         Busca dados de uma aba. Se `rag_sheet_id` for fornecido, usa esse ID para
         buscar na planilha RAG. Caso contrário, usa o ID da planilha de dados padrão.
         """
-        target_sheet_id = rag_sheet_id if rag_sheet_id else self.spreadsheet_id
-        return get_sheet_data_as_df(self.client, target_sheet_id, sheet_name)
+        if rag_sheet_id:
+            return get_sheet_data_as_df(self.client, rag_sheet_id, sheet_name)
+        if sheet_name in DATA_SHEETS:
+            return self.storage.read(sheet_name)
+        return get_sheet_data_as_df(self.client, self.spreadsheet_id, sheet_name)
+
+    def get_write_status(self, ticket: str) -> dict | None:
+        """Situação de uma gravação enfileirada (pendente, gravado, erro ou falhou)."""
+        return self.write_queue.status(ticket) if self.write_queue is not None and ticket else None
 
     def get_company_list(self) -> list:
         """Retorna uma lista com a Razão Social de todas as empresas da planilha de dados."""
-        df = self.get_data_as_df(EMPRESAS_SHEET)
-        if not df.empty and 'Razao_Social' in df.columns:
-            return df['Razao_Social'].tolist()
-        return []
+        return self.repository.company_names()
 
     def get_company_info(self, company_name: str) -> dict | None:
-        empresas_df = self.get_data_as_df(EMPRESAS_SHEET)
-        if empresas_df.empty or 'Razao_Social' not in empresas_df.columns: return None
-        
-        company_data = empresas_df[empresas_df['Razao_Social'] == company_name]
-        
-        if not company_data.empty:
-            return company_data.iloc[0].to_dict()
-        return None
+        return self.repository.get_company(company_name)
+
+    def get_company_id(self, company_name: str):
+        """Retorna o ID_Empresa da empresa com a Razão Social informada (None se não existir)."""
+        return self.repository.get_company_id(company_name)
 
     def add_new_installation(self, company_data: dict, calculation_data: dict):
         """
@@ -100,101 +594,81 @@ class GoogleSheetsHandler:
         """
         try:
             with st.spinner("Adicionando nova instalação à planilha..."):
-                # Adiciona na aba Empresas
-                worksheet_empresas = self.spreadsheet.worksheet(EMPRESAS_SHEET)
-                # Garante que a ordem das colunas esteja correta
-                company_row = [
-                    company_data.get("ID_Empresa"),
-                    company_data.get("Razao_Social"),
-                    company_data.get("CNPJ"),
-                    company_data.get("Imovel")
-                ]
-                worksheet_empresas.append_row(company_row, value_input_option='USER_ENTERED')
-                
-                # Adiciona na aba Dados_Calculo
-                worksheet_calculo = self.spreadsheet.worksheet(DADOS_CALCULO_SHEET)
-                calc_row = [
-                    calculation_data.get("ID_Empresa"),
-                    calculation_data.get("Divisao"),
-                    calculation_data.get("Risco"),
-                    calculation_data.get("Pop_Turno1"),
-                    calculation_data.get("Pop_Turno2"),
-                    calculation_data.get("Pop_Turno3")
-                ]
-                worksheet_calculo.append_row(calc_row, value_input_option='USER_ENTERED')
+                # Adiciona na aba Empresas e na aba Dados_Calculo, na ordem das colunas de cada aba
+                self.storage.append(EMPRESAS_SHEET, [record_to_row(EMPRESAS_SHEET, company_data)])
+                self.storage.append(DADOS_CALCULO_SHEET, [record_to_row(DADOS_CALCULO_SHEET, calculation_data)])
             
             st.success(f"Instalação '{company_data.get('Imovel')}' adicionada com sucesso!")
-            # Limpa o cache para forçar a releitura da lista de empresas
-            st.cache_data.clear()
             return True
             
         except Exception as e:
-            st.error(f"Ocorreu um erro ao adicionar a nova instalação: {e}")
+            st.error(f"Ocorreu um erro ao adicionar a nova instalação: {describe_write_error(e)}")
             return False
 
     def get_calculation_data(self, company_name: str) -> dict | None:
-        empresas_df = self.get_data_as_df(EMPRESAS_SHEET)
-        dados_df = self.get_data_as_df(DADOS_CALCULO_SHEET)
-
-        if empresas_df.empty or dados_df.empty or 'Razao_Social' not in empresas_df.columns: return None
-
-        id_empresa_series = empresas_df.loc[empresas_df['Razao_Social'] == company_name, 'ID_Empresa']
-        
-        if not id_empresa_series.empty:
-            id_empresa = id_empresa_series.iloc[0]
-            company_data = dados_df[dados_df['ID_Empresa'] == id_empresa]
-            if not company_data.empty:
-                return company_data.iloc[0].to_dict()
-        return None
+        return self.repository.get_calculation_data(company_name)
 
     def get_brigadistas_list(self, company_name: str) -> pd.DataFrame:
         """Retorna um DataFrame com a lista de brigadistas de uma empresa específica."""
-        empresas_df = self.get_data_as_df(EMPRESAS_SHEET)
-        brigadistas_df = self.get_data_as_df(BRIGADISTAS_SHEET)
-
-        if empresas_df.empty or brigadistas_df.empty:
-            return pd.DataFrame()
-        
-        id_empresa_series = empresas_df.loc[empresas_df['Razao_Social'] == company_name, 'ID_Empresa']
-        if id_empresa_series.empty:
-            return pd.DataFrame()
-
-        id_empresa = id_empresa_series.iloc[0]
-        return brigadistas_df[brigadistas_df['ID_Empresa'] == id_empresa]
+        return self.repository.get_brigadistas(company_name)
 
     def add_brigadistas_to_sheet(self, id_empresa: str, nomes: list, validade: str):
         """Adiciona uma lista de novos brigadistas à aba 'Brigadistas_Treinados'."""
+        self.add_brigadistas_batch([(id_empresa, nomes, validade)])
+
+    def add_brigadistas_batch(self, entries: list) -> str | None:
+        """
+        Adiciona os brigadistas de vários atestados com uma única escrita (append_rows),
+        enviada pela fila de escrita assíncrona quando habilitada.
+
+        Args:
+            entries (list): Tuplas (id_empresa, nomes, validade), uma por atestado.
+
+        Returns:
+            str | None: Ticket da gravação enfileirada (ver get_write_status).
+        """
         try:
-            spreadsheet = self.client.open_by_key(self.spreadsheet_id)
-            worksheet = spreadsheet.worksheet(BRIGADISTAS_SHEET)
-            
             rows_to_add = []
-            for nome in nomes:
-                new_row = [id_empresa, nome.strip(), "email@naoinformado.com", validade]
-                rows_to_add.append(new_row)
+            for id_empresa, nomes, validade in entries:
+                for nome in nomes:
+                    rows_to_add.append(record_to_row(BRIGADISTAS_SHEET, {
+                        "ID_Empresa": id_empresa, "Nome": nome.strip(),
+                        "Email": "email@naoinformado.com", "Validade": validade
+                    }))
             
             if rows_to_add:
-                worksheet.append_rows(rows_to_add, value_input_option='USER_ENTERED')
-                st.success(f"{len(rows_to_add)} brigadistas foram adicionados com sucesso à planilha!")
+                ticket = self.storage.append(BRIGADISTAS_SHEET, rows_to_add, deferred=True)
+                if ticket:
+                    st.success(f"{len(rows_to_add)} brigadistas registrados! A gravação na planilha é concluída em segundo plano.")
+                else:
+                    st.success(f"{len(rows_to_add)} brigadistas foram adicionados com sucesso à planilha!")
+                return ticket
         except Exception as e:
-            st.error(f"Ocorreu um erro ao tentar adicionar brigadistas à planilha: {e}")
+            st.error(f"Ocorreu um erro ao tentar adicionar brigadistas à planilha: {describe_write_error(e)}")
+        return None
 
-    def save_calculation_result(self, data: dict):
-        """Salva uma nova linha com o resultado do cálculo na aba de resultados."""
+    def save_calculation_result(self, data: dict) -> str | None:
+        """
+        Salva uma nova linha com o resultado do cálculo na aba de resultados, pela fila de
+        escrita assíncrona quando habilitada. Retorna o ticket da gravação enfileirada.
+        """
         try:
-            spreadsheet = self.client.open_by_key(self.spreadsheet_id)
-            worksheet = spreadsheet.worksheet(RESULTADOS_SHEET)
-            data_row = [
-                data.get("id_empresa"),
-                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                data.get("usuario"),
-                data.get("divisao"),
-                data.get("risco"),
-                str(data.get("populacao_turnos")),
-                data.get("total_calculado"),
-                str(data.get("detalhe_turnos"))
-            ]
-            worksheet.append_row(data_row, value_input_option='USER_ENTERED')
-            st.success("Resultado do cálculo salvo com sucesso na planilha!")
+            data_row = record_to_row(RESULTADOS_SHEET, {
+                "ID_Empresa": data.get("id_empresa"),
+                "Data_Hora": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "Usuario": data.get("usuario"),
+                "Divisao": data.get("divisao"),
+                "Risco": data.get("risco"),
+                "Populacao_Turnos": str(data.get("populacao_turnos")),
+                "Total_Calculado": data.get("total_calculado"),
+                "Detalhe_Turnos": str(data.get("detalhe_turnos"))
+            })
+            ticket = self.storage.append(RESULTADOS_SHEET, [data_row], deferred=True)
+            if ticket:
+                st.success("Resultado do cálculo registrado! A gravação na planilha é concluída em segundo plano.")
+            else:
+                st.success("Resultado do cálculo salvo com sucesso na planilha!")
+            return ticket
         except Exception as e:
-            st.error(f"Ocorreu um erro ao tentar salvar o resultado na planilha: {e}")
+            st.error(f"Ocorreu um erro ao tentar salvar o resultado na planilha: {describe_write_error(e)}")
+        return None
@@ -0,0 +1,148 @@
+import json
+import math
+from bisect import bisect_left
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from types import MappingProxyType
+
+import numpy as np
+
+# Arquivo com a Tabela A.1 da ABNT NBR 14276 (faixas de população por Divisão e Risco)
+DEFAULT_TABLE_PATH = Path(__file__).parent / "data" / "nbr14276_tabela_a1.json"
+
+# Valor usado na tabela para indicar que 100% da população do turno deve ser brigadista
+TODOS = "Todos"
+
+
+@dataclass(frozen=True)
+class CompiledRule:
+    """
+    Regra compilada de uma combinação (Divisão, Risco).
+
+    `limits` guarda os limites superiores das faixas de população em ordem crescente e
+    `values` o número de brigadistas de cada faixa (None representa "Todos").
+    """
+    division: str
+    risk: str
+    limits: tuple
+    values: tuple
+    divisor: int
+
+    def breakdown(self, population: int) -> tuple[int, int]:
+        """
+        Retorna (brigadistas_base, brigadistas_acrescimo) para a população do turno.
+        A busca da faixa é feita por bisseção: O(log n_faixas).
+        """
+        if population <= 0:
+            return 0, 0
+
+        index = bisect_left(self.limits, population)
+        if index < len(self.limits):
+            value = self.values[index]
+            if value is None:
+                return population, 0
+            return min(population, value), 0
+
+        # Acima da última faixa: valor da última faixa + acréscimo da Nota 5
+        last_value = self.values[-1]
+        if last_value is None:
+            return population, 0
+        excedente = population - self.limits[-1]
+        # math.ceil garante que qualquer fração de grupo conte como 1 brigadista a mais.
+        return last_value, math.ceil(excedente / self.divisor)
+
+    def evaluate(self, population: int) -> int:
+        """Calcula o número de brigadistas para um único turno."""
+        base, acrescimo = self.breakdown(population)
+        return base + acrescimo
+
+    def evaluate_array(self, populations: np.ndarray) -> np.ndarray:
+        """Versão vetorizada de `evaluate` para um array de populações (qualquer formato)."""
+        populations = np.asarray(populations, dtype=np.int64)
+        limits = np.asarray(self.limits, dtype=np.int64)
+        # -1 representa a regra "Todos"
+        values = np.asarray([-1 if v is None else v for v in self.values], dtype=np.int64)
+
+        index = np.searchsorted(limits, populations, side="left")
+        in_band = index < len(limits)
+        band_values = values[np.minimum(index, len(limits) - 1)]
+        band_result = np.where(band_values == -1, populations, np.minimum(populations, band_values))
+
+        if values[-1] == -1:
+            above_result = populations
+        else:
+            # Divisão inteira com arredondamento para cima, equivalente a math.ceil
+            above_result = values[-1] - ((limits[-1] - populations) // self.divisor)
+
+        result = np.where(in_band, band_result, above_result)
+        return np.where(populations <= 0, 0, result)
+
+
+class RuleEngine:
+    """
+    Conjunto imutável de regras compiladas da Tabela A.1, indexado por (Divisão, Risco).
+    Uma única instância é carregada por processo e compartilhada entre as sessões do Streamlit.
+    """
+    def __init__(self, rules: dict, descriptions: dict, risks: tuple, norma: str):
+        self._rules = MappingProxyType(dict(rules))
+        self.descriptions = MappingProxyType(dict(descriptions))
+        # Ordem do arquivo da tabela: a primeira divisão é o padrão dos selectbox da página.
+        self.divisions = tuple(descriptions.keys())
+        self.risks = risks
+        self.norma = norma
+
+    def get_rule(self, division: str, risk: str) -> CompiledRule:
+        rule = self._rules.get((division, risk))
+        if rule is None:
+            raise ValueError(f"Combinação de Divisão '{division}' e Risco '{risk}' não encontrada na norma implementada.")
+        return rule
+
+    def evaluate(self, division: str, risk: str, population: int) -> int:
+        if population <= 0:
+            return 0
+        return self.get_rule(division, risk).evaluate(population)
+
+    def evaluate_batch(self, divisions: np.ndarray, risks: np.ndarray, populations: np.ndarray) -> np.ndarray:
+        """
+        Avalia uma matriz (instalações x turnos) de populações. Cada combinação
+        (Divisão, Risco) presente é resolvida uma única vez e aplicada em bloco.
+        """
+        result = np.zeros(populations.shape, dtype=np.int64)
+        for division, risk in set(zip(divisions, risks)):
+            rule = self.get_rule(division, risk)
+            mask = (divisions == division) & (risks == risk)
+            result[mask] = rule.evaluate_array(populations[mask])
+        return result
+
+
+def compile_rule_table(table: dict) -> RuleEngine:
+    """Compila o conteúdo (já decodificado) do arquivo da tabela em um RuleEngine."""
+    divisors = table["acrescimo_por_risco"]
+    rules = {}
+    descriptions = {}
+    for division, division_data in table["divisoes"].items():
+        descriptions[division] = division_data.get("descricao", "")
+        for risk, bands in division_data["faixas"].items():
+            if risk not in divisors:
+                raise ValueError(f"Risco '{risk}' da Divisão '{division}' não possui regra de acréscimo definida.")
+            if not bands:
+                raise ValueError(f"A Divisão '{division}' com Risco '{risk}' não possui faixas de população.")
+            ordered = sorted(bands, key=lambda band: int(band["ate"]))
+            limits = tuple(int(band["ate"]) for band in ordered)
+            if len(set(limits)) != len(limits):
+                raise ValueError(f"Faixas de população duplicadas para a Divisão '{division}' e Risco '{risk}'.")
+            values = tuple(None if band["brigadistas"] == TODOS else int(band["brigadistas"]) for band in ordered)
+            rules[(division, risk)] = CompiledRule(division, risk, limits, values, int(divisors[risk]))
+
+    return RuleEngine(rules, descriptions, tuple(divisors.keys()), table.get("norma", "ABNT NBR 14276"))
+
+
+@lru_cache(maxsize=None)
+def load_rule_engine(table_path: str = str(DEFAULT_TABLE_PATH)) -> RuleEngine:
+    """
+    Carrega e compila a tabela da norma. O resultado fica em cache no processo,
+    portanto o arquivo é lido apenas uma vez e o estado compilado é compartilhado.
+    """
+    with open(table_path, encoding="utf-8") as f:
+        return compile_rule_table(json.load(f))
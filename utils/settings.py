@@ -0,0 +1,17 @@
+import os
+import streamlit as st
+
+
+def get_app_setting(key: str, default=None):
+    """
+    Lê uma configuração opcional da seção [app_settings] do secrets.toml.
+    Uma variável de ambiente BRIGADA_<CHAVE> tem prioridade sobre o secrets,
+    o que permite ajustar o comportamento sem editar o arquivo.
+    """
+    env_value = os.environ.get(f"BRIGADA_{key.upper()}")
+    if env_value is not None:
+        return env_value
+    try:
+        return st.secrets["app_settings"][key]
+    except Exception:
+        return default
@@ -0,0 +1,165 @@
+import itertools
+import sys
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# Prazo padrão das abas em cache, igual ao antigo st.cache_data(ttl=300)
+DEFAULT_SHEET_CACHE_TTL = 300.0
+
+
+def append_parsed_rows(frame: pd.DataFrame, rows: list, parse_cell=None) -> pd.DataFrame:
+    """Novo DataFrame com `rows` (listas na ordem das colunas) acrescentadas ao final de `frame`."""
+    columns = frame.columns
+    parse_cell = parse_cell or (lambda value: value)
+    records = [[parse_cell(row[i]) if i < len(row) else "" for i in range(len(columns))] for row in rows]
+    return pd.concat([frame, pd.DataFrame(records, columns=columns)], ignore_index=True)
+
+
+def freeze_frame(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Marca como somente leitura os arrays NumPy por trás de `frame` e o retorna. Quem receber
+    o DataFrame (ou uma cópia rasa dele) e tentar alterar os valores no lugar recebe um
+    ValueError em vez de alterar os dados compartilhados.
+    """
+    for array in frame._mgr.arrays:
+        # Arrays de extensão (Int32, datas, categorias) guardam os valores em arrays internos.
+        for values in (array, *(getattr(array, name, None) for name in ("_data", "_mask", "_codes", "_ndarray"))):
+            if isinstance(values, np.ndarray):
+                values.setflags(write=False)
+    return frame
+
+
+def _memory_bytes(frame: pd.DataFrame) -> int:
+    """
+    Mesmo total de frame.memory_usage(deep=True). No pandas 2.x o cálculo profundo recusa
+    arrays de objetos somente leitura, então o tamanho dos objetos é somado aqui.
+    """
+    total = int(frame.memory_usage(deep=False).sum())
+    for _, series in frame.items():
+        if series.dtype == object:
+            total += sum(sys.getsizeof(value) for value in series)
+        else:
+            total += int(series.memory_usage(index=False, deep=True) - series.memory_usage(index=False, deep=False))
+    return total
+
+
+@dataclass(frozen=True)
+class CachedFrame:
+    """Conteúdo de uma aba em cache. `version` muda a cada recarga ou escrita local."""
+    frame: pd.DataFrame
+    version: int
+    loaded_at: float
+
+
+class SheetCache:
+    """
+    Cache versionado das abas das planilhas, por (ID da planilha, nome da aba).
+
+    Substitui o st.cache_data.clear() global: cada escrita atualiza apenas a aba afetada
+    (write-through, acrescentando as linhas gravadas ao DataFrame em cache) e os demais
+    caches do processo, como a base RAG indexada, continuam válidos. Objetos derivados
+    (ex: o repositório de empresas) são reconstruídos só quando a versão das abas das quais
+    dependem muda.
+
+    Os DataFrames nunca são alterados no lugar: cada escrita cria um novo, de modo que quem
+    já leu a versão anterior não é afetado. Eles são compartilhados entre as sessões e por
+    isso guardados com os arrays somente leitura (`freeze_frame`); basta entregar cópias
+    rasas. `transform(aba, frame)`, se informado, é aplicado a cada DataFrame antes de ser
+    guardado (ex: o esquema de tipos da aba).
+    """
+    def __init__(self, ttl: float = DEFAULT_SHEET_CACHE_TTL, transform=None):
+        self.ttl = ttl
+        self.transform = transform or (lambda sheet_name, frame: frame)
+        self._entries = {}
+        self._derived = {}
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._versions = itertools.count(1)
+        self._stats = {"hits": 0, "loads": 0, "local_appends": 0}
+
+    def _fresh_entry(self, key: tuple) -> CachedFrame | None:
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry.loaded_at > self.ttl:
+            return None
+        return entry
+
+    def _load_lock(self, sheet_id: str) -> threading.Lock:
+        with self._lock:
+            return self._load_locks.setdefault(sheet_id, threading.Lock())
+
+    def get_many(self, sheet_id: str, sheet_names: tuple, loader) -> dict:
+        """
+        Retorna {aba: CachedFrame}. As abas ausentes ou expiradas são carregadas juntas com
+        `loader(nomes) -> {aba: DataFrame}`, uma carga por vez por planilha.
+        """
+        with self._lock:
+            found = {name: self._fresh_entry((sheet_id, name)) for name in sheet_names}
+        if all(entry is not None for entry in found.values()):
+            with self._lock:
+                self._stats["hits"] += 1
+            return found
+
+        with self._load_lock(sheet_id):
+            # Outra thread pode ter carregado as abas enquanto esta aguardava.
+            with self._lock:
+                found = {name: self._fresh_entry((sheet_id, name)) for name in sheet_names}
+            missing = tuple(name for name, entry in found.items() if entry is None)
+            if missing:
+                frames = loader(missing)
+                frames = {name: freeze_frame(self.transform(name, frames.get(name, pd.DataFrame()))) for name in missing}
+                now = time.monotonic()
+                with self._lock:
+                    self._stats["loads"] += 1
+                    for name in missing:
+                        entry = CachedFrame(frames[name], next(self._versions), now)
+                        self._entries[(sheet_id, name)] = entry
+                        found[name] = entry
+        return found
+
+    def get(self, sheet_id: str, sheet_name: str, loader) -> CachedFrame:
+        return self.get_many(sheet_id, (sheet_name,), loader)[sheet_name]
+
+    def append_rows(self, sheet_id: str, sheet_name: str, rows: list, parse_cell=None) -> None:
+        """
+        Acrescenta ao DataFrame em cache as linhas que acabaram de ser gravadas na planilha,
+        na ordem das colunas da aba. `parse_cell` converte cada valor como a leitura da
+        planilha o devolveria. Se a aba não estiver em cache (ou não tiver cabeçalho), ela é
+        apenas invalidada e será relida no próximo acesso.
+        """
+        key = (sheet_id, sheet_name)
+        with self._lock:
+            entry = self._fresh_entry(key)
+            if entry is None or entry.frame.columns.empty:
+                self._entries.pop(key, None)
+                return
+            frame = freeze_frame(self.transform(sheet_name, append_parsed_rows(entry.frame, rows, parse_cell)))
+            self._entries[key] = CachedFrame(frame, next(self._versions), entry.loaded_at)
+            self._stats["local_appends"] += 1
+
+    def invalidate(self, sheet_id: str, sheet_name: str | None = None) -> None:
+        """Descarta uma aba (ou todas as abas de uma planilha) do cache."""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == sheet_id and sheet_name in (None, key[1])]:
+                del self._entries[key]
+
+    def derived(self, key, versions: tuple, builder):
+        """Retorna o objeto derivado em cache para `versions`, ou o reconstrói com `builder()`."""
+        with self._lock:
+            cached = self._derived.get(key)
+            if cached is not None and cached[0] == versions:
+                return cached[1]
+        value = builder()
+        with self._lock:
+            self._derived[key] = (versions, value)
+        return value
+
+    def stats(self) -> dict:
+        with self._lock:
+            frames = [entry.frame for entry in self._entries.values()]
+            stats = {**self._stats, "tabs": len(frames)}
+        stats["memory_bytes"] = sum(_memory_bytes(frame) for frame in frames)
+        return stats
@@ -0,0 +1,248 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+DEFAULT_REPLICA_DIR = ".cache"
+
+# Colunas indexadas nas tabelas da réplica, quando presentes na aba
+REPLICA_INDEX_COLUMNS = ("ID_Empresa", "Razao_Social")
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _range_name(sheet_name: str, a1: str) -> str:
+    return "'{}'!{}".format(sheet_name.replace("'", "''"), a1)
+
+
+def _chain_hash(previous: str, rows: list) -> str:
+    """Hash encadeado linha a linha: o mesmo conteúdo dá o mesmo hash, com ou sem carga incremental."""
+    digest = previous
+    for row in rows:
+        digest = hashlib.sha256((digest + json.dumps(row, ensure_ascii=False)).encode("utf-8")).hexdigest()
+    return digest
+
+
+class SheetReplica:
+    """
+    Réplica local (SQLite) somente leitura das abas da planilha de dados.
+
+    Cada aba vira uma tabela com as células como texto (colunas posicionais c0..cN, com o
+    cabeçalho guardado à parte) e índices em ID_Empresa e Razao_Social. A sincronização
+    incremental pede, em uma única chamada para todas as abas, apenas o cabeçalho e as linhas
+    após a última linha conhecida; as abas do app só recebem acréscimos, então isso cobre as
+    escritas normais. Uma sincronização completa periódica compara o hash do conteúdo e
+    reescreve apenas as abas que mudaram de outra forma (edições ou exclusões manuais).
+
+    `fetch_values(ranges)` recebe intervalos A1 e retorna uma lista de valores por intervalo.
+    """
+    def __init__(self, fetch_values, sheet_names: tuple, path: str, full_sync_interval: float = 600.0):
+        self.fetch_values = fetch_values
+        self.sheet_names = tuple(sheet_names)
+        self.path = Path(path)
+        self.full_sync_interval = full_sync_interval
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._last_full_sync = 0.0
+        self._stats = {"syncs": 0, "full_syncs": 0, "rows_pulled": 0, "last_sync_at": None, "last_error": None}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS replica_meta ("
+                " sheet_name TEXT PRIMARY KEY, headers TEXT NOT NULL, row_count INTEGER NOT NULL,"
+                " content_hash TEXT NOT NULL, synced_at REAL NOT NULL)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        """Abre uma conexão curta (commit ao final), segura para uso a partir de qualquer thread."""
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _table(sheet_name: str) -> str:
+        return _quote(f"tab_{sheet_name}")
+
+    def _meta(self, conn) -> dict:
+        rows = conn.execute("SELECT sheet_name, headers, row_count, content_hash FROM replica_meta").fetchall()
+        return {name: {"headers": json.loads(headers), "row_count": count, "hash": digest}
+                for name, headers, count, digest in rows}
+
+    # --- Escrita (sincronização) ---
+
+    def _replace_table(self, conn, sheet_name: str, values: list) -> None:
+        headers = values[0] if values else []
+        rows = values[1:]
+        width = max([len(headers)] + [len(row) for row in rows])
+        table = self._table(sheet_name)
+        columns = ", ".join(f"c{i} TEXT" for i in range(width))
+        conn.execute(f"DROP TABLE IF EXISTS {table}")
+        conn.execute(f"CREATE TABLE {table} (row_number INTEGER PRIMARY KEY{', ' + columns if columns else ''})")
+        for column in REPLICA_INDEX_COLUMNS:
+            if column in headers:
+                position = headers.index(column)
+                conn.execute(f"CREATE INDEX {_quote(f'idx_{sheet_name}_{column}')} ON {table} (c{position})")
+        self._insert_rows(conn, sheet_name, width, 0, rows)
+        conn.execute(
+            "INSERT OR REPLACE INTO replica_meta VALUES (?, ?, ?, ?, ?)",
+            (sheet_name, json.dumps(headers, ensure_ascii=False), len(rows), _chain_hash("", rows), time.time())
+        )
+
+    def _insert_rows(self, conn, sheet_name: str, width: int, start: int, rows: list) -> None:
+        if not rows or not width:
+            return
+        placeholders = ", ".join("?" for _ in range(width + 1))
+        conn.executemany(
+            f"INSERT INTO {self._table(sheet_name)} VALUES ({placeholders})",
+            [[start + i + 1] + [row[j] if j < len(row) else "" for j in range(width)] for i, row in enumerate(rows)]
+        )
+
+    def _table_width(self, conn, sheet_name: str) -> int:
+        columns = conn.execute(f"PRAGMA table_info({self._table(sheet_name)})").fetchall()
+        return len(columns) - 1
+
+    def sync(self, full: bool = False) -> list:
+        """
+        Sincroniza a réplica com a planilha e retorna a lista de abas alteradas.
+        A primeira sincronização (ou `full=True`) baixa as abas inteiras.
+        """
+        with self._sync_lock:
+            with self._connect() as conn:
+                meta = self._meta(conn)
+            full = full or time.monotonic() - self._last_full_sync > self.full_sync_interval
+            missing = [name for name in self.sheet_names if name not in meta]
+            changed = []
+
+            if full or missing:
+                names = self.sheet_names if full else tuple(missing)
+                values_by_tab = self.fetch_values([_range_name(name, "A1:ZZZ") for name in names])
+                with self._connect() as conn:
+                    for name, values in zip(names, values_by_tab):
+                        rows = values[1:]
+                        current = meta.get(name)
+                        if current and current["headers"] == (values[0] if values else []) \
+                                and current["row_count"] == len(rows) and current["hash"] == _chain_hash("", rows):
+                            continue
+                        self._replace_table(conn, name, values)
+                        self._stats["rows_pulled"] += len(rows)
+                        changed.append(name)
+                if full:
+                    self._last_full_sync = time.monotonic()
+                    self._stats["full_syncs"] += 1
+                meta = {name: info for name, info in meta.items() if name not in names}
+
+            incremental = [name for name in self.sheet_names if name in meta]
+            if incremental:
+                # Uma única chamada: cabeçalho + linhas novas de cada aba.
+                ranges = []
+                for name in incremental:
+                    ranges.append(_range_name(name, "1:1"))
+                    ranges.append(_range_name(name, f"A{meta[name]['row_count'] + 2}:ZZZ"))
+                results = self.fetch_values(ranges)
+                stale_headers = []
+                with self._connect() as conn:
+                    for i, name in enumerate(incremental):
+                        header_values, new_rows = results[2 * i], results[2 * i + 1]
+                        headers = header_values[0] if header_values else []
+                        info = meta[name]
+                        if headers != info["headers"]:
+                            stale_headers.append(name)
+                            continue
+                        if not new_rows:
+                            continue
+                        width = self._table_width(conn, name)
+                        if any(len(row) > width for row in new_rows):
+                            stale_headers.append(name)
+                            continue
+                        self._insert_rows(conn, name, width, info["row_count"], new_rows)
+                        conn.execute(
+                            "UPDATE replica_meta SET row_count = ?, content_hash = ?, synced_at = ? WHERE sheet_name = ?",
+                            (info["row_count"] + len(new_rows), _chain_hash(info["hash"], new_rows), time.time(), name)
+                        )
+                        self._stats["rows_pulled"] += len(new_rows)
+                        changed.append(name)
+                if stale_headers:
+                    # Estrutura da aba mudou: recarrega a aba inteira.
+                    values_by_tab = self.fetch_values([_range_name(name, "A1:ZZZ") for name in stale_headers])
+                    with self._connect() as conn:
+                        for name, values in zip(stale_headers, values_by_tab):
+                            self._replace_table(conn, name, values)
+                            self._stats["rows_pulled"] += max(len(values) - 1, 0)
+                            changed.append(name)
+
+            with self._lock:
+                self._stats["syncs"] += 1
+                self._stats["last_sync_at"] = time.time()
+                self._stats["last_error"] = None
+            return changed
+
+    # --- Leitura ---
+
+    def is_ready(self) -> bool:
+        """Indica se todas as abas já foram copiadas ao menos uma vez."""
+        with self._connect() as conn:
+            meta = self._meta(conn)
+        return all(name in meta for name in self.sheet_names)
+
+    def read_values(self, sheet_name: str) -> list:
+        """Valores da aba no mesmo formato da API (primeira linha = cabeçalho)."""
+        with self._connect() as conn:
+            meta = self._meta(conn).get(sheet_name)
+            if meta is None:
+                return []
+            rows = conn.execute(f"SELECT * FROM {self._table(sheet_name)} ORDER BY row_number").fetchall()
+        return [meta["headers"]] + [list(row[1:]) for row in rows]
+
+    def lookup(self, sheet_name: str, column: str, value) -> list:
+        """Linhas da aba em que `column` == `value` (usa o índice em ID_Empresa/Razao_Social)."""
+        with self._connect() as conn:
+            meta = self._meta(conn).get(sheet_name)
+            if meta is None or column not in meta["headers"]:
+                return []
+            position = meta["headers"].index(column)
+            rows = conn.execute(
+                f"SELECT * FROM {self._table(sheet_name)} WHERE c{position} = ? ORDER BY row_number", (str(value),)
+            ).fetchall()
+        return [list(row[1:]) for row in rows]
+
+    # --- Sincronização em segundo plano ---
+
+    def start(self, interval: float, on_change=None) -> None:
+        """Inicia a thread que sincroniza a cada `interval` segundos (ou quando solicitado)."""
+        if self._thread is not None:
+            return
+
+        def run():
+            while True:
+                self._wake.wait(timeout=interval)
+                self._wake.clear()
+                try:
+                    changed = self.sync()
+                except Exception as e:
+                    with self._lock:
+                        self._stats["last_error"] = str(e)
+                    continue
+                if changed and on_change:
+                    on_change(changed)
+
+        self._thread = threading.Thread(target=run, name="sheets-replica-sync", daemon=True)
+        self._thread.start()
+
+    def request_sync(self) -> None:
+        """Antecipa a próxima sincronização (ex: logo após uma escrita na planilha)."""
+        self._wake.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
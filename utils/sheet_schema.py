@@ -0,0 +1,101 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+EMPRESAS_SHEET = "Empresas"
+DADOS_CALCULO_SHEET = "Dados_Calculo"
+BRIGADISTAS_SHEET = "Brigadistas_Treinados"
+RESULTADOS_SHEET = "Resultados_Salvos"
+
+# Abas da planilha de dados carregadas juntas, em uma única requisição
+DATA_SHEETS = (EMPRESAS_SHEET, DADOS_CALCULO_SHEET, BRIGADISTAS_SHEET, RESULTADOS_SHEET)
+
+# Colunas de cada aba, na ordem em que as linhas são gravadas
+DATA_SHEET_COLUMNS = {
+    EMPRESAS_SHEET: ("ID_Empresa", "Razao_Social", "CNPJ", "Imovel"),
+    DADOS_CALCULO_SHEET: ("ID_Empresa", "Divisao", "Risco", "Pop_Turno1", "Pop_Turno2", "Pop_Turno3"),
+    BRIGADISTAS_SHEET: ("ID_Empresa", "Nome", "Email", "Validade"),
+    RESULTADOS_SHEET: ("ID_Empresa", "Data_Hora", "Usuario", "Divisao", "Risco",
+                       "Populacao_Turnos", "Total_Calculado", "Detalhe_Turnos"),
+}
+
+
+def record_to_row(sheet_name: str, record: dict) -> list:
+    """Converte um registro {coluna: valor} na linha da aba, na ordem de DATA_SHEET_COLUMNS."""
+    return [record.get(column) for column in DATA_SHEET_COLUMNS[sheet_name]]
+
+
+# Tipos das colunas de cada aba no DataFrame em cache. Colunas com valores que não se
+# encaixam no tipo (ex: texto em uma coluna numérica) permanecem como lidas da planilha.
+# Em Empresas, o ID_Empresa é único por linha e uma categoria só aumentaria a memória.
+DATA_SHEET_DTYPES = {
+    EMPRESAS_SHEET: {},
+    DADOS_CALCULO_SHEET: {"ID_Empresa": "category", "Divisao": "category", "Risco": "category",
+                          "Pop_Turno1": "Int32", "Pop_Turno2": "Int32", "Pop_Turno3": "Int32"},
+    BRIGADISTAS_SHEET: {"ID_Empresa": "category", "Email": "category", "Validade": "datetime64[ns]"},
+    RESULTADOS_SHEET: {"ID_Empresa": "category", "Divisao": "category", "Risco": "category",
+                       "Data_Hora": "datetime64[ns]", "Total_Calculado": "Int32"},
+}
+
+# Formato das datas gravadas em cada coluna de data
+DATE_FORMATS = {"Validade": "%d/%m/%Y", "Data_Hora": "%Y-%m-%d %H:%M:%S"}
+
+
+def _convert_column(series: pd.Series, dtype: str, date_format: str | None) -> pd.Series | None:
+    """Converte a coluna para `dtype`; retorna None se algum valor preenchido não couber no tipo."""
+    if dtype == "category":
+        return series.astype("category")
+    blank = series.isna() | series.isin([""])
+    values = series.where(~blank)
+    if dtype.startswith("datetime"):
+        converted = pd.to_datetime(values, format=date_format, errors="coerce")
+    else:
+        converted = pd.to_numeric(values, errors="coerce")
+        if (converted[~blank] % 1 != 0).any():
+            return None
+    if converted[~blank].isna().any():
+        return None
+    try:
+        return converted.astype(dtype)
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def apply_schema(sheet_name: str, frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aplica os tipos de DATA_SHEET_DTYPES às colunas da aba: categorias para códigos
+    repetidos, inteiros pequenos para populações e datas convertidas. Abas sem esquema
+    são devolvidas sem alteração.
+    """
+    dtypes = DATA_SHEET_DTYPES.get(sheet_name)
+    if not dtypes or frame.empty:
+        return frame
+    converted = {}
+    for column, dtype in dtypes.items():
+        if column in frame.columns and str(frame[column].dtype) != dtype:
+            series = _convert_column(frame[column], dtype, DATE_FORMATS.get(column))
+            if series is not None:
+                converted[column] = series
+    return frame.assign(**converted) if converted else frame
+
+
+def _native(column: str, value):
+    """Valor de uma célula como lido da planilha: tipos nativos, datas no formato da coluna e vazios como ""."""
+    if value is None or value is pd.NA or value is pd.NaT:
+        return ""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return ""
+    if isinstance(value, datetime):
+        return value.strftime(DATE_FORMATS.get(column, "%d/%m/%Y"))
+    return value
+
+
+def frame_to_records(frame: pd.DataFrame) -> list:
+    """
+    Linhas do DataFrame como dicionários no formato da leitura da planilha (o inverso de
+    apply_schema): valores Python nativos, datas como texto e células vazias como "".
+    """
+    return [{key: _native(key, value) for key, value in record.items()} for record in frame.to_dict("records")]
@@ -0,0 +1,186 @@
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+# Tipos de requisição com cotas separadas na API do Google Sheets
+QUOTA_READ = "read"
+QUOTA_WRITE = "write"
+
+# Códigos HTTP repetidos com backoff: cota excedida e falhas temporárias do servidor
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+
+# Escritas só são repetidas quando a API comprovadamente não as aplicou (cota excedida): após
+# um 5xx ou erro de rede, a linha pode ter sido gravada e repetir o acréscimo a duplicaria.
+RETRYABLE_WRITE_STATUS = (429,)
+
+
+def _status_code(error: Exception):
+    return getattr(getattr(error, "response", None), "status_code", None)
+
+
+def is_retryable_error(error: Exception, kind: str = QUOTA_READ) -> bool:
+    """
+    Indica se a chamada pode ser repetida: leituras e metadados em falhas temporárias (429, 5xx
+    ou erro de rede); escritas apenas quando a cota foi excedida (429).
+    """
+    if kind == QUOTA_WRITE:
+        return _status_code(error) in RETRYABLE_WRITE_STATUS
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    return _status_code(error) in RETRYABLE_STATUS
+
+
+def is_ambiguous_write_error(error: Exception) -> bool:
+    """
+    Indica se uma escrita que falhou pode ter sido aplicada mesmo assim (5xx ou erro de rede).
+    Ela não deve ser reenviada às cegas, pois isso duplicaria as linhas gravadas.
+    """
+    return is_retryable_error(error, QUOTA_READ) and not is_retryable_error(error, QUOTA_WRITE)
+
+
+def _retry_after(error: Exception) -> float | None:
+    """Espera sugerida pelo servidor no cabeçalho Retry-After (segundos), se houver."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Balde de fichas: libera até `capacity` requisições de uma vez e repõe as fichas ao ritmo de
+    `requests_per_minute`. Sem limite configurado (None ou 0), não há espera.
+    """
+    def __init__(self, requests_per_minute: float | None, capacity: float = 10.0):
+        self.rate = requests_per_minute / 60.0 if requests_per_minute else 0.0
+        self.capacity = max(1.0, float(capacity))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Reserva uma ficha e retorna quantos segundos o chamador deve esperar para usá-la."""
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            # Saldo negativo: a ficha só estará disponível depois de reposta.
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+
+class SheetsQuota:
+    """
+    Controle das cotas por minuto da API do Google Sheets, compartilhado pelo processo.
+
+    Cada requisição passa por um balde de fichas do seu tipo (leitura ou escrita) antes de
+    ser enviada. Falhas temporárias são repetidas até `max_retries` vezes com backoff exponencial
+    com jitter (respeitando o Retry-After, se enviado): 429/5xx e erros de rede nas leituras,
+    apenas 429 nas escritas, que não são idempotentes (ver `is_retryable_error`). Leituras idênticas
+    simultâneas (mesma `key`) são agrupadas: apenas a primeira vai à API e as demais recebem o
+    mesmo resultado, que por isso deve ser tratado como somente leitura.
+
+    `stats()` expõe, por tipo, a fila de espera atual e máxima e o tempo total de espera.
+    """
+    def __init__(self, read_requests_per_minute: float | None = None, write_requests_per_minute: float | None = None,
+                 burst: float = 10.0, max_retries: int = 5, backoff_base: float = 1.0, backoff_max: float = 32.0):
+        self.buckets = {
+            QUOTA_READ: TokenBucket(read_requests_per_minute, burst),
+            QUOTA_WRITE: TokenBucket(write_requests_per_minute, burst),
+        }
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._stats = {
+            kind: {"calls": 0, "retries": 0, "errors": 0, "throttled": 0, "throttle_seconds": 0.0,
+                   "backoff_seconds": 0.0, "waiting": 0, "max_waiting": 0}
+            for kind in self.buckets
+        }
+        self._coalesced = 0
+
+    def throttle(self, kind: str) -> float:
+        """Aguarda uma ficha do tipo `kind` e retorna o tempo de espera, em segundos."""
+        wait = self.buckets[kind].reserve()
+        if wait <= 0:
+            return 0.0
+        stats = self._stats[kind]
+        with self._lock:
+            stats["throttled"] += 1
+            stats["waiting"] += 1
+            stats["max_waiting"] = max(stats["max_waiting"], stats["waiting"])
+        try:
+            time.sleep(wait)
+        finally:
+            with self._lock:
+                stats["waiting"] -= 1
+                stats["throttle_seconds"] += wait
+        return wait
+
+    def _backoff_delay(self, attempt: int, error: Exception) -> float:
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            return min(self.backoff_max, retry_after)
+        return min(self.backoff_max, self.backoff_base * (2 ** attempt) + random.uniform(0, self.backoff_base))
+
+    def _call_with_retry(self, kind: str, operation):
+        stats = self._stats[kind]
+        for attempt in range(self.max_retries + 1):
+            self.throttle(kind)
+            with self._lock:
+                stats["calls"] += 1
+            try:
+                return operation()
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable_error(e, kind):
+                    with self._lock:
+                        stats["errors"] += 1
+                    raise
+                delay = self._backoff_delay(attempt, e)
+                with self._lock:
+                    stats["retries"] += 1
+                    stats["backoff_seconds"] += delay
+                time.sleep(delay)
+
+    def call(self, kind: str, operation, key=None):
+        """
+        Executa `operation()` respeitando a cota de `kind`, com novas tentativas em falhas
+        temporárias. Com `key`, chamadas simultâneas com a mesma chave compartilham o resultado.
+        """
+        if key is None:
+            return self._call_with_retry(kind, operation)
+
+        with self._lock:
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = Future()
+            else:
+                self._coalesced += 1
+        if not leader:
+            return flight.result()
+
+        try:
+            result = self._call_with_retry(kind, operation)
+        except BaseException as e:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            flight.set_exception(e)
+            raise
+        with self._lock:
+            self._in_flight.pop(key, None)
+        flight.set_result(result)
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **{kind: dict(stats) for kind, stats in self._stats.items()},
+                "coalesced": self._coalesced,
+                "in_flight": len(self._in_flight),
+            }
@@ -0,0 +1,33 @@
+import random
+import threading
+import time
+
+
+class FakeServiceError(ConnectionError):
+    """Falha transitória simulada pelos backends locais (tratada como erro de rede)."""
+
+
+class LatencyModel:
+    """
+    Latência e falhas simuladas para os backends locais (Gemini e Sheets).
+
+    Cada chamada espera `latency` + um valor em [0, `latency_jitter`] segundos e falha com
+    FakeServiceError com probabilidade `error_rate`. Os sorteios de cada operação são
+    derivados de `seed` e do número da chamada, portanto são reprodutíveis entre execuções.
+    """
+    def __init__(self, latency: float = 0.0, latency_jitter: float = 0.0, error_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.seed = seed
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def simulate(self, op_name: str) -> None:
+        with self._lock:
+            self.calls[op_name] = self.calls.get(op_name, 0) + 1
+            call_number = self.calls[op_name]
+        rng = random.Random(f"{self.seed}:{op_name}:{call_number}")
+        time.sleep(self.latency + rng.uniform(0, self.latency_jitter))
+        if rng.random() < self.error_rate:
+            raise FakeServiceError(f"Falha simulada em '{op_name}' (chamada {call_number}).")
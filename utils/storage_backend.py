@@ -0,0 +1,399 @@
+import abc
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils.sheet_cache import freeze_frame
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # sem pyarrow, apenas o backend do Google Sheets fica disponível
+    pa = ds = pq = None
+
+DEFAULT_PARQUET_STORAGE_DIR = ".cache/parquet"
+
+# Coluna interna com a posição original da linha (preserva a ordem da planilha)
+ROW_COLUMN = "_row"
+
+# Colunas de busca com o valor normalizado (ver lookup_key), gravadas ao lado das originais
+KEY_COLUMNS = ("ID_Empresa", "Razao_Social")
+KEY_PREFIX = "_key_"
+
+# Colunas pelas quais os arquivos são ordenados, para que as estatísticas de cada row group
+# permitam descartar blocos inteiros nas buscas (predicate pushdown)
+SORT_COLUMNS = (KEY_PREFIX + "ID_Empresa",)
+
+# Lista dos arquivos válidos de cada aba, substituída de forma atômica
+MANIFEST_FILE = "manifest.json"
+
+
+def pyarrow_available() -> bool:
+    return pa is not None
+
+
+def lookup_key(value) -> str:
+    """
+    Chave de comparação das buscas para um valor já convertido (como a leitura da planilha o
+    devolve): números inteiros sem casas decimais (1 e 1.0 viram "1") e os demais como texto.
+    Os dois backends convertem o valor procurado da mesma forma antes de compará-lo, então
+    "001", 1 e 1.0 encontram a mesma linha quando a planilha os lê como o mesmo número.
+    """
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+def _content_hash(values: list) -> str:
+    return hashlib.sha256(json.dumps(values, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+
+class StorageBackend(abc.ABC):
+    """
+    Interface de armazenamento das abas da planilha de dados usada pelo GoogleSheetsHandler.
+
+    - `read(aba, columns)`: a aba inteira como DataFrame, opcionalmente só com `columns`.
+    - `lookup(aba, coluna, valor, columns)`: as linhas em que `coluna` == `valor` (comparados
+      por `lookup_key`), na ordem da aba (DataFrame vazio com as colunas da aba se não houver).
+    - `append(aba, linhas, deferred)`: acrescenta linhas (listas na ordem das colunas) e
+      retorna o ticket da gravação quando ela for concluída em segundo plano, ou None.
+
+    Os backends que mantêm leituras em memória entregam cópias rasas de DataFrames somente
+    leitura (ver freeze_frame): o chamador pode acrescentar ou trocar colunas, mas não
+    alterar valores no lugar, de modo que nada vaza para as demais sessões.
+    """
+    name = "base"
+
+    @abc.abstractmethod
+    def read(self, sheet_name: str, columns: list | None = None) -> pd.DataFrame:
+        ...
+
+    @abc.abstractmethod
+    def lookup(self, sheet_name: str, column: str, value, columns: list | None = None) -> pd.DataFrame:
+        ...
+
+    @abc.abstractmethod
+    def append(self, sheet_name: str, rows: list, deferred: bool = False) -> str | None:
+        ...
+
+    def stats(self) -> dict:
+        return {"backend": self.name}
+
+
+class ParquetBackend(StorageBackend):
+    """
+    Réplica local colunar (Parquet, via pyarrow) das abas da planilha de dados, que continua
+    sendo a fonte dos dados: as leituras passam pela réplica (read-through) e as gravações vão
+    para a planilha antes de serem aplicadas localmente.
+
+    Cada aba é um diretório com arquivos Parquet, com as células guardadas como texto, como a
+    API do Sheets as devolve, e convertidas na leitura por `parse_cell` e `transform(aba, frame)`.
+    As leituras pedem apenas as colunas necessárias (column pruning) e as buscas em KEY_COLUMNS
+    usam uma coluna com o valor normalizado (ver `lookup_key`), filtrada pelo pyarrow com base
+    nas estatísticas dos row groups (predicate pushdown), sem percorrer a aba inteira.
+
+    `fetch_values(abas)` retorna {aba: valores brutos (primeira linha = cabeçalho)} da planilha.
+    Abas ausentes, invalidadas (`invalidate`) ou sincronizadas há mais de `refresh_interval`
+    segundos são relidas juntas no próximo acesso, e reescritas apenas se o conteúdo mudou
+    (hash). Se a planilha estiver indisponível, os dados locais continuam sendo servidos.
+
+    `append` grava primeiro na planilha com `writer(aba, linhas, deferred)`, que retorna o
+    ticket da fila de escrita (se houver), e depois acrescenta um arquivo pequeno à aba local;
+    ao passar de `compact_after` arquivos, a aba é reescrita em um único arquivo ordenado.
+
+    Os arquivos válidos de cada aba são listados em um manifesto substituído de forma atômica:
+    uma importação ou compactação interrompida deixa apenas arquivos fora do manifesto, que
+    são ignorados e removidos, sem perder nem duplicar linhas.
+    """
+    name = "parquet"
+
+    def __init__(self, directory: str, fetch_values=None, writer=None, parse_cell=None, transform=None,
+                 sheet_names: tuple = (), refresh_interval: float | None = 300.0, row_group_size: int = 4096,
+                 compact_after: int = 32):
+        if not pyarrow_available():
+            raise RuntimeError("O backend Parquet requer o pacote 'pyarrow' (pip install pyarrow).")
+        self.directory = Path(directory)
+        self.fetch_values = fetch_values
+        self.writer = writer
+        self.parse_cell = parse_cell or (lambda value: value)
+        self.transform = transform or (lambda sheet_name, frame: frame)
+        self.sheet_names = tuple(sheet_names)
+        self.refresh_interval = refresh_interval
+        self.row_group_size = row_group_size
+        self.compact_after = compact_after
+        self._lock = threading.Lock()
+        # Serializa as releituras da planilha e as gravações, para que uma releitura não
+        # inclua uma linha que a gravação em andamento ainda vai acrescentar localmente.
+        self._sync_lock = threading.RLock()
+        self._manifests = {}
+        self._datasets = {}
+        self._frames = {}
+        self._retry_refresh_at = 0.0
+        self._stats = {"reads": 0, "lookups": 0, "appended_rows": 0, "compactions": 0, "refreshes": 0,
+                       "reimports": 0, "last_refresh_at": None, "last_error": None}
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _sheet_dir(self, sheet_name: str) -> Path:
+        return self.directory / sheet_name
+
+    # --- Manifesto ---
+
+    def _manifest(self, sheet_name: str) -> dict | None:
+        """Manifesto da aba: arquivos, cabeçalho, linhas, hash e horário da sincronização (com o lock)."""
+        if sheet_name not in self._manifests:
+            self._manifests[sheet_name] = self._load_manifest(sheet_name)
+        return self._manifests[sheet_name]
+
+    def _load_manifest(self, sheet_name: str) -> dict | None:
+        try:
+            manifest = json.loads((self._sheet_dir(sheet_name) / MANIFEST_FILE).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None  # Aba ainda não importada: será lida da planilha
+        self._remove_orphans(sheet_name, manifest["parts"])
+        return manifest
+
+    def _save_manifest(self, sheet_name: str, manifest: dict) -> None:
+        path = self._sheet_dir(sheet_name) / MANIFEST_FILE
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        self._manifests[sheet_name] = manifest
+
+    def _remove_orphans(self, sheet_name: str, parts: list) -> None:
+        """Remove os arquivos da aba fora do manifesto (restos de uma escrita interrompida)."""
+        for path in self._sheet_dir(sheet_name).glob("part-*"):
+            if path.name not in parts:
+                path.unlink(missing_ok=True)
+
+    def _next_sequence(self, sheet_name: str) -> int:
+        numbers = [int(path.name.split("-")[1].split(".")[0]) for path in self._sheet_dir(sheet_name).glob("part-*")]
+        return max(numbers, default=-1) + 1
+
+    def has_sheet(self, sheet_name: str) -> bool:
+        with self._lock:
+            return self._manifest(sheet_name) is not None
+
+    def _discard(self, sheet_name: str) -> None:
+        """Descarta o conjunto de dados e as leituras em memória da aba (chamado com o lock adquirido)."""
+        self._datasets.pop(sheet_name, None)
+        for key in [key for key in self._frames if key[0] == sheet_name]:
+            del self._frames[key]
+
+    def _dataset(self, sheet_name: str):
+        """(conjunto de dados, cabeçalho) da aba, ou (None, []) se ela não existir localmente."""
+        with self._lock:
+            manifest = self._manifest(sheet_name)
+            if manifest is None:
+                return None, []
+            dataset = self._datasets.get(sheet_name)
+            if dataset is None:
+                paths = [str(self._sheet_dir(sheet_name) / part) for part in manifest["parts"]]
+                dataset = self._datasets[sheet_name] = ds.dataset(paths, format="parquet")
+            return dataset, manifest["headers"]
+
+    # --- Sincronização com a planilha ---
+
+    def _is_stale(self, sheet_name: str, now: float) -> bool:
+        manifest = self._manifest(sheet_name)
+        if manifest is None:
+            return True
+        if self.refresh_interval is None:
+            return manifest["synced_at"] == 0
+        return now - manifest["synced_at"] > self.refresh_interval
+
+    def invalidate(self, sheet_name: str | None = None) -> None:
+        """Marca uma aba (ou todas) para ser relida da planilha no próximo acesso."""
+        with self._lock:
+            for name in [sheet_name] if sheet_name else list(self._manifests):
+                manifest = self._manifests.get(name)
+                if manifest is not None:
+                    manifest["synced_at"] = 0
+
+    def refresh(self, sheet_names: tuple | None = None) -> list:
+        """
+        Relê da planilha, com uma única chamada, as abas informadas (ou todas as de
+        `sheet_names`) e reescreve as que mudaram. Retorna as abas reescritas.
+        """
+        names = tuple(sheet_names or self.sheet_names)
+        with self._sync_lock:
+            values = self.fetch_values(names)
+            changed = []
+            for name in names:
+                sheet_values = values.get(name, [])
+                digest = _content_hash(sheet_values)
+                with self._lock:
+                    manifest = self._manifest(name)
+                    if manifest is not None and manifest["hash"] == digest:
+                        self._save_manifest(name, {**manifest, "synced_at": time.time()})
+                        continue
+                self.import_values(name, sheet_values, content_hash=digest)
+                changed.append(name)
+            with self._lock:
+                self._stats["refreshes"] += 1
+                self._stats["reimports"] += len(changed)
+                self._stats["last_refresh_at"] = time.time()
+                self._stats["last_error"] = None
+        return changed
+
+    def _ensure_fresh(self, sheet_name: str) -> None:
+        """Relê a aba (e as demais desatualizadas, na mesma chamada) se ela estiver desatualizada."""
+        if self.fetch_values is None:
+            return
+        with self._sync_lock:
+            now = time.time()
+            with self._lock:
+                stale = [name for name in dict.fromkeys(self.sheet_names + (sheet_name,)) if self._is_stale(name, now)]
+                available = self._manifest(sheet_name) is not None
+            if sheet_name not in stale or (available and time.monotonic() < self._retry_refresh_at):
+                return
+            try:
+                self.refresh(tuple(stale))
+            except Exception as e:
+                if not available:
+                    raise
+                # Planilha indisponível: serve os dados locais e tenta de novo mais tarde.
+                with self._lock:
+                    self._stats["last_error"] = str(e)
+                self._retry_refresh_at = time.monotonic() + min(60.0, self.refresh_interval or 60.0)
+
+    # --- Escrita ---
+
+    def _write_part(self, sheet_name: str, table, sequence: int) -> str:
+        sort_keys = [(column, "ascending") for column in SORT_COLUMNS if column in table.column_names]
+        table = table.sort_by(sort_keys + [(ROW_COLUMN, "ascending")])
+        sheet_dir = self._sheet_dir(sheet_name)
+        sheet_dir.mkdir(parents=True, exist_ok=True)
+        path = sheet_dir / f"part-{sequence:08d}.parquet"
+        tmp_path = path.with_suffix(".tmp")
+        pq.write_table(table, tmp_path, row_group_size=self.row_group_size)
+        os.replace(tmp_path, path)
+        return path.name
+
+    def _table_from_rows(self, headers: list, rows: list, first_row: int):
+        columns = {ROW_COLUMN: pa.array(range(first_row, first_row + len(rows)), type=pa.int64())}
+        for i, header in enumerate(headers):
+            cells = ["" if i >= len(row) or row[i] is None else str(row[i]) for row in rows]
+            columns[header] = pa.array(cells, type=pa.string())
+            if header in KEY_COLUMNS:
+                columns[KEY_PREFIX + header] = pa.array([lookup_key(self.parse_cell(cell)) for cell in cells],
+                                                        type=pa.string())
+        return pa.table(columns)
+
+    def import_values(self, sheet_name: str, values: list, content_hash: str | None = None) -> None:
+        """Substitui o conteúdo da aba pelos valores brutos (primeira linha = cabeçalho)."""
+        headers = [str(header) for header in values[0]] if values else []
+        table = self._table_from_rows(headers, values[1:], 0)
+        with self._lock:
+            part = self._write_part(sheet_name, table, self._next_sequence(sheet_name))
+            self._save_manifest(sheet_name, {"parts": [part], "headers": headers, "rows": table.num_rows,
+                                             "hash": content_hash or _content_hash(values), "synced_at": time.time()})
+            self._remove_orphans(sheet_name, [part])
+            self._discard(sheet_name)
+
+    def append(self, sheet_name: str, rows: list, deferred: bool = False) -> str | None:
+        """
+        Grava as linhas na planilha (com `writer`) e, em seguida, em um novo arquivo da aba
+        local. Retorna o ticket da gravação na planilha, se ela tiver sido enfileirada.
+        """
+        with self._sync_lock:
+            self._ensure_fresh(sheet_name)
+            if not self.has_sheet(sheet_name):
+                raise KeyError(f"Aba '{sheet_name}' não existe no armazenamento local.")
+            ticket = self.writer(sheet_name, rows, deferred) if self.writer is not None else None
+            with self._lock:
+                manifest = self._manifest(sheet_name)
+                first_row = manifest["rows"]
+                table = self._table_from_rows(manifest["headers"], rows, first_row)
+                part = self._write_part(sheet_name, table, self._next_sequence(sheet_name))
+                # O conteúdo local deixa de corresponder ao hash da última leitura da planilha.
+                manifest = {**manifest, "parts": manifest["parts"] + [part], "rows": first_row + len(rows),
+                            "hash": None}
+                self._save_manifest(sheet_name, manifest)
+                self._discard(sheet_name)
+                self._stats["appended_rows"] += len(rows)
+                if len(manifest["parts"]) > self.compact_after:
+                    self._compact(sheet_name)
+        return ticket
+
+    def _compact(self, sheet_name: str) -> None:
+        """Reescreve os arquivos da aba em um só, ordenado (chamado com o lock adquirido)."""
+        manifest = self._manifest(sheet_name)
+        paths = [str(self._sheet_dir(sheet_name) / part) for part in manifest["parts"]]
+        table = ds.dataset(paths, format="parquet").to_table()
+        part = self._write_part(sheet_name, table, self._next_sequence(sheet_name))
+        self._save_manifest(sheet_name, {**manifest, "parts": [part]})
+        self._remove_orphans(sheet_name, [part])
+        self._stats["compactions"] += 1
+
+    # --- Leitura ---
+
+    def _to_frame(self, sheet_name: str, table, columns: list) -> pd.DataFrame:
+        table = table.sort_by(ROW_COLUMN)
+        # Mesma inferência de tipos por coluna da leitura da planilha (values_to_df).
+        frame = pd.DataFrame({column: self._parse_column(table.column(column)) for column in columns}, columns=columns)
+        return self.transform(sheet_name, frame)
+
+    def _parse_column(self, values) -> list:
+        """Converte uma coluna de textos, chamando `parse_cell` uma vez por valor distinto."""
+        encoded = values.combine_chunks().dictionary_encode()
+        parsed = np.array([self.parse_cell(value) for value in encoded.dictionary.to_pylist()], dtype=object)
+        return parsed[encoded.indices.to_numpy(zero_copy_only=False)].tolist()
+
+    @staticmethod
+    def _columns(headers: list, columns: list | None) -> list:
+        return list(headers) if columns is None else [column for column in columns if column in headers]
+
+    def read(self, sheet_name: str, columns: list | None = None) -> pd.DataFrame:
+        self._ensure_fresh(sheet_name)
+        dataset, headers = self._dataset(sheet_name)
+        if dataset is None:
+            return pd.DataFrame()
+        selected = self._columns(headers, columns)
+        key = (sheet_name, tuple(selected))
+        with self._lock:
+            self._stats["reads"] += 1
+            frame = self._frames.get(key)
+        if frame is None:
+            # Leituras completas repetidas são servidas da memória até a próxima escrita, em
+            # cópias rasas de um DataFrame somente leitura.
+            frame = freeze_frame(self._to_frame(sheet_name, dataset.to_table(columns=[ROW_COLUMN] + selected), selected))
+            with self._lock:
+                if self._datasets.get(sheet_name) is dataset:
+                    self._frames[key] = frame
+        return frame.copy(deep=False)
+
+    def lookup(self, sheet_name: str, column: str, value, columns: list | None = None) -> pd.DataFrame:
+        self._ensure_fresh(sheet_name)
+        dataset, headers = self._dataset(sheet_name)
+        if dataset is None:
+            return pd.DataFrame()
+        selected = self._columns(headers, columns)
+        with self._lock:
+            self._stats["lookups"] += 1
+        if column not in headers:
+            return pd.DataFrame(columns=selected)
+        key = lookup_key(self.parse_cell(str(value)))
+        if column in KEY_COLUMNS:
+            table = dataset.to_table(columns=[ROW_COLUMN] + selected, filter=ds.field(KEY_PREFIX + column) == key)
+        else:
+            # Colunas sem chave normalizada: a comparação é feita aqui, sobre a coluna lida.
+            table = dataset.to_table(columns=list(dict.fromkeys([ROW_COLUMN, column] + selected)))
+            matches = [lookup_key(cell) == key for cell in self._parse_column(table.column(column))]
+            table = table.filter(pa.array(matches, type=pa.bool_()))
+        return self._to_frame(sheet_name, table, selected)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"backend": self.name, **self._stats}
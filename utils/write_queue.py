@@ -0,0 +1,280 @@
+import itertools
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from utils.sheets_quota import QUOTA_WRITE, is_ambiguous_write_error, is_retryable_error
+
+DEFAULT_WRITE_JOURNAL_PATH = ".cache/sheets_write_journal.jsonl"
+DEFAULT_DEAD_LETTER_PATH = ".cache/sheets_write_dead_letter.jsonl"
+
+# Situação de uma gravação enfileirada, exibida na interface
+STATUS_PENDING = "pendente"
+STATUS_WRITTEN = "gravado"
+STATUS_ERROR = "erro"
+STATUS_FAILED = "falhou"
+
+
+class WriteBehindQueue:
+    """
+    Fila de escrita assíncrona (write-behind) para acréscimos de linhas nas planilhas.
+
+    `enqueue` registra as linhas em um diário local (JSON Lines, gravado com fsync) e retorna
+    imediatamente. Uma thread em segundo plano agrupa as linhas pendentes de cada aba e as envia
+    com uma única chamada `write_fn(sheet_id, sheet_name, rows)` quando a aba acumula
+    `max_batch_rows` linhas ou quando a linha mais antiga espera mais que `flush_interval`
+    segundos.
+
+    Só a cota excedida (429) garante que a planilha não aplicou o lote: nesse caso as linhas
+    continuam na fila e a aba é reenviada com backoff exponencial próprio (uma aba com problema
+    não atrasa as demais). Qualquer outra falha, ou `max_attempts` falhas 429 seguidas, retira o
+    lote da fila e o guarda no arquivo de falhas (`dead_letter_path`, JSON Lines), com a situação
+    "falhou": após um 5xx ou erro de rede as linhas podem já estar na planilha, e reenviá-las
+    as duplicaria. Esses lotes são marcados como `ambiguous` e devem ser conferidos na planilha.
+
+    Ao iniciar, as entradas do diário ainda não confirmadas são recolocadas na fila, portanto
+    nenhuma gravação aceita é perdida. A entrega é "pelo menos uma vez": uma queda entre a
+    escrita na planilha e a confirmação no diário pode repetir o lote.
+    """
+    def __init__(self, write_fn, journal_path: str = DEFAULT_WRITE_JOURNAL_PATH, max_batch_rows: int = 200,
+                 flush_interval: float = 2.0, retry_base_delay: float = 2.0, retry_max_delay: float = 60.0,
+                 max_attempts: int = 8, dead_letter_path: str = DEFAULT_DEAD_LETTER_PATH):
+        self.write_fn = write_fn
+        self.journal_path = Path(journal_path)
+        self.dead_letter_path = Path(dead_letter_path)
+        self.max_batch_rows = max_batch_rows
+        self.flush_interval = flush_interval
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.max_attempts = max(1, int(max_attempts))
+
+        self._cond = threading.Condition()
+        # (sheet_id, sheet_name) -> OrderedDict {ticket: {"rows": [...], "enqueued_at": t}}
+        self._pending = {}
+        self._status = OrderedDict()
+        self._ids = itertools.count(1)
+        # Falhas seguidas e horário da próxima tentativa, por aba
+        self._failures = {}
+        self._retry_at = {}
+        self._force = False
+        self._stats = {"enqueued_rows": 0, "written_rows": 0, "write_calls": 0, "failed_calls": 0,
+                       "dead_letter_batches": self._count_dead_letters(), "dead_letter_rows": 0,
+                       "last_error": None, "last_flush_at": None}
+        self._replay_journal()
+        self._thread = threading.Thread(target=self._run, name="sheets-write-behind", daemon=True)
+        self._thread.start()
+
+    # --- Diário ---
+
+    def _journal_append(self, record: dict, path: Path | None = None) -> None:
+        path = path or self.journal_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _count_dead_letters(self) -> int:
+        if not self.dead_letter_path.exists():
+            return 0
+        with open(self.dead_letter_path, encoding="utf-8") as f:
+            return sum(1 for line in f if line.strip())
+
+    def _replay_journal(self) -> None:
+        """Recoloca na fila as gravações do diário que não foram confirmadas."""
+        if not self.journal_path.exists():
+            return
+        entries = OrderedDict()
+        with open(self.journal_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # Linha incompleta de uma gravação interrompida
+                if record.get("op") == "enqueue":
+                    entries[record["id"]] = record
+                elif record.get("op") in ("ack", "dead"):
+                    for ticket in record.get("ids", []):
+                        entries.pop(ticket, None)
+        last_id = 0
+        for ticket, record in entries.items():
+            key = (record["sheet_id"], record["sheet_name"])
+            self._pending.setdefault(key, OrderedDict())[ticket] = {"rows": record["rows"], "enqueued_at": 0.0}
+            self._status[ticket] = {"status": STATUS_PENDING, "rows": len(record["rows"]), "error": None, "attempts": 0,
+                                    "ambiguous": False}
+            last_id = max(last_id, int(ticket.split("-")[-1]))
+        self._ids = itertools.count(last_id + 1)
+        # Reescreve o diário apenas com as entradas pendentes.
+        self._compact_journal(list(entries.values()))
+
+    def _compact_journal(self, records: list) -> None:
+        self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.journal_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.journal_path)
+
+    # --- Interface pública ---
+
+    def enqueue(self, sheet_id: str, sheet_name: str, rows: list) -> str:
+        """Registra as linhas para gravação e retorna o identificador (ticket) da gravação."""
+        # Normaliza os valores (ex: tipos numpy) para que a fila e o diário guardem o mesmo conteúdo.
+        rows = json.loads(json.dumps(rows, ensure_ascii=False, default=str))
+        with self._cond:
+            ticket = f"w-{next(self._ids)}"
+            self._journal_append({"op": "enqueue", "id": ticket, "sheet_id": sheet_id,
+                                  "sheet_name": sheet_name, "rows": rows})
+            key = (sheet_id, sheet_name)
+            self._pending.setdefault(key, OrderedDict())[ticket] = {"rows": rows, "enqueued_at": time.monotonic()}
+            self._status[ticket] = {"status": STATUS_PENDING, "rows": len(rows), "error": None, "attempts": 0,
+                                    "ambiguous": False}
+            self._stats["enqueued_rows"] += len(rows)
+            if sum(len(item["rows"]) for item in self._pending[key].values()) >= self.max_batch_rows:
+                self._cond.notify()
+        return ticket
+
+    def status(self, ticket: str) -> dict | None:
+        """
+        Situação da gravação: {"status": pendente|gravado|erro|falhou, "rows": n, "error": mensagem,
+        "attempts": falhas seguidas da aba, "ambiguous": se a gravação que falhou pode ter sido aplicada}.
+        """
+        with self._cond:
+            status = self._status.get(ticket)
+            return dict(status) if status else None
+
+    def pending_rows(self, sheet_id: str, sheet_name: str) -> list:
+        """Linhas ainda não gravadas de uma aba, na ordem em que foram enfileiradas."""
+        with self._cond:
+            items = self._pending.get((sheet_id, sheet_name), {})
+            return [row for item in items.values() for row in item["rows"]]
+
+    def dead_letters(self) -> list:
+        """Lotes desistidos após `max_attempts` falhas, como gravados no arquivo de falhas."""
+        if not self.dead_letter_path.exists():
+            return []
+        records = []
+        with open(self.dead_letter_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+        return records
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """
+        Força o envio imediato de todas as linhas pendentes e aguarda (até `timeout`). Lotes que
+        esgotarem as tentativas vão para o arquivo de falhas e deixam de ser aguardados.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._cond:
+            self._retry_at.clear()
+            self._force = True
+            self._cond.notify()
+            while any(self._pending.values()):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining if remaining is not None else 0.5)
+        return True
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                **self._stats,
+                "pending_rows": sum(len(item["rows"]) for items in self._pending.values() for item in items.values()),
+                "pending_tabs": sum(1 for items in self._pending.values() if items),
+            }
+
+    # --- Thread de envio ---
+
+    def _due_batches(self, now: float) -> list:
+        """
+        Abas prontas para envio: tamanho mínimo atingido, prazo vencido ou envio forçado. Abas
+        em backoff após uma falha esperam até o horário da próxima tentativa.
+        """
+        due = []
+        for key, items in self._pending.items():
+            if not items or now < self._retry_at.get(key, 0.0):
+                continue
+            rows = sum(len(item["rows"]) for item in items.values())
+            oldest = next(iter(items.values()))["enqueued_at"]
+            if self._force or rows >= self.max_batch_rows or now - oldest >= self.flush_interval:
+                due.append((key, list(items.keys()), [row for item in items.values() for row in item["rows"]]))
+        return due
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                due = self._due_batches(time.monotonic())
+                if not due:
+                    self._force = False
+                    self._cond.wait(timeout=min(self.flush_interval, 0.5))
+                    continue
+            for (sheet_id, sheet_name), tickets, rows in due:
+                self._flush_batch(sheet_id, sheet_name, tickets, rows)
+
+    def _flush_batch(self, sheet_id: str, sheet_name: str, tickets: list, rows: list) -> None:
+        try:
+            self.write_fn(sheet_id, sheet_name, rows)
+        except Exception as e:
+            key = (sheet_id, sheet_name)
+            with self._cond:
+                failures = self._failures[key] = self._failures.get(key, 0) + 1
+                self._stats["failed_calls"] += 1
+                self._stats["last_error"] = f"{sheet_name}: {e}"
+                self._force = False
+                if not is_retryable_error(e, QUOTA_WRITE) or failures >= self.max_attempts:
+                    self._dead_letter(sheet_id, sheet_name, tickets, rows, e, failures)
+                    return
+                delay = min(self.retry_max_delay, self.retry_base_delay * (2 ** (failures - 1)))
+                self._retry_at[key] = time.monotonic() + delay
+                for ticket in tickets:
+                    if ticket in self._status:
+                        self._status[ticket].update(status=STATUS_ERROR, error=str(e), attempts=failures)
+            return
+
+        with self._cond:
+            # A confirmação é gravada sob o mesmo lock da compactação do diário.
+            self._journal_append({"op": "ack", "ids": tickets})
+            self._stats["write_calls"] += 1
+            self._stats["written_rows"] += len(rows)
+            self._stats["last_flush_at"] = time.time()
+            self._finish(sheet_id, sheet_name, tickets, status=STATUS_WRITTEN, error=None, attempts=0)
+
+    def _dead_letter(self, sheet_id: str, sheet_name: str, tickets: list, rows: list, error: Exception,
+                     attempts: int) -> None:
+        """Retira o lote da fila e o guarda no arquivo de falhas (chamado com o lock adquirido)."""
+        ambiguous = is_ambiguous_write_error(error)
+        self._journal_append({"sheet_id": sheet_id, "sheet_name": sheet_name, "ids": tickets, "rows": rows,
+                              "error": str(error), "attempts": attempts, "ambiguous": ambiguous,
+                              "failed_at": time.time()},
+                             path=self.dead_letter_path)
+        self._journal_append({"op": "dead", "ids": tickets})
+        self._stats["dead_letter_batches"] += 1
+        self._stats["dead_letter_rows"] += len(rows)
+        self._finish(sheet_id, sheet_name, tickets, status=STATUS_FAILED, error=str(error), attempts=attempts,
+                     ambiguous=ambiguous)
+
+    def _finish(self, sheet_id: str, sheet_name: str, tickets: list, **status) -> None:
+        """Remove os tickets concluídos (gravados ou desistidos) da fila (chamado com o lock adquirido)."""
+        key = (sheet_id, sheet_name)
+        self._failures.pop(key, None)
+        self._retry_at.pop(key, None)
+        items = self._pending.get(key, {})
+        for ticket in tickets:
+            items.pop(ticket, None)
+            if ticket in self._status:
+                self._status[ticket].update(**status)
+        # Mantém apenas as situações mais recentes na memória.
+        while len(self._status) > 10000:
+            self._status.popitem(last=False)
+        if not any(self._pending.values()):
+            self._compact_journal([])
+        self._cond.notify_all()